@@ -0,0 +1,58 @@
+#
+# Copyright (c) 2024 Stefan Lohmaier.
+#
+# This file is part of EnBraille 
+# (see https://github.com/slohmaier/EnBraille).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Conversion core of EnBraille.
+
+Everything in here works without Qt, so it can be used from scripts, the
+command line tools and worker processes. Importing it must not import PySide6.
+The document and text conversions are imported on first use, so reformatting
+BRF files works without liblouis, markdown and the EPUB reader.
+"""
+import importlib
+
+from enbraille_core.reformat import (EnBrailleBrfIndex, EnBrailleOutputSpool, EnBrailleReformatBatch,
+                                     EnBrailleReformater, outputFilename, reformatSettings)
+from enbraille_core.settings import EnBrailleSettings
+from enbraille_tools import EnBrailleCancelled, EnBrailleProgress
+
+_LAZYEXPORTS = {
+    'EnBrailleDocumentCache': 'enbraille_core.cache',
+    'EnBrailleMd2BRF': 'enbraille_core.document',
+    'convertDocument': 'enbraille_core.document',
+    'convertDocumentToFile': 'enbraille_core.document',
+    'markdown2brf': 'enbraille_core.document',
+    'paginateDocument': 'enbraille_core.document',
+    'EnBrailleChapter': 'enbraille_core.epub',
+    'epub2brf': 'enbraille_core.epub',
+    'epub2brfToFile': 'enbraille_core.epub',
+    'epubSpine': 'enbraille_core.epub',
+    'xhtml2tree': 'enbraille_core.epub',
+    'translateText': 'enbraille_core.text',
+}
+
+def __getattr__(name: str):
+    module = _LAZYEXPORTS.get(name)
+    if module is None:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZYEXPORTS))
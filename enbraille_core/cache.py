@@ -0,0 +1,131 @@
+#
+# Copyright (c) 2024 Stefan Lohmaier.
+#
+# This file is part of EnBraille 
+# (see https://github.com/slohmaier/EnBraille).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""On-disk cache of converted documents.
+
+Converting a book again after a restart or after changing and restoring a
+setting only copies the braille of the first conversion.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+from enbraille_core.settings import DEFAULTS, EnBrailleSettings
+
+# document settings that do not change the braille
+_KEYIGNORED = frozenset(['documentWorkerCount', 'documentCacheSize'])
+_ENTRYSUFFIX = '.brf'
+_CHUNKSIZE = 1024 * 1024
+
+class EnBrailleDocumentCache:
+    """Converted documents in the cache folder, one file per conversion.
+
+    An entry is named by its key, a hash of the content of the input file,
+    the identity of the braille table and the document settings, so changing
+    any of them misses the cache. Once the entries take more than maxSize
+    bytes the least recently used ones are removed. Failing to read or write
+    the cache is not an error, the document is converted then.
+    """
+
+    def __init__(self, cacheDir: str, maxSize: int) -> None:
+        self.folder = os.path.join(cacheDir, 'documents')
+        self.maxSize = maxSize
+
+    @staticmethod
+    def key(filename: str, data: EnBrailleSettings) -> str:
+        from libbrl import libbrlImpl
+        data = EnBrailleSettings.fromData(data)
+        digest = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNKSIZE), b''):
+                digest.update(chunk)
+        # the same bytes are converted differently as EPUB and as Markdown
+        digest.update(os.path.splitext(filename)[1].lower().encode('utf-8', 'surrogateescape'))
+        digest.update(libbrlImpl().tableIdentity(data.documentTable).encode('utf-8', 'surrogateescape'))
+        for name in sorted(DEFAULTS):
+            if name.startswith('document') and name not in _KEYIGNORED:
+                digest.update('\0{}={!r}'.format(name, getattr(data, name)).encode('utf-8', 'surrogateescape'))
+        return digest.hexdigest()
+
+    def entryFilename(self, key: str) -> str:
+        return os.path.join(self.folder, key + _ENTRYSUFFIX)
+
+    def get(self, key: str, outFilename: str) -> Optional[int]:
+        """Copy the cached conversion to outFilename.
+
+        Returns the number of lines, or None if the conversion is not cached.
+        """
+        entryFilename = self.entryFilename(key)
+        try:
+            lineCount = 0
+            with open(entryFilename, 'rb') as entry, open(outFilename, 'wb') as output:
+                for chunk in iter(lambda: entry.read(_CHUNKSIZE), b''):
+                    output.write(chunk)
+                    lineCount += chunk.count(b'\n')
+            # the modification time orders the entries for the eviction
+            os.utime(entryFilename)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.debug('Could not read cached conversion {}: {}'.format(entryFilename, e))
+            return None
+        logging.debug('Using cached conversion ' + entryFilename)
+        return lineCount
+
+    def put(self, key: str, filename: str) -> None:
+        """Store a copy of the conversion in filename and evict old entries."""
+        if os.path.getsize(filename) > self.maxSize:
+            return
+        tmpFilename = None
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            # complete or not at all, also for a conversion running at the same time
+            fd, tmpFilename = tempfile.mkstemp(suffix='.tmp', dir=self.folder)
+            os.close(fd)
+            shutil.copyfile(filename, tmpFilename)
+            os.replace(tmpFilename, self.entryFilename(key))
+            tmpFilename = None
+            self.evict()
+        except OSError as e:
+            logging.debug('Could not cache conversion {}: {}'.format(filename, e))
+        finally:
+            if tmpFilename is not None and os.path.exists(tmpFilename):
+                os.unlink(tmpFilename)
+
+    def evict(self) -> None:
+        """Remove the least recently used entries beyond maxSize."""
+        entries = []
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.name.endswith(_ENTRYSUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        entries.sort(reverse=True)
+        size = 0
+        for mtime, entrySize, path in entries:
+            size += entrySize
+            if size > self.maxSize:
+                logging.debug('Evicting cached conversion ' + path)
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,542 @@
+#
+# Copyright (c) 2024 Stefan Lohmaier.
+#
+# This file is part of EnBraille 
+# (see https://github.com/slohmaier/EnBraille).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import io
+import logging
+import os
+import xml.etree.ElementTree as etree
+from concurrent.futures import Executor
+from functools import partial
+from typing import Callable, Iterable, Iterator, Optional, TextIO
+
+import markdown
+import markdown.treeprocessors
+
+from enbraille_core.settings import EnBrailleSettings
+from enbraille_tools import EnBrailleProgress, writeOutput
+from libbrl import libbrlImpl, libbrlTypeforms
+
+# inline elements, their content is translated together with the surrounding text
+_INLINETAGS = frozenset(['em', 'strong', 'code', 'a', 'del', 'ins', 'sup', 'sub', 'span', 'br', 'img'])
+
+# groups of table rows in XHTML
+_TABLEGROUPS = frozenset(['thead', 'tbody', 'tfoot'])
+
+# markup before and after the content of inline elements
+_INLINEMARKUP = {
+    'em': ('*', '*'),
+    'strong': ('**', '**'),
+    'code': ('`', '`'),
+    'del': ('~~', '~~'),
+    'ins': ('++', '++'),
+    'sup': ('^{', '}'),
+    'sub': ('_{', '}'),
+}
+
+class EnBrailleTextBlock:
+    """Inline text of a block with the positions of its markup.
+
+    The text is translated with one call, so contractions are not broken at
+    the boundaries of inline elements. The markup is placed afterwards at
+    the braille positions of the characters it was next to.
+    """
+
+    def __init__(self) -> None:
+        self._text = []
+        self._length = 0
+        self._typeforms = []
+        self._formatted = False
+        # (position in the text, markup)
+        self._markup = []
+
+    def addText(self, text: Optional[str], typeform: libbrlTypeforms = libbrlTypeforms.PLAIN) -> None:
+        if not text:
+            return
+        self._text.append(text)
+        self._length += len(text)
+        self._typeforms.extend([typeform] * len(text))
+        self._formatted = self._formatted or typeform != libbrlTypeforms.PLAIN
+
+    def addMarkup(self, markup: str) -> None:
+        """Add text that is not translated, e.g. markup or converted child blocks."""
+        if markup:
+            self._markup.append((self._length, markup))
+
+    def write(self, out: list[str], translateBlock: Callable[[str, Optional[list]], tuple[str, list[int]]]) -> None:
+        """Translate the block and append the parts of the result to out."""
+        if self._length == 0:
+            out.extend(markup for _, markup in self._markup)
+            return
+        braille, outPos = translateBlock(''.join(self._text), self._typeforms if self._formatted else None)
+        last = 0
+        for position, markup in self._markup:
+            braillePos = outPos[position] if position < len(outPos) else len(braille)
+            # a contraction can move the braille of a later character before an earlier one
+            braillePos = max(braillePos, last)
+            out.append(braille[last:braillePos])
+            out.append(markup)
+            last = braillePos
+        out.append(braille[last:])
+
+    def translate(self, translateBlock: Callable[[str, Optional[list]], tuple[str, list[int]]]) -> str:
+        out = []
+        self.write(out, translateBlock)
+        return ''.join(out)
+
+class EnBrailleMd2BRF(markdown.treeprocessors.Treeprocessor):
+    """Convert a Markdown or XHTML element tree to braille.
+
+    The handlers append to one shared list of output parts, which is joined
+    once at the end, instead of concatenating strings on every level.
+
+    The tree is walked without recursion: handlers of elements with content
+    are generators that yield the generators converting their children, and
+    _drive() runs them with an explicit stack. So the depth of a document
+    is not limited by the recursion limit of Python.
+    """
+
+    def __init__(self, data: EnBrailleSettings) -> None:
+        super().__init__()
+
+        # a snapshot, the conversion reads the settings for every element
+        self.data = EnBrailleSettings.fromData(data)
+        self.brl = libbrlImpl()
+        self._headingChars = {}
+        self._headingChars[0] = self._translate(self.data.documentH1Char)
+        self._headingChars[1] = self._translate(self.data.documentH2Char)
+        self._headingChars[2] = self._translate(self.data.documentH3Char)
+        self._headingChars[3] = self._translate(self.data.documentH4Char)
+        self._headingChars[4] = self._translate(self.data.documentH5Char)
+        self._headingChars[5] = self._translate(self.data.documentH6Char)
+
+        self._bulletChars = {}
+        self._bulletChars[0] = self._translate(self.data.documentBulletL1Char)
+        self._bulletChars[1] = self._translate(self.data.documentBulletL2Char)
+        self._bulletChars[2] = self._translate(self.data.documentBulletL3Char)
+        self._bulletChars[3] = self._translate(self.data.documentBulletL4Char)
+        self._bulletChars[4] = self._translate(self.data.documentBulletL5Char)
+        self._bulletChars[5] = self._translate(self.data.documentBulletL6Char)
+
+        # block element tag -> handler appending its braille to the output
+        self._blockHandlers = {
+            'p': self._writeParagraph,
+            'h1': partial(self._writeHeading, level=1),
+            'h2': partial(self._writeHeading, level=2),
+            'h3': partial(self._writeHeading, level=3),
+            'h4': partial(self._writeHeading, level=4),
+            'h5': partial(self._writeHeading, level=5),
+            'h6': partial(self._writeHeading, level=6),
+            'ul': self._writeUnorderedList,
+            'ol': self._writeOrderedList,
+            'blockquote': self._writeBlockquote,
+            'pre': self._writePreformatted,
+            'hr': self._writeHorizontalRule,
+            'table': self._writeTable,
+            'tr': self._writeTableRow,
+            'td': self._writeElements,
+            'th': self._writeTableHeader,
+            'dl': self._writeDefinitionList,
+            'dt': self._writeDefinitionTerm,
+            'dd': self._writeDefinition,
+            'div': self._writeContainer,
+        }
+    
+    def _translate(self, text: str) -> str:
+        return self.brl.translate(text, self.data.documentTable)
+
+    def _translateBlock(self, text: str, typeforms: Optional[list[libbrlTypeforms]]) -> tuple[str, list[int]]:
+        return self.brl.translateBlock(text, self.data.documentTable, typeforms)
+
+    @staticmethod
+    def _drive(task: Iterator) -> None:
+        """Run task and the tasks it yields, each one before the task that yielded it continues."""
+        stack = [task]
+        while stack:
+            subtask = next(stack[-1], None)
+            if subtask is None:
+                stack.pop()
+            else:
+                stack.append(subtask)
+
+    def _render(self, write: Callable[[etree.Element, list[str]], Optional[Iterator]], element: etree.Element) -> str:
+        out = []
+        task = write(element, out)
+        if task is not None:
+            self._drive(task)
+        return ''.join(out)
+
+    def run(self, doc: etree.Element) -> None:
+        return self.convert_elements(doc)
+
+    def convert_elements(self, elements: etree.Element) -> str:
+        """Convert the content of elements.
+
+        The text, the inline elements and the tails between two block
+        elements are translated together as one block.
+        """
+        return self._render(self._writeElements, elements)
+
+    def _writeElements(self, elements: etree.Element, out: list[str]) -> Iterator:
+        block = EnBrailleTextBlock()
+        block.addText(elements.text)
+        for element in elements:
+            if element.tag in _INLINETAGS:
+                if len(element):
+                    yield self._collectInline(element, block)
+                else:
+                    self._addInline(element, block)
+            else:
+                block.write(out, self._translateBlock)
+                block = EnBrailleTextBlock()
+                task = self._writeBlock(element, out)
+                if task is not None:
+                    yield task
+            block.addText(element.tail)
+        block.write(out, self._translateBlock)
+
+    def convert_block(self, element: etree.Element) -> str:
+        return self._render(self._writeBlock, element)
+
+    def _writeBlock(self, element: etree.Element, out: list[str]) -> Optional[Iterator]:
+        handler = self._blockHandlers.get(element.tag)
+        if handler is not None:
+            return handler(element, out)
+        logging.warning('Unsupported element: ' + element.tag)
+        if element.text:
+            out.append(self._translate(element.text))
+            out.append('\n')
+        return None
+
+    def _collectInline(self, element: etree.Element, block: EnBrailleTextBlock,
+                       typeform: libbrlTypeforms = libbrlTypeforms.PLAIN) -> Iterator:
+        """Add the text of the inline element and its markup to block, without its tail.
+
+        Nested inline elements are walked with a stack of
+        (children, typeform, closing markup, tail, typeform of the tail).
+        """
+        stack = []
+        self._openInline(element, None, block, typeform, stack)
+        while stack:
+            children, typeform, closing, tail, tailTypeform = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                block.addMarkup(closing)
+                block.addText(tail, tailTypeform)
+            elif child.tag in _INLINETAGS:
+                self._openInline(child, child.tail, block, typeform, stack)
+            else:
+                # a block inside an inline element is converted on its own
+                converted = []
+                task = self._writeBlock(child, converted)
+                if task is not None:
+                    yield task
+                block.addMarkup(''.join(converted))
+                block.addText(child.tail, typeform)
+
+    def _addInline(self, element: etree.Element, block: EnBrailleTextBlock,
+                   typeform: libbrlTypeforms = libbrlTypeforms.PLAIN) -> None:
+        """Add an inline element without children to block, without its tail."""
+        stack = []
+        self._openInline(element, None, block, typeform, stack)
+        if stack:
+            block.addMarkup(stack[0][2])
+
+    def _openInline(self, element: etree.Element, tail: Optional[str], block: EnBrailleTextBlock,
+                    typeform: libbrlTypeforms, stack: list) -> None:
+        tag = element.tag
+        if tag == 'br':
+            block.addMarkup('\n')
+            block.addText(tail, typeform)
+            return
+        elif tag == 'img':
+            #TODO: how to handle images?
+            block.addText(tail, typeform)
+            return
+
+        opening, closing = _INLINEMARKUP.get(tag, ('', ''))
+        contentTypeform = typeform
+        if tag == 'code':
+            # code is not contracted
+            contentTypeform = libbrlTypeforms.COMPUTER
+        elif tag == 'a':
+            # print as "text" (url)
+            href = element.get('href', '')
+            if href:
+                closing = ' (' + href + ')'
+
+        block.addMarkup(opening)
+        block.addText(element.text, contentTypeform)
+        stack.append((iter(element), contentTypeform, closing, tail, typeform))
+
+    def convert_inline(self, element: etree.Element) -> str:
+        """Convert an inline element on its own, without its tail."""
+        block = EnBrailleTextBlock()
+        self._drive(self._collectInline(element, block))
+        return block.translate(self._translateBlock)
+    
+    def convert_paragraph(self, element: etree.Element) -> str:
+        return self._render(self._writeParagraph, element)
+
+    def _writeParagraph(self, element: etree.Element, out: list[str]) -> Iterator:
+        yield self._writeElements(element, out)
+        out.append('\n')
+    
+    def convert_heading(self, element: etree.Element, level: int) -> str:
+        return self._render(partial(self._writeHeading, level=level), element)
+
+    def _writeHeading(self, element: etree.Element, out: list[str], level: int) -> Iterator:
+        heading = []
+        yield self._writeElements(element, heading)
+        headingText = ''.join(heading)
+        lineLength = min(len(headingText), self.data.documentLineLength)
+        out.append(self._headingChars[level-1])
+        out.append('\n')
+        out.append(headingText[:lineLength])
+        out.append('\n')
+    
+    def convert_unordered_list(self, element: etree.Element) -> str:
+        return self._render(self._writeUnorderedList, element)
+
+    def _writeUnorderedList(self, element: etree.Element, out: list[str]) -> Iterator:
+        for i, li in enumerate(element):
+            out.append(self._bulletChars[i % 6])
+            out.append(' ')
+            yield self._writeElements(li, out)
+    
+    def convert_ordered_list(self, element: etree.Element) -> str:
+        return self._render(self._writeOrderedList, element)
+
+    def _writeOrderedList(self, element: etree.Element, out: list[str]) -> Iterator:
+        for i, li in enumerate(element):
+            out.append(str(i + 1) + '. ')
+            yield self._writeElements(li, out)
+    
+    def convert_blockquote(self, element: etree.Element) -> str:
+        return self._render(self._writeBlockquote, element)
+
+    def _writeBlockquote(self, element: etree.Element, out: list[str]) -> Iterator:
+        #TODO: mark blockquote
+        yield self._writeElements(element, out)
+        out.append('\n')
+    
+    def convert_preformatted(self, element: etree.Element) -> str:
+        return self._render(self._writePreformatted, element)
+
+    def _writePreformatted(self, element: etree.Element, out: list[str]) -> Iterator:
+        block = EnBrailleTextBlock()
+        block.addText(element.text, libbrlTypeforms.COMPUTER)
+        for child in element:
+            if len(child):
+                yield self._collectInline(child, block, libbrlTypeforms.COMPUTER)
+            else:
+                self._addInline(child, block, libbrlTypeforms.COMPUTER)
+            block.addText(child.tail, libbrlTypeforms.COMPUTER)
+        out.append('```\n')
+        block.write(out, self._translateBlock)
+        out.append('\n```\n')
+    
+    def convert_code(self, element: etree.Element) -> str:
+        return self.convert_inline(element)
+    
+    def convert_image(self, element: etree.Element) -> str:
+        return self.convert_inline(element)
+    
+    def convert_link(self, element: etree.Element) -> str:
+        return self.convert_inline(element)
+
+    def convert_horizontal_rule(self, element: etree.Element) -> str:
+        return self._render(self._writeHorizontalRule, element)
+
+    def _writeHorizontalRule(self, element: etree.Element, out: list[str]) -> None:
+        lineLength = min(self.data.documentLineLength, 8)
+        out.append(self._translate('-') * lineLength)
+        out.append('\n')
+
+    def convert_line_break(self, element: etree.Element) -> str:
+        return self.convert_inline(element)
+    
+    def convert_table(self, element: etree.Element) -> str:
+        return self._render(self._writeTable, element)
+
+    def _writeTable(self, element: etree.Element, out: list[str]) -> Iterator:
+        out.append('\n')
+        # Process table rows
+        for child in element:
+            for row in (child if child.tag in _TABLEGROUPS else (child,)):
+                if row.tag == 'tr':
+                    yield self._writeTableRow(row, out)
+        out.append('\n')
+
+    def convert_table_row(self, element: etree.Element) -> str:
+        return self._render(self._writeTableRow, element)
+
+    def _writeTableRow(self, element: etree.Element, out: list[str]) -> Iterator:
+        cells = []
+        # Process table cells
+        for cell in element:
+            if cell.tag in ['td', 'th']:
+                content = []
+                yield self._writeElements(cell, content)
+                cells.append(''.join(content).strip())
+        
+        if cells:
+            out.append(' | '.join(cells))
+            out.append('\n')
+
+    def convert_table_data(self, element: etree.Element) -> str:
+        # This method is now handled by convert_table_row
+        return self.convert_elements(element)
+    
+    def convert_table_header(self, element: etree.Element) -> str:
+        return self._render(self._writeTableHeader, element)
+
+    def _writeTableHeader(self, element: etree.Element, out: list[str]) -> Iterator:
+        yield self._writeElements(element, out)
+        out.append(' | ')
+    
+    def convert_emphasis(self, element: etree.Element) -> str:
+        return self.convert_inline(element)
+    
+    def convert_strong(self, element: etree.Element) -> str:
+        return self.convert_inline(element)
+    
+    def convert_deleted(self, element: etree.Element) -> str:
+        return self.convert_inline(element)
+    
+    def convert_inserted(self, element: etree.Element) -> str:
+        return self.convert_inline(element)
+    
+    def convert_superscript(self, element: etree.Element) -> str:
+        return self.convert_inline(element)
+    
+    def convert_subscript(self, element: etree.Element) -> str:
+        return self.convert_inline(element)
+    
+    def convert_definition_list_item(self, element: etree.Element) -> str:
+        if element.tag in ('dl', 'dt', 'dd'):
+            return self.convert_block(element)
+        return ''
+
+    def _writeDefinitionList(self, element: etree.Element, out: list[str]) -> Iterator:
+        yield self._writeElements(element, out)
+        out.append('\n')
+
+    def _writeDefinitionTerm(self, element: etree.Element, out: list[str]) -> Iterator:
+        out.append('**')
+        yield self._writeElements(element, out)
+        out.append('**\n')
+
+    def _writeDefinition(self, element: etree.Element, out: list[str]) -> Iterator:
+        out.append('  ')
+        yield self._writeElements(element, out)
+        out.append('\n')
+
+    def _writeContainer(self, element: etree.Element, out: list[str]) -> Iterator:
+        # sections of XHTML documents, only text directly in them needs a line break
+        start = len(out)
+        yield self._writeElements(element, out)
+        last = len(out) - 1
+        while last >= start and not out[last]:
+            last -= 1
+        if last >= start and not out[last].endswith('\n'):
+            out.append('\n')
+
+class _EnBrailleBrfTreeprocessor(markdown.treeprocessors.Treeprocessor):
+    # markdown.markdown() only returns HTML, this converts the element tree on the way
+    def __init__(self, md: markdown.Markdown, converter: EnBrailleMd2BRF) -> None:
+        super().__init__(md)
+        self.converter = converter
+        self.brf = ''
+
+    def run(self, root: etree.Element) -> None:
+        self.brf = self.converter.run(root)
+
+def markdown2brf(text: str, data: EnBrailleSettings) -> str:
+    """Convert Markdown text to braille with the document settings of data."""
+    md = markdown.Markdown()
+    # prettify only adds line breaks for the HTML output
+    md.treeprocessors.deregister('prettify')
+    treeprocessor = _EnBrailleBrfTreeprocessor(md, EnBrailleMd2BRF(data))
+    # after the inline patterns and the unescaping
+    md.treeprocessors.register(treeprocessor, 'enbraille', -1)
+    md.convert(text)
+    return treeprocessor.brf
+
+def paginateDocument(chapters: Iterable[str], output: TextIO, data: EnBrailleSettings, lineCount: int = 0) -> int:
+    """Write the braille of the chapters to output, with a page number after every documentPageLength lines.
+
+    The page numbers continue across the chapters, every chapter starts on a
+    new line. Returns the total number of lines written.
+    """
+    pageLength = data.documentPageLength
+    lineLength = data.documentLineLength
+    for chapter in chapters:
+        lines = chapter.split('\n')
+        if lines[-1] == '':
+            lines.pop()
+        lineCount = writeOutput(lines, output, pageLength, lineLength, lineCount)
+    return lineCount
+
+def convertDocumentToFile(filename: str, data: EnBrailleSettings, outFilename: str,
+                          progress: Optional[EnBrailleProgress] = None, executor: Optional[Executor] = None,
+                          onChapter: Optional[Callable] = None, spine: Optional[list] = None) -> int:
+    """Convert an EPUB or Markdown file and stream the braille to outFilename.
+
+    EPUB books are written chapter by chapter, see epub2brfToFile(), spine
+    is the one of the book if it was read already. A
+    Markdown file is one step of the progress, counted in bytes of the file.
+    Returns the number of written lines.
+    """
+    if filename.endswith('.epub'):
+        from enbraille_core.epub import epub2brfToFile
+        return epub2brfToFile(filename, data, outFilename, progress, executor, onChapter, spine)
+    elif not filename.endswith('.md'):
+        raise ValueError('Unsupported file format')
+    with open(filename, 'r') as f:
+        mdContent = f.read()
+    if progress:
+        progress.total = os.path.getsize(filename)
+        progress.checkCancelled()
+    data = EnBrailleSettings.fromData(data)
+    with open(outFilename, 'w', encoding='utf-8') as output:
+        lineCount = paginateDocument([markdown2brf(mdContent, data)], output, data)
+    if progress:
+        progress.advance(progress.total)
+    return lineCount
+
+def convertDocument(filename: str, data: EnBrailleSettings) -> str:
+    """Convert an EPUB or Markdown file to braille.
+
+    EPUB books are converted from their XHTML directly, only Markdown files
+    are parsed as Markdown.
+    """
+    if filename.endswith('.epub'):
+        # imported here, enbraille_core.epub builds on this module
+        from enbraille_core.epub import epub2brf
+        return epub2brf(filename, data)
+    elif filename.endswith('.md'):
+        with open(filename, 'r') as f:
+            mdContent = f.read()
+    else:
+        raise ValueError('Unsupported file format')
+    logging.debug("Markdown content: %s", mdContent)
+    output = io.StringIO()
+    paginateDocument([markdown2brf(mdContent, data)], output, EnBrailleSettings.fromData(data))
+    return output.getvalue()
@@ -0,0 +1,280 @@
+#
+# Copyright (c) 2024 Stefan Lohmaier.
+#
+# This file is part of EnBraille 
+# (see https://github.com/slohmaier/EnBraille).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Direct conversion of EPUB books to braille.
+
+Every XHTML document of the spine is parsed once and its body is converted
+by EnBrailleMd2BRF, without the round trip through Markdown text.
+"""
+import html.entities
+import io
+import logging
+import os
+import re
+import xml.etree.ElementTree as etree
+import zipfile
+from collections import deque
+from concurrent.futures import Executor
+from itertools import islice
+from typing import Callable, Iterator, Optional
+from urllib.parse import urlparse
+
+from enbraille_core.document import _INLINETAGS, EnBrailleMd2BRF, paginateDocument
+from enbraille_core.settings import EnBrailleSettings
+from enbraille_tools import EnBrailleProgress
+from tools.util_epub import Epub
+
+# elements the converter handles under their own name
+_KNOWNTAGS = frozenset(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'blockquote', 'pre', 'hr',
+                        'table', 'thead', 'tbody', 'tfoot', 'tr', 'td', 'th', 'dl', 'dt', 'dd']) | _INLINETAGS
+
+# XHTML elements -> the elements of the converter, everything else is a div
+_XHTMLTAGS = {
+    'i': 'em', 'cite': 'em', 'dfn': 'em', 'var': 'em',
+    'b': 'strong',
+    's': 'del', 'strike': 'del',
+    'u': 'ins',
+    'kbd': 'code', 'samp': 'code', 'tt': 'code',
+    'abbr': 'span', 'acronym': 'span', 'big': 'span', 'small': 'span', 'font': 'span', 'label': 'span',
+    'mark': 'span', 'q': 'span', 'time': 'span', 'data': 'span', 'bdi': 'span', 'bdo': 'span', 'ruby': 'span',
+}
+
+# elements without readable text, their tails are kept
+_XHTMLDROP = frozenset(['head', 'title', 'script', 'style', 'noscript', 'svg', 'math', 'object', 'audio', 'video',
+                        'iframe', 'canvas', 'rt', 'rp', 'col', 'colgroup'])
+
+# per worker process, the converter keeps its braille table loaded between the chapters
+_chapterConverters: dict[EnBrailleSettings, EnBrailleMd2BRF] = {}
+# chapters submitted to the executor ahead of the one being paginated
+_CHAPTERWINDOW = 2 * (os.cpu_count() or 1)
+
+# whitespace of HTML, without the no-break space
+_WHITESPACE = re.compile(r'[ \t\n\r\f]+')
+_ENTITY = re.compile(rb'&([A-Za-z][A-Za-z0-9]*);')
+_XMLENTITIES = frozenset(['amp', 'lt', 'gt', 'quot', 'apos'])
+
+def _xhtmlParser() -> etree.XMLParser:
+    parser = etree.XMLParser()
+    # XHTML 1.1 documents of EPUB 2 books use the named entities of HTML
+    parser.entity.update((name, chr(codepoint)) for name, codepoint in html.entities.name2codepoint.items())
+    return parser
+
+def _numericEntity(match: re.Match) -> bytes:
+    name = match.group(1).decode('ascii')
+    if name in _XMLENTITIES or name not in html.entities.name2codepoint:
+        return match.group(0)
+    return b'&#%d;' % html.entities.name2codepoint[name]
+
+def _trim(text: Optional[str], left: bool, right: bool) -> Optional[str]:
+    if not text:
+        return text
+    text = _WHITESPACE.sub(' ', text)
+    if left:
+        text = text.lstrip(' ')
+    if right:
+        text = text.rstrip(' ')
+    return text
+
+def _normalize(body: etree.Element) -> None:
+    """Rename the elements of body for the converter and drop the whitespace of the markup.
+
+    Walks the tree with an explicit stack like the converter.
+    """
+    body.tag = 'div'
+    stack = [(body, False)]
+    while stack:
+        parent, preformatted = stack.pop()
+        kept = []
+        for child in list(parent):
+            tag = child.tag.rpartition('}')[2]
+            if tag in _XHTMLDROP:
+                if kept:
+                    kept[-1].tail = (kept[-1].tail or '') + (child.tail or '')
+                else:
+                    parent.text = (parent.text or '') + (child.tail or '')
+                parent.remove(child)
+                continue
+            child.tag = _XHTMLTAGS.get(tag, tag if tag in _KNOWNTAGS else 'div')
+            if child.tag == 'a':
+                # links into the book can not be followed in braille
+                href = child.get('href')
+                if href is not None and not urlparse(href).scheme:
+                    del child.attrib['href']
+            kept.append(child)
+            stack.append((child, preformatted or child.tag == 'pre'))
+
+        if preformatted:
+            if parent.tag == 'pre' and parent.text and parent.text.startswith('\n'):
+                parent.text = parent.text[1:]
+        elif parent.tag in _INLINETAGS:
+            parent.text = _trim(parent.text, False, False)
+            for child in kept:
+                child.tail = _trim(child.tail, False, False)
+        else:
+            # whitespace next to the start, the end and the blocks of a block is layout
+            blocks = [child.tag not in _INLINETAGS for child in kept]
+            parent.text = _trim(parent.text, True, not kept or blocks[0])
+            for i, child in enumerate(kept):
+                child.tail = _trim(child.tail, blocks[i], i + 1 == len(kept) or blocks[i + 1])
+
+def xhtml2tree(content: bytes) -> etree.Element:
+    """Parse an XHTML document into the tree EnBrailleMd2BRF converts.
+
+    Returns the body of the document as a div.
+    """
+    try:
+        root = etree.fromstring(content, parser=_xhtmlParser())
+    except etree.ParseError:
+        # named entities of HTML without a DOCTYPE declaring them
+        root = etree.fromstring(_ENTITY.sub(_numericEntity, content), parser=_xhtmlParser())
+    body = next((child for child in root if child.tag.rpartition('}')[2] == 'body'), None)
+    if body is None:
+        body = etree.Element('div')
+    _normalize(body)
+    return body
+
+class EnBrailleChapter:
+    """A document in the spine of an EPUB book.
+
+    size is its uncompressed size in bytes, the unit of the progress. title
+    is the name in the table of contents or the file name.
+    """
+    __slots__ = ('index', 'name', 'size', 'title')
+
+    def __init__(self, index: int, name: str, size: int, title: str) -> None:
+        self.index = index
+        self.name = name
+        self.size = size
+        self.title = title
+
+    def __repr__(self) -> str:
+        return 'EnBrailleChapter({}, {!r}, {}, {!r})'.format(self.index, self.name, self.size, self.title)
+
+def epubSpine(filename: str) -> list[EnBrailleChapter]:
+    """The XHTML documents in the spine of an EPUB book."""
+    epub = Epub(filename)
+    try:
+        epub.initialize()
+        titles = [' '.join((title or '').split()) for title in epub.toc_entries]
+        return [EnBrailleChapter(i, name, epub.file.getinfo(name).file_size,
+                                 title if title and title != '-' else os.path.basename(name))
+                for i, (name, title) in enumerate(zip(epub.contents, titles))]
+    finally:
+        epub.file.close()
+
+def epub2brf(filename: str, data: EnBrailleSettings, progress: Optional[EnBrailleProgress] = None,
+             onChapter: Optional[Callable[[EnBrailleChapter, int], None]] = None,
+             executor: Optional[Executor] = None, spine: Optional[list[EnBrailleChapter]] = None) -> str:
+    """Convert the documents in the spine of an EPUB book to paginated braille.
+
+    With an executor every document of the spine is converted on its own by
+    a worker. The pagination runs sequentially over the chapters in spine
+    order, so the page numbers continue across chapters and the result is
+    the same either way. Progress advances by the size of every finished
+    chapter; on cancellation the chapters not yet started are dropped. A
+    spine already read by epubSpine() is not read again.
+    """
+    data = EnBrailleSettings.fromData(data)
+    output = io.StringIO()
+    lineCount = paginateDocument(_epubChapters(filename, data, progress, executor, onChapter, spine), output, data)
+    logging.debug('Converted {} to {} lines'.format(filename, lineCount))
+    return output.getvalue()
+
+def epub2brfToFile(filename: str, data: EnBrailleSettings, outFilename: str,
+                   progress: Optional[EnBrailleProgress] = None, executor: Optional[Executor] = None,
+                   onChapter: Optional[Callable[[EnBrailleChapter, int], None]] = None,
+                   spine: Optional[list[EnBrailleChapter]] = None) -> int:
+    """Convert an EPUB book and stream the result to outFilename.
+
+    Every chapter is read, converted, paginated and written before the next
+    one is read, so memory use is bounded by the largest chapter instead of
+    the book. With an executor a few chapters are converted ahead in
+    parallel. Returns the number of written lines.
+    """
+    data = EnBrailleSettings.fromData(data)
+    with open(outFilename, 'w', encoding='utf-8') as output:
+        lineCount = paginateDocument(_epubChapters(filename, data, progress, executor, onChapter, spine), output, data)
+    logging.debug('Converted {} to {} lines'.format(filename, lineCount))
+    return lineCount
+
+def _epubChapters(filename: str, data: EnBrailleSettings, progress: Optional[EnBrailleProgress] = None,
+                  executor: Optional[Executor] = None,
+                  onChapter: Optional[Callable[[EnBrailleChapter, int], None]] = None,
+                  spine: Optional[list[EnBrailleChapter]] = None) -> Iterator[str]:
+    """The braille of the documents in the spine, in spine order.
+
+    With an executor up to _CHAPTERWINDOW chapters are converted ahead, the
+    later ones are only submitted when the first is taken, so the results
+    waiting for the pagination stay bounded. The total of progress is set to
+    the size of the spine. onChapter is called with every chapter and the
+    number of chapters once the chapter is written.
+    """
+    filename = os.path.abspath(filename)
+    if spine is None:
+        spine = epubSpine(filename)
+    if progress:
+        progress.total = sum(chapter.size for chapter in spine)
+    if executor is None:
+        converter = EnBrailleMd2BRF(data)
+        with zipfile.ZipFile(filename) as book:
+            for chapter in spine:
+                if progress:
+                    progress.checkCancelled()
+                yield converter.run(xhtml2tree(book.read(chapter.name)))
+                _chapterDone(chapter, len(spine), progress, onChapter)
+        return
+
+    pending = deque()
+    chapters = iter(spine)
+    try:
+        for chapter in islice(chapters, _CHAPTERWINDOW):
+            pending.append((executor.submit(_convertChapter, filename, chapter.name, data), chapter))
+        while pending:
+            if progress:
+                progress.checkCancelled()
+            future, chapter = pending.popleft()
+            for nextChapter in islice(chapters, 1):
+                pending.append((executor.submit(_convertChapter, filename, nextChapter.name, data), nextChapter))
+            yield future.result()
+            _chapterDone(chapter, len(spine), progress, onChapter)
+    finally:
+        # cancelled or failed, the chapters not yet started are dropped
+        for future, _ in pending:
+            future.cancel()
+
+def _chapterDone(chapter: EnBrailleChapter, chapterCount: int, progress: Optional[EnBrailleProgress],
+                 onChapter: Optional[Callable[[EnBrailleChapter, int], None]]) -> None:
+    if progress:
+        progress.advance(chapter.size)
+    if onChapter:
+        onChapter(chapter, chapterCount)
+
+def _chapterConverter(settings: EnBrailleSettings) -> EnBrailleMd2BRF:
+    converter = _chapterConverters.get(settings)
+    if converter is None:
+        # only the converter of the current job is kept
+        _chapterConverters.clear()
+        converter = _chapterConverters[settings] = EnBrailleMd2BRF(settings)
+    return converter
+
+def _convertChapter(filename: str, name: str, settings: EnBrailleSettings) -> str:
+    # entry point for the worker processes
+    with zipfile.ZipFile(filename) as book:
+        content = book.read(name)
+    return _chapterConverter(settings).run(xhtml2tree(content))
@@ -0,0 +1,927 @@
+#
+# Copyright (c) 2024 Stefan Lohmaier.
+#
+# This file is part of EnBraille 
+# (see https://github.com/slohmaier/EnBraille).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+import errno
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+from array import array
+from bisect import bisect_right
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+from enbraille_core.settings import EnBrailleSettings
+from enbraille_tools import EnBrailleLineStore, EnBrailleProgress, reformatPragraph, writeOutput
+
+# BRF is 7-bit ASCII, so the bytes mode treats every byte as one cell. Bytes
+# outside ASCII are carried through unchanged via surrogateescape.
+_BRFDECODING = ('ascii', 'surrogateescape')
+_BRFENCODING = ('utf-8', 'surrogateescape')
+# ASCII characters str.rstrip() and the str regex \s treat as whitespace
+_BRFWHITESPACE = b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f'
+# files are only split for parallel reformatting in chunks of at least this size
+_PARALLELCHUNKSIZE = 4 * 1024 * 1024
+# kept in the output folder of EnBrailleReformatBatch
+_MANIFESTFILENAME = '.enbraille_manifest.json'
+# the settings an output in the manifest depends on
+_REFORMATSETTINGS = ('reformatLineLength', 'reformatPageLength', 'reformatWordSplitter', 'reformatKeepPageNo')
+# EnBrailleBrfIndex files, in the cache folder, never next to the BRF file
+_INDEXSUFFIX = '.enbidx'
+_INDEXMAGIC = b'EnBrailleBrfIndex 3\n'
+# indexed paragraph offsets tried per chunk and bytes read to check one of them
+_INDEXCANDIDATES = 64
+_INDEXLINEWINDOW = 4096
+# the preview reads at most this many bytes from the start of the file
+_PREVIEWBYTES = 64 * 1024
+# pages are sampled in this many windows of this size, smaller files are read completely
+_SAMPLECOUNT = 32
+_SAMPLEWINDOW = 64 * 1024
+# characters str.splitlines() breaks lines at
+_LINEBREAKS = '\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+
+class EnBrailleReformater:
+    _pagenoregex = re.compile(r'^\s+\#\w+$')
+    _pagenobytesregex = re.compile(rb'^[\t-\r\x1c-\x20]+\#[0-9A-Za-z_]+$')
+    _pagenoprefix = '\t'
+
+    def __init__(self, filename: str, analyze: bool = True, cacheDir: Optional[str] = None) -> None:
+        self._filename = filename
+        self._index = None
+        self._cacheDir = cacheDir
+        if analyze and cacheDir is not None:
+            self.loadIndex(cacheDir)
+        elif analyze:
+            self._loadFile()
+
+    def loadIndex(self, cacheDir: Optional[str] = None) -> 'EnBrailleBrfIndex':
+        """Take the file characteristics from its index, building it if needed."""
+        self._index = EnBrailleBrfIndex.forFile(self._filename, cacheDir or self._cacheDir)
+        self._maxLineLength = self._index.maxLineLength
+        self._pageLength = self._index.pageLength
+        return self._index
+
+    @property
+    def index(self) -> Optional['EnBrailleBrfIndex']:
+        return self._index
+
+    def detectCharacteristics(self, cacheDir: Optional[str] = None, exact: bool = False) -> bool:
+        """Detect maxLineLength and pageLength, returns whether they are exact.
+
+        A valid index gives the exact values right away. Small files, or all
+        files if exact is set, are read completely and indexed. Otherwise
+        _SAMPLECOUNT windows spread across the file are read; the page length
+        is the most common one among them and the maximum line length is the
+        longest line seen.
+        """
+        cacheDir = cacheDir or self._cacheDir
+        index = EnBrailleBrfIndex.find(self._filename, cacheDir)
+        if index is None and (exact or os.path.getsize(self._filename) <= _SAMPLECOUNT * _SAMPLEWINDOW):
+            index = EnBrailleBrfIndex.forFile(self._filename, cacheDir)
+        if index is not None:
+            self._index = index
+            self._maxLineLength = index.maxLineLength
+            self._pageLength = index.pageLength
+            return True
+        self._maxLineLength, self._pageLength = self._sampleCharacteristics(_SAMPLECOUNT, _SAMPLEWINDOW)
+        return False
+
+    def _sampleCharacteristics(self, sampleCount: int, window: int) -> tuple[int, int]:
+        size = os.path.getsize(self._filename)
+        maxLineLength = 0
+        pageLengths = {}
+        with open(self._filename, 'rb') as f:
+            for i in range(sampleCount):
+                offset = max(0, size - window) * i // max(1, sampleCount - 1)
+                f.seek(offset)
+                lines = f.read(window).decode('utf-8', 'replace').splitlines()
+                # the lines at the window borders might be cut
+                if offset + window < size and lines:
+                    lines.pop()
+                if offset > 0:
+                    lines = lines[1:]
+                # page lengths count from the start of the file or a page number line
+                lineCount = 0 if offset == 0 else None
+                for line in lines:
+                    maxLineLength = max(maxLineLength, len(line))
+                    if lineCount is not None:
+                        lineCount += 1
+                    if self._pagenoregex.match(line):
+                        if lineCount is not None:
+                            pageLengths[lineCount] = pageLengths.get(lineCount, 0) + 1
+                        lineCount = 0
+
+        pageLength = 0
+        maxCount = 0
+        for length, count in pageLengths.items():
+            if count > maxCount:
+                maxCount = count
+                pageLength = length
+        logging.debug('Sampled {}: max line length {}, page length {}'.format(self._filename, maxLineLength, pageLength))
+        return maxLineLength, pageLength
+
+    def _loadFile(self) -> str:
+        with open(self._filename, 'r') as f:
+            data = f.read()
+
+            self._maxLineLength = 0
+            self._pageLength = 0
+            linecount = 0
+            pageLengths = []
+            for line in data.splitlines():
+                # detect maximum line length
+                self._maxLineLength = max(self._maxLineLength, len(line))
+            
+                # count pagelength
+                linecount += 1
+                if self._pagenoregex.match(line):
+                    pageLengths.append(linecount)
+                    linecount = 0
+            
+            # calculate pagelength with most occurences
+            self._pageLength = 0
+            if pageLengths:
+                counts = {}
+                for pageLength in pageLengths:
+                    counts[pageLength] = counts.get(pageLength, 0) + 1
+                pageLength = 0
+                maxCount = 0
+                for pageLength, count in counts.items():
+                    if count > maxCount:
+                        maxCount = count
+                        self._pageLength = pageLength
+    
+    def reformat(self, progress: Optional[EnBrailleProgress], data: EnBrailleSettings) -> str:
+        data = reformatSettings(data)
+        # If line length is 0, return empty string (no reformatting)
+        if data.reformatLineLength == 0:
+            return ''
+            
+        # newline='' keeps the line ends, so progress counts the bytes of the file
+        with open(self._filename, 'r', newline='') as f:
+            paragraphs = self._parseParagraphs(f, data, progress)
+            lines = EnBrailleLineStore(self._layoutTextParagraphs(paragraphs, data, progress))
+            logging.debug('Reformated to {} lines'.format(len(lines)))
+            return lines.output(data.reformatPageLength, data.reformatLineLength)
+
+    def reformatPreview(self, data: EnBrailleSettings, pageCount: int, maxBytes: int = _PREVIEWBYTES) -> str:
+        """Reformat only the start of the file, enough for pageCount pages.
+
+        At most maxBytes of whole lines are read, so the time neither depends
+        on the size of the file nor on the length of its paragraphs; a
+        paragraph cut off there ends early. Without pagination the preview is
+        as long as pageCount default pages.
+        """
+        data = reformatSettings(data)
+        if data.reformatLineLength == 0:
+            return ''
+
+        lineCount = pageCount * (data.reformatPageLength if data.reformatPageLength > 0 else 25)
+        with open(self._filename, 'rb') as f:
+            content = f.read(maxBytes + 1)
+        if len(content) > maxBytes:
+            # drop the line cut off at maxBytes, unless it is the only one
+            end = max(content.rfind(b'\n', 0, maxBytes), content.rfind(b'\r', 0, maxBytes)) + 1
+            content = content[:end or maxBytes]
+        # decode like open(filename, 'r') does
+        paragraphs = self._parseParagraphs(io.TextIOWrapper(io.BytesIO(content)), data)
+        lines = EnBrailleLineStore(islice(self._layoutTextParagraphs(paragraphs, data), lineCount))
+        return lines.output(data.reformatPageLength, data.reformatLineLength)
+
+    def reformatParallel(self, progress: Optional[EnBrailleProgress], data: EnBrailleSettings, executor: Executor, chunkCount: int) -> str:
+        """Reformat the file in up to chunkCount chunks on executor.
+
+        The chunks are split at paragraph boundaries and laid out in parallel.
+        The pagination runs sequentially over the stitched lines, so the page
+        numbers continue across chunks and the result equals reformat().
+        Progress advances per finished chunk; on cancellation the chunks not
+        yet started are dropped.
+        """
+        data = reformatSettings(data)
+        if data.reformatLineLength == 0:
+            return ''
+
+        offsets = self._findChunkOffsets(data, chunkCount)
+        logging.debug('Reformating {} in {} chunks'.format(self._filename, len(offsets) + 1))
+        futures = [executor.submit(_reformatChunk, self._filename, start, end, data)
+                   for start, end in zip([0] + offsets, offsets + [None])]
+
+        output = io.BytesIO()
+        lineCount = 0
+        size = os.path.getsize(self._filename)
+        for future, start, end in zip(futures, [0] + offsets, offsets + [size]):
+            if progress and progress.cancelled:
+                for pending in futures:
+                    pending.cancel()
+                progress.checkCancelled()
+            lineCount = future.result().write(output, data.reformatPageLength, data.reformatLineLength, lineCount)
+            if progress:
+                progress.advance(end - start)
+        logging.debug('Reformated to {} lines'.format(lineCount))
+        return output.getvalue().decode(*_BRFENCODING)
+
+    def _reformatRange(self, data: EnBrailleSettings, start: int, end: Optional[int]) -> EnBrailleLineStore:
+        """Lay out the lines between the byte offsets start and end without pagination.
+
+        start and end have to be paragraph boundaries as found by _findChunkOffsets.
+        """
+        with open(self._filename, 'rb') as f:
+            f.seek(start)
+            content = f.read(-1 if end is None else end - start)
+        # decode like open(filename, 'r') does
+        paragraphs = list(self._parseParagraphs(io.TextIOWrapper(io.BytesIO(content)), data))
+        if end is not None:
+            # the chunk ends with a closed paragraph, drop the empty one opened after it
+            paragraphs.pop()
+        # a line store pickles as one buffer instead of a str per line
+        return EnBrailleLineStore(self._layoutTextParagraphs(paragraphs, data))
+
+    def _findChunkOffsets(self, data: EnBrailleSettings, chunkCount: int) -> list[int]:
+        """Find up to chunkCount-1 byte offsets at which the file can be split.
+
+        Takes the first paragraph offset of the index after evenly spaced
+        positions that is a boundary with these settings too. Without an
+        index, or if none of the offsets is, it seeks to the position and
+        scans forward to the next paragraph boundary. Either way only a small
+        part of the file is read.
+        """
+        size = os.path.getsize(self._filename)
+        index = self._index or EnBrailleBrfIndex.find(self._filename, self._cacheDir)
+        offsets = []
+        with open(self._filename, 'rb') as f:
+            for i in range(1, chunkCount):
+                target = size * i // chunkCount
+                if offsets and target < offsets[-1]:
+                    continue
+                offset = self._findIndexedBoundary(f, index, target, data) if index is not None else None
+                if offset is None:
+                    offset = self._findParagraphBoundary(f, target, data)
+                if offset is None or offset >= size:
+                    break
+                offsets.append(offset)
+        return offsets
+
+    def _findIndexedBoundary(self, inputFile: BinaryIO, index: 'EnBrailleBrfIndex', offset: int,
+                             data: EnBrailleSettings) -> Optional[int]:
+        """Return the first paragraph offset of index after offset that is a boundary with data."""
+        wordSplitter = data.reformatWordSplitter.encode(*_BRFENCODING)
+        shortLine = data.reformatLineLength - 4
+        paragraphOffsets = index.paragraphOffsets
+        first = bisect_right(paragraphOffsets, offset)
+        for candidate in paragraphOffsets[first:first + _INDEXCANDIDATES]:
+            # read back the line that ends at the candidate
+            start = max(0, candidate - _INDEXLINEWINDOW)
+            inputFile.seek(start)
+            lines = inputFile.read(candidate - start).splitlines()
+            if (len(lines) > 1 or start == 0) and self._endsParagraph(lines[-1], shortLine, wordSplitter):
+                return candidate
+        return None
+
+    def _findParagraphBoundary(self, inputFile: BinaryIO, offset: int, data: EnBrailleSettings) -> Optional[int]:
+        """Return the offset after the first paragraph end following offset.
+
+        At such a boundary the paragraph parser has no open paragraph and no
+        pending word remainder, so the rest of the file can be parsed on its own.
+        """
+        wordSplitter = data.reformatWordSplitter.encode(*_BRFENCODING)
+        shortLine = data.reformatLineLength - 4
+
+        inputFile.seek(offset)
+        lines = self._readLinesBytes(inputFile, 64 * 1024, keepends=True)
+        # skip the rest of the line offset points into
+        position = offset + len(next(lines, b''))
+        for line in lines:
+            position += len(line)
+            if self._endsParagraph(line, shortLine, wordSplitter):
+                return position
+        return None
+
+    def _endsParagraph(self, line: bytes, shortLine: int, wordSplitter: bytes) -> bool:
+        line = line.rstrip(_BRFWHITESPACE)
+        # non ASCII lines might be treated differently when decoded as text
+        if len(line) >= shortLine or not line.isascii() or self._pagenobytesregex.match(line):
+            return False
+        words = line.split(b' ')
+        # the parser carries words[-1][:-1] over to the next line, whatever the length of the splitter
+        return not (len(words) > 1 and words[-1].endswith(wordSplitter) and len(words[-1]) > 1)
+
+    def _layoutTextParagraphs(self, paragraphs: Iterable[str], data: EnBrailleSettings,
+                              progress: Optional[EnBrailleProgress] = None) -> Iterator[str]:
+        lineLength = data.reformatLineLength
+        wordSplitter = data.reformatWordSplitter
+        for paragraph in paragraphs:
+            if progress:
+                progress.checkCancelled()
+            if len(paragraph) > 0 and paragraph[0] == self._pagenoprefix:
+                pageStr = paragraph.strip()
+                pageStr = ' '* (lineLength - len(pageStr) - 1) + pageStr
+                logging.debug('added page number in output: ' + pageStr)
+                yield pageStr
+            else:
+                yield from reformatPragraph(paragraph, lineLength, wordSplitter)
+
+    def reformatBytes(self, progress: Optional[EnBrailleProgress], data: EnBrailleSettings) -> bytes:
+        """Reformat the file without decoding it as text.
+
+        Produces the same output as reformat() for 7-bit BRF, encoded as bytes.
+        """
+        data = reformatSettings(data)
+        if data.reformatLineLength == 0:
+            return b''
+
+        with open(self._filename, 'rb') as f:
+            paragraphs = self._parseParagraphsBytes(f.read(), data, progress)
+        output = io.StringIO()
+        lineCount = writeOutput(self._layoutParagraphs(paragraphs, data, progress), output, data.reformatPageLength, data.reformatLineLength)
+        logging.debug('Reformated to {} lines'.format(lineCount))
+        return output.getvalue().encode(*_BRFENCODING)
+
+    def reformatToFile(self, progress: Optional[EnBrailleProgress], data: EnBrailleSettings, outFilename: str) -> int:
+        """Reformat the file and stream the result to outFilename.
+
+        Paragraphs are read, laid out and paginated one at a time, so memory
+        use is bounded by the longest paragraph instead of the file size.
+        Returns the number of written lines.
+        """
+        data = reformatSettings(data)
+        with open(self._filename, 'rb') as inputFile, \
+             open(outFilename, 'w', encoding=_BRFENCODING[0], errors=_BRFENCODING[1]) as outputFile:
+            if data.reformatLineLength == 0:
+                return 0
+            paragraphs = self._iterParagraphsBytes(self._readLinesBytes(inputFile, keepends=True), data, progress)
+            lineCount = writeOutput(self._layoutParagraphs(paragraphs, data, progress), outputFile, data.reformatPageLength, data.reformatLineLength)
+        logging.debug('Reformated to {} lines'.format(lineCount))
+        return lineCount
+
+    def _layoutParagraphs(self, paragraphs: Iterable[bytes], data: EnBrailleSettings,
+                          progress: Optional[EnBrailleProgress] = None) -> Iterator[str]:
+        lineLength = data.reformatLineLength
+        wordSplitter = data.reformatWordSplitter
+        for paragraph in paragraphs:
+            if progress:
+                progress.checkCancelled()
+            if paragraph[:1] == b'\t':
+                pageStr = paragraph.strip(_BRFWHITESPACE).decode(*_BRFDECODING)
+                pageStr = ' '* (lineLength - len(pageStr) - 1) + pageStr
+                logging.debug('added page number in output: ' + pageStr)
+                yield pageStr
+            else:
+                yield from reformatPragraph(paragraph.decode(*_BRFDECODING), lineLength, wordSplitter)
+    
+    def _parseParagraphs(self, inputFile, data: EnBrailleSettings, progress: Optional[EnBrailleProgress] = None) -> Iterator[str]:
+        # The words of the open paragraph are collected and joined once when
+        # it is closed, so long paragraphs take linear time. The file is read
+        # line by line, so the layout runs while parsing and progress follows
+        # the position in the file, in bytes like the other reformat paths.
+        encoding = inputFile.encoding if progress else None
+        wordSplitter = data.reformatWordSplitter
+        keepPageNo = data.reformatKeepPageNo
+        shortLine = data.reformatLineLength - 4
+        pagenoMatch = self._pagenoregex.match
+
+        words = []
+        wordRemainder = ''
+        lineCount = 0
+        paragraphCount = 1
+        for line in inputFile:
+            if progress:
+                progress.checkCancelled()
+                progress.advance(len(line) if line.isascii() else len(line.encode(encoding)))
+            lineCount += 1
+
+            #strip trailing ' ', '\n' and '\r'
+            line = line.rstrip()
+
+            if pagenoMatch(line):
+                if keepPageNo:
+                    yield ' '.join(words) + ' ' if words else ''
+                    yield self._pagenoprefix + line
+                    words = []
+                    paragraphCount += 2
+            else:
+                if line.startswith(' ') and words:
+                    yield ' '.join(words) + ' '
+                    words = []
+                    paragraphCount += 1
+
+                lineWords = line.split(' ')
+
+                if wordRemainder:
+                    lineWords[0] = wordRemainder + lineWords[0]
+                    wordRemainder = ''
+
+                if lineWords[-1].endswith(wordSplitter) and len(lineWords) > 1:
+                    wordRemainder = lineWords.pop()[:-1]
+
+                words.extend(word for word in lineWords if word)
+
+                if len(line) < shortLine:
+                    yield ' '.join(words) + ' ' if words else ''
+                    words = []
+                    paragraphCount += 1
+
+        logging.debug('Parsed {} lines to {} paragraphs'.format(lineCount, paragraphCount))
+        yield ' '.join(words) + ' ' if words else ''
+
+    def _parseParagraphsBytes(self, content: bytes, data: EnBrailleSettings,
+                              progress: Optional[EnBrailleProgress] = None) -> list[bytearray]:
+        paragraphs = list(self._iterParagraphsBytes(content.splitlines(keepends=True), data, progress))
+        logging.debug('Found {} paragraphs'.format(len(paragraphs)))
+        return paragraphs
+
+    @staticmethod
+    def _readLinesBytes(inputFile: BinaryIO, chunkSize: int = 1024 * 1024, keepends: bool = False) -> Iterator[bytes]:
+        """Yield the lines of a binary file like bytes.splitlines() would."""
+        remainder = b''
+        while True:
+            chunk = inputFile.read(chunkSize)
+            if not chunk:
+                break
+            lines = (remainder + chunk).splitlines(keepends=True)
+            # a trailing '\r' might be the first half of '\r\n'
+            remainder = lines.pop() if not lines[-1].endswith(b'\n') else b''
+            for line in lines:
+                yield line if keepends else line.rstrip(b'\r\n')
+        if remainder:
+            yield remainder if keepends else remainder.rstrip(b'\r\n')
+
+    def _iterParagraphsBytes(self, lines: Iterable[bytes], data: EnBrailleSettings,
+                             progress: Optional[EnBrailleProgress] = None) -> Iterator[bytearray]:
+        # same rules as _parseParagraphs, on raw bytes
+        wordSplitter = data.reformatWordSplitter.encode(*_BRFENCODING)
+        keepPageNo = data.reformatKeepPageNo
+        shortLine = data.reformatLineLength - 4
+        pagenoMatch = self._pagenobytesregex.match
+
+        paragraph = bytearray()
+        wordRemainder = b''
+        for line in lines:
+            if progress:
+                progress.checkCancelled()
+                # lines come with their line break, which is stripped below
+                progress.advance(len(line))
+            line = line.rstrip(_BRFWHITESPACE)
+
+            if pagenoMatch(line):
+                if keepPageNo:
+                    yield paragraph
+                    yield bytearray(b'\t' + line)
+                    paragraph = bytearray()
+            else:
+                if line[:1] == b' ' and paragraph:
+                    yield paragraph
+                    paragraph = bytearray()
+
+                words = line.split(b' ')
+
+                if wordRemainder:
+                    words[0] = wordRemainder + words[0]
+                    wordRemainder = b''
+
+                if len(words) > 1 and words[-1].endswith(wordSplitter):
+                    wordRemainder = words[-1][:-1]
+                    words.pop()
+
+                for word in words:
+                    if word:
+                        paragraph += word
+                        paragraph += b' '
+
+                if len(line) < shortLine:
+                    yield paragraph
+                    paragraph = bytearray()
+
+        yield paragraph
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+    
+    @property
+    def maxLineLength(self) -> int:
+        return self._maxLineLength
+    
+    @property
+    def pageLength(self) -> int:
+        return self._pageLength
+
+    @filename.setter
+    def filename(self, value: str) -> None:
+        self._filename = value
+        self._index = None
+        self._loadFile()
+
+class EnBrailleBrfIndex:
+    """Page and paragraph index of a BRF file, stored in a small binary file in the cache folder.
+
+    Holds the byte offsets at which pages start, the maximum line length and
+    the most common page length, counted like EnBrailleReformater._loadFile()
+    does. The paragraph offsets follow the lines that end a paragraph in
+    EnBrailleReformater._parseParagraphs() at the line length of the file;
+    they are candidates to be checked against the settings of a job. It
+    belongs to the size and mtime of the file it was built from and is
+    rebuilt when either changes.
+    """
+
+    def __init__(self, size: int, mtime: int, maxLineLength: int, pageLength: int,
+                 pageOffsets: array, paragraphOffsets: array) -> None:
+        self.size = size
+        self.mtime = mtime
+        self.maxLineLength = maxLineLength
+        self.pageLength = pageLength
+        self.pageOffsets = pageOffsets
+        self.paragraphOffsets = paragraphOffsets
+
+    @property
+    def pageCount(self) -> int:
+        return len(self.pageOffsets)
+
+    def isValidFor(self, filename: str) -> bool:
+        stat = os.stat(filename)
+        return self.size == stat.st_size and self.mtime == stat.st_mtime_ns
+
+    @staticmethod
+    def indexFilename(filename: str, cacheDir: Optional[str] = None) -> str:
+        """Where the index of filename is kept: in cacheDir, else in the temporary folder.
+
+        Never next to the file, its folder belongs to the user or is read-only.
+        """
+        folder = cacheDir or os.path.join(tempfile.gettempdir(), 'EnBraille')
+        key = hashlib.sha1(os.path.abspath(filename).encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(folder, 'brf-index', key + _INDEXSUFFIX)
+
+    @classmethod
+    def forFile(cls, filename: str, cacheDir: Optional[str] = None) -> 'EnBrailleBrfIndex':
+        """Load a valid index of filename or build one.
+
+        A new index is saved, failing to save it is not an error.
+        """
+        index = cls.find(filename, cacheDir)
+        if index is not None:
+            return index
+
+        indexFilename = cls.indexFilename(filename, cacheDir)
+        index = cls.build(filename)
+        try:
+            os.makedirs(os.path.dirname(indexFilename), exist_ok=True)
+            index.save(indexFilename)
+        except OSError as e:
+            logging.debug('Could not save index {}: {}'.format(indexFilename, e))
+        return index
+
+    @classmethod
+    def find(cls, filename: str, cacheDir: Optional[str] = None) -> Optional['EnBrailleBrfIndex']:
+        """Load a valid index of filename if there is one."""
+        indexFilename = cls.indexFilename(filename, cacheDir)
+        index = cls.load(indexFilename)
+        if index is not None and index.isValidFor(filename):
+            logging.debug('Using index ' + indexFilename)
+            return index
+        return None
+
+    @classmethod
+    def build(cls, filename: str) -> 'EnBrailleBrfIndex':
+        stat = os.stat(filename)
+        pagenoMatch = EnBrailleReformater._pagenoregex.match
+        pageOffsets = array('Q', [0])
+        paragraphOffsets = array('Q')
+        maxLineLength = 0
+        lineCount = 0
+        pageLengths = {}
+        offset = 0
+        # decoded like _loadFile(), newline='' keeps the line ends to count the bytes
+        with open(filename, 'r', newline='') as f:
+            encoding = f.encoding
+            for physicalLine in f:
+                for line in physicalLine.splitlines(keepends=True):
+                    offset += len(line) if line.isascii() else len(line.encode(encoding))
+                    line = line.rstrip(_LINEBREAKS)
+                    maxLineLength = max(maxLineLength, len(line))
+
+                    lineCount += 1
+                    if pagenoMatch(line):
+                        pageLengths[lineCount] = pageLengths.get(lineCount, 0) + 1
+                        lineCount = 0
+                        if offset < stat.st_size:
+                            pageOffsets.append(offset)
+
+                # the parser reads physical lines, one shorter than the longest so far ends a paragraph
+                line = physicalLine.rstrip()
+                if (len(line) < maxLineLength - 4 and line.isascii() and not pagenoMatch(line)
+                        and offset < stat.st_size):
+                    paragraphOffsets.append(offset)
+
+        # page length with most occurences, the first one on a tie
+        pageLength = 0
+        maxCount = 0
+        for length, count in pageLengths.items():
+            if count > maxCount:
+                maxCount = count
+                pageLength = length
+        return cls(stat.st_size, stat.st_mtime_ns, maxLineLength, pageLength, pageOffsets, paragraphOffsets)
+
+    @classmethod
+    def load(cls, indexFilename: str) -> Optional['EnBrailleBrfIndex']:
+        try:
+            with open(indexFilename, 'rb') as f:
+                if f.readline() != _INDEXMAGIC:
+                    return None
+                header = json.loads(f.readline())
+                pageOffsets = array('Q')
+                pageOffsets.fromfile(f, header['pages'])
+                paragraphOffsets = array('Q')
+                paragraphOffsets.fromfile(f, header['paragraphs'])
+        except (OSError, ValueError, KeyError, EOFError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logging.debug('Ignoring broken index {}: {}'.format(indexFilename, e))
+            return None
+        if header.get('byteorder') != sys.byteorder:
+            pageOffsets.byteswap()
+            paragraphOffsets.byteswap()
+        return cls(header['size'], header['mtime'], header['maxLineLength'], header['pageLength'],
+                   pageOffsets, paragraphOffsets)
+
+    def save(self, indexFilename: str) -> None:
+        header = {'size': self.size, 'mtime': self.mtime, 'maxLineLength': self.maxLineLength,
+                  'pageLength': self.pageLength, 'pages': len(self.pageOffsets), 'paragraphs': len(self.paragraphOffsets),
+                  'byteorder': sys.byteorder}
+        tmpFilename = indexFilename + '.tmp'
+        with open(tmpFilename, 'wb') as f:
+            f.write(_INDEXMAGIC)
+            f.write(json.dumps(header).encode('ascii') + b'\n')
+            self.pageOffsets.tofile(f)
+            self.paragraphOffsets.tofile(f)
+        os.replace(tmpFilename, indexFilename)
+
+def reformatSettings(data: EnBrailleSettings) -> EnBrailleSettings:
+    """Snapshot the settings once per job, the snapshot pickles for worker processes."""
+    return EnBrailleSettings.fromData(data)
+
+def _reformatChunk(filename: str, start: int, end: Optional[int], settings: EnBrailleSettings) -> EnBrailleLineStore:
+    # entry point for the worker processes
+    return EnBrailleReformater(filename, analyze=False)._reformatRange(settings, start, end)
+
+def _reformatFileTo(filename: str, outFilename: str, settings: EnBrailleSettings) -> int:
+    # entry point for the worker processes, replaces outFilename only when done
+    tmpFilename = outFilename + '.tmp'
+    try:
+        lineCount = EnBrailleReformater(filename, analyze=False).reformatToFile(None, settings, tmpFilename)
+        os.replace(tmpFilename, outFilename)
+    finally:
+        if os.path.exists(tmpFilename):
+            os.unlink(tmpFilename)
+    return lineCount
+
+def outputFilename(folder: str, filename: str) -> str:
+    """Name of the reformatted file in folder: _EnBraille is added before the extension."""
+    base, ext = os.path.splitext(os.path.basename(filename))
+    return os.path.join(folder, base + '_EnBraille' + ext)
+
+def _hashFile(filename: str) -> str:
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class EnBrailleReformatBatch:
+    """Reformat files into a folder, skipping those unchanged since the last run.
+
+    A manifest in the folder maps every input file to its size, mtime and
+    content hash, the reformat settings and the output file. A file whose
+    size and mtime did not change is skipped after a stat() only. A file
+    with a new mtime is hashed, so touched but unchanged files are skipped too.
+    """
+
+    def __init__(self, folder: str) -> None:
+        self._folder = folder
+        self._manifestFilename = os.path.join(folder, _MANIFESTFILENAME)
+        self._manifest = self._loadManifest()
+
+    def _loadManifest(self) -> dict:
+        try:
+            with open(self._manifestFilename, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if isinstance(manifest, dict):
+                return manifest
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.debug('Ignoring unreadable manifest {}: {}'.format(self._manifestFilename, e))
+        return {}
+
+    def _saveManifest(self) -> None:
+        tmpFilename = self._manifestFilename + '.tmp'
+        with open(tmpFilename, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest, f, indent=1)
+        os.replace(tmpFilename, self._manifestFilename)
+
+    @property
+    def folder(self) -> str:
+        return self._folder
+
+    def outputFilename(self, filename: str) -> str:
+        return outputFilename(self._folder, filename)
+
+    def isUpToDate(self, filename: str, settings: dict) -> bool:
+        """Check whether the output of filename matches its content and settings.
+
+        Updates the recorded stat of files that were touched without changing.
+        """
+        entry = self._manifest.get(os.path.abspath(filename))
+        output = self.outputFilename(filename)
+        if entry is None or entry.get('settings') != settings or entry.get('output') != output or not os.path.isfile(output):
+            return False
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return False
+        if entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime_ns:
+            return True
+        if entry.get('size') != stat.st_size or entry.get('hash') != _hashFile(filename):
+            return False
+        logging.debug('{} was touched but did not change'.format(filename))
+        entry['mtime'] = stat.st_mtime_ns
+        return True
+
+    def reformat(self, filenames: list[str], data: EnBrailleSettings, executor: Optional[Executor] = None,
+                 progress: Optional[EnBrailleProgress] = None) -> list[str]:
+        """Reformat the new and changed files among filenames into the folder.
+
+        Runs on executor if given, else on a single worker thread. Returns the
+        reformatted files; their outputs are replaced only once complete.
+        Failures are raised after the manifest was saved for all other files.
+        """
+        os.makedirs(self._folder, exist_ok=True)
+        settings = reformatSettings(data)
+        settingsKey = {name: getattr(settings, name) for name in _REFORMATSETTINGS}
+        pending = []
+        for filename in filenames:
+            if progress:
+                progress.checkCancelled()
+            if self.isUpToDate(filename, settingsKey):
+                logging.debug('Skipping unchanged file ' + filename)
+                if progress:
+                    progress.advance(os.path.getsize(filename))
+            else:
+                pending.append(filename)
+        logging.debug('Reformatting {} of {} files'.format(len(pending), len(filenames)))
+
+        ownExecutor = executor is None
+        if ownExecutor:
+            executor = ThreadPoolExecutor(max_workers=1)
+        done = set()
+        errors = []
+        try:
+            # the stat before reformatting, a file changed meanwhile is not recorded
+            stats = {filename: os.stat(filename) for filename in pending if os.path.isfile(filename)}
+            futures = {executor.submit(_reformatFileTo, filename, self.outputFilename(filename), settings): filename
+                       for filename in pending}
+            for future in as_completed(futures):
+                if progress and progress.cancelled:
+                    for waiting in futures:
+                        waiting.cancel()
+                    progress.checkCancelled()
+                filename = futures[future]
+                try:
+                    future.result()
+                    self._record(filename, stats[filename], settingsKey)
+                    done.add(filename)
+                except Exception as e:
+                    logging.debug('Error while reformatting {}: {}'.format(filename, e))
+                    errors.append(os.path.basename(filename) + ': ' + str(e))
+                if progress:
+                    progress.advance(stats[filename].st_size if filename in stats else 0)
+        finally:
+            if ownExecutor:
+                executor.shutdown(cancel_futures=True)
+            self._saveManifest()
+        if errors:
+            raise RuntimeError('\n'.join(errors))
+        return [filename for filename in pending if filename in done]
+
+    def _record(self, filename: str, stat: os.stat_result, settingsKey: dict) -> None:
+        if os.stat(filename).st_mtime_ns != stat.st_mtime_ns:
+            logging.debug('{} changed while reformatting, not recording it'.format(filename))
+            return
+        self._manifest[os.path.abspath(filename)] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'hash': _hashFile(filename),
+            'settings': settingsKey,
+            'output': self.outputFilename(filename),
+        }
+
+def _saveOutputFile(filename: str, target: str, move: bool) -> str:
+    # replaces target only when done, a rename within the file system is atomic
+    if move:
+        try:
+            os.replace(filename, target)
+            return target
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    tmpFilename = target + '.tmp'
+    try:
+        shutil.copyfile(filename, tmpFilename)
+        os.replace(tmpFilename, target)
+    finally:
+        if os.path.exists(tmpFilename):
+            os.unlink(tmpFilename)
+    if move:
+        os.unlink(filename)
+        return target
+    return filename
+
+class EnBrailleOutputSpool:
+    """Temporary folder holding the reformatted files until they are saved.
+
+    Every output is written to its own file here as soon as it is done, so
+    only its path and size have to be kept in memory. The folder is removed
+    by clear() and when the application exits.
+    """
+
+    def __init__(self) -> None:
+        self._folder = None
+
+    @property
+    def folder(self) -> str:
+        if self._folder is None:
+            self._folder = tempfile.TemporaryDirectory(prefix='EnBraille-')
+        return self._folder.name
+
+    def create(self, filename: str) -> str:
+        """Create an empty spool file for the output of filename."""
+        base, ext = os.path.splitext(os.path.basename(filename))
+        fd, spoolFilename = tempfile.mkstemp(prefix=base + '_', suffix=ext, dir=self.folder)
+        os.close(fd)
+        return spoolFilename
+
+    def contains(self, filename: str) -> bool:
+        return self._folder is not None and os.path.dirname(os.path.abspath(filename)) == os.path.abspath(self._folder.name)
+
+    def clear(self) -> None:
+        if self._folder is not None:
+            self._folder.cleanup()
+            self._folder = None
+
+    def save(self, outputFiles: list[Optional[tuple[str, int]]], targets: list[str],
+             executor: Optional[Executor] = None) -> tuple[list[Optional[tuple[str, int]]], list[str]]:
+        """Save the outputs to targets, skipping the missing (None) ones.
+
+        Spooled outputs are moved, which is an atomic rename on the same file
+        system. Others, like outputs saved before, are copied in parallel to a
+        temporary file next to the target that then replaces it. Returns the
+        outputs with the moved ones pointing to their target, and the errors.
+        """
+        outputFiles = list(outputFiles)
+        errors = []
+        ownExecutor = executor is None
+        if ownExecutor:
+            executor = ThreadPoolExecutor(max_workers=min(8, max(1, len(targets))))
+        try:
+            futures = {}
+            for i, (outputFile, target) in enumerate(zip(outputFiles, targets)):
+                if outputFile is not None:
+                    move = self.contains(outputFile[0])
+                    futures[executor.submit(_saveOutputFile, outputFile[0], target, move)] = i
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    outputFiles[i] = (future.result(), outputFiles[i][1])
+                except Exception as e:
+                    logging.debug('Error while saving {}: {}'.format(targets[i], e))
+                    errors.append(os.path.basename(targets[i]) + ': ' + str(e))
+        finally:
+            if ownExecutor:
+                executor.shutdown()
+        return outputFiles, errors
+
+# results of the last run, until they are saved or the next run starts
+_outputSpool = EnBrailleOutputSpool()
+
+def readOutputFile(filename: str) -> str:
+    with open(filename, 'r', encoding=_BRFENCODING[0], errors=_BRFENCODING[1]) as f:
+        return f.read()
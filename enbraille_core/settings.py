@@ -0,0 +1,101 @@
+#
+# Copyright (c) 2024 Stefan Lohmaier.
+#
+# This file is part of EnBraille 
+# (see https://github.com/slohmaier/EnBraille).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+# conversion settings and their defaults, named like the EnBrailleData properties
+DEFAULTS = {
+    'textTable': '',
+    'reformatLineLength': 40,
+    'reformatPageLength': 0,
+    'reformatWordSplitter': '-',
+    'reformatKeepPageNo': False,
+    'reformatWorkerCount': 0,
+    'documentTable': '',
+    'documentLineLength': 40,
+    'documentPageLength': 0,
+    'documentWordSplitter': '-',
+    'documentWorkerCount': 0,
+    'documentCacheSize': 256,
+    'documentH1Char': '#',
+    'documentH2Char': '=',
+    'documentH3Char': '-',
+    'documentH4Char': '.',
+    'documentH5Char': ',',
+    'documentH6Char': ';',
+    'documentBulletL1Char': '*',
+    'documentBulletL2Char': '+',
+    'documentBulletL3Char': '-',
+    'documentBulletL4Char': '.',
+    'documentBulletL5Char': ',',
+    'documentBulletL6Char': ';',
+}
+
+class EnBrailleSettings:
+    """Immutable snapshot of the conversion settings, usable without Qt.
+
+    Has the attributes of the EnBrailleData properties with the same
+    defaults, so the core functions take either of them. Jobs take a
+    snapshot when they start: reading an attribute is cheaper than a
+    QSettings lookup, and changes in the UI do not affect running jobs.
+    """
+
+    __slots__ = tuple(DEFAULTS)
+
+    def __init__(self, **values) -> None:
+        unknown = set(values) - set(DEFAULTS)
+        if unknown:
+            raise TypeError('Unknown settings: ' + ', '.join(sorted(unknown)))
+        for name, default in DEFAULTS.items():
+            object.__setattr__(self, name, values.get(name, default))
+
+    @classmethod
+    def fromData(cls, data: object) -> 'EnBrailleSettings':
+        """Snapshot the settings of EnBrailleData or any object with these attributes."""
+        if isinstance(data, cls):
+            return data
+        return cls(**{name: getattr(data, name) for name in DEFAULTS if hasattr(data, name)})
+
+    def replace(self, **changes) -> 'EnBrailleSettings':
+        """Return a copy with the given settings changed."""
+        return EnBrailleSettings(**{**self.asDict(), **changes})
+
+    def asDict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError('EnBrailleSettings is immutable, use replace()')
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError('EnBrailleSettings is immutable')
+
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: tuple) -> None:
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, EnBrailleSettings) and self.__getstate__() == other.__getstate__()
+
+    def __hash__(self) -> int:
+        return hash(self.__getstate__())
+
+    def __repr__(self) -> str:
+        return 'EnBrailleSettings({})'.format(', '.join('{}={!r}'.format(name, value) for name, value in self.asDict().items()))
@@ -20,7 +20,7 @@
 import logging
 from enum import Enum
 from typing import Optional
-from PySide6.QtCore import QObject, Signal, Slot, Qt, QSettings
+from PySide6.QtCore import QObject, Signal, Slot, Qt, QMetaObject, QSettings, QStandardPaths, QThread, QTimer
 from PySide6.QtWidgets import QApplication
 
 _EMBRAILLEMAINFCT_STRMAP = {
@@ -44,6 +44,77 @@ class EnBrailleMainFct(Enum):
                 return EnBrailleMainFct(key)
         return None
 
+# changed settings are written after this many ms without further changes
+_FLUSHDELAY = 1000
+
+class EnBrailleSettingsStore(QObject):
+    """In-memory layer over QSettings.
+
+    A value is read from QSettings once and served from memory afterwards.
+    Changes are only marked dirty and written together with one sync(): after
+    _FLUSHDELAY ms without further changes, on flush() and when the
+    application quits. All EnBrailleData of an application share one store.
+    """
+    _stores = {}
+
+    def __init__(self, settings: QSettings) -> None:
+        super().__init__(None)
+        self._settings = settings
+        self._values = {}
+        self._dirty = set()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(_FLUSHDELAY)
+        self._timer.timeout.connect(self.flush)
+
+    @classmethod
+    def forApplication(cls, app: QApplication) -> 'EnBrailleSettingsStore':
+        key = (app.organizationName(), app.applicationName())
+        store = cls._stores.get(key)
+        if store is None:
+            store = cls(QSettings(*key))
+            app.aboutToQuit.connect(store.flush)
+            cls._stores[key] = store
+        return store
+
+    @property
+    def dirty(self) -> bool:
+        return len(self._dirty) > 0
+
+    def value(self, key: str, defaultValue: object, type: type) -> object:
+        if key not in self._values:
+            self._values[key] = self._settings.value(key, defaultValue, type=type)
+        return self._values[key]
+
+    def setValue(self, key: str, value: object) -> None:
+        self._values[key] = value
+        self._dirty.add(key)
+        # restarting the timer coalesces a series of changes into one write
+        if QThread.currentThread() == self.thread():
+            self._timer.start()
+        else:
+            QMetaObject.invokeMethod(self._timer, 'start', Qt.QueuedConnection)
+
+    @Slot()
+    def flush(self) -> None:
+        """Write the changed values to disk now."""
+        self._timer.stop()
+        if not self._dirty:
+            return
+        logging.debug('EnBrailleSettingsStore: writing ' + ', '.join(sorted(self._dirty)))
+        for key in self._dirty:
+            self._settings.setValue(key, self._values[key])
+        self._dirty.clear()
+        self._settings.sync()
+
+    def clear(self) -> None:
+        """Remove all values, from memory and from disk."""
+        self._timer.stop()
+        self._values.clear()
+        self._dirty.clear()
+        self._settings.clear()
+        self._settings.sync()
+
 class EnBrailleData(QObject):
     mainFunctionChanged = Signal(EnBrailleMainFct)
     TextTableChanged = Signal(str)
@@ -52,17 +123,27 @@ class EnBrailleData(QObject):
     def __init__(self, app: QApplication) -> None:
         super().__init__(None)
 
-        self._settings = QSettings(app.organizationName(), app.applicationName())
+        self._settings = EnBrailleSettingsStore.forApplication(app)
 
         #public members
         self.inputText = ''
         self.outputText = ''
         self.reformatFilename = ''
         self.documentFilename = ''
+        # (filename, size) of the spooled output of every reformatted file, None if it failed
+        self.outputFiles = []
 
     def resetSettings(self) -> None:
         self._settings.clear()
-        self._settings.sync()
+
+    def flush(self) -> None:
+        """Write changed settings to disk now instead of after the next pause."""
+        self._settings.flush()
+
+    @property
+    def cacheDir(self) -> str:
+        """Folder for caches of the current user, e.g. the BRF indexes."""
+        return QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
     
     @property
     def mainFunction(self) -> EnBrailleMainFct:
@@ -73,7 +154,6 @@ class EnBrailleData(QObject):
     def mainFunction(self, value: EnBrailleMainFct) -> None:
         if self.mainFunction != value:
             self._settings.setValue('mainFunction', str(value))
-            self._settings.sync()
 
             self.mainFunctionChanged.emit(value)
         
@@ -86,7 +166,6 @@ class EnBrailleData(QObject):
         if self.textTable != value:
             logging.debug('EnBrailleData: setting textTable to ' + str(value))
             self._settings.setValue('textTable', value)
-            self._settings.sync()
 
             self.TextTableChanged.emit(value)
     
@@ -99,7 +178,6 @@ class EnBrailleData(QObject):
         if self.reformatLineLength != value:
             logging.debug('EnBrailleData: setting reformatLineLength to ' + str(value))
             self._settings.setValue('reformatLineLength', value)
-            self._settings.sync()
     
     @property
     def reformatPageLength(self) -> int:
@@ -110,7 +188,6 @@ class EnBrailleData(QObject):
         if self.reformatPageLength != value:
             logging.debug('EnBrailleData: setting reformatPageLength to ' + str(value)) 
             self._settings.setValue('reformatPageLength', value)
-            self._settings.sync()
     
     @property
     def reformatWordSplitter(self) -> str:
@@ -121,7 +198,6 @@ class EnBrailleData(QObject):
         if self.reformatWordSplitter != value:
             logging.debug('EnBrailleData: setting reformatWordSplitter to ' + str(value))
             self._settings.setValue('reformatWordSplitter', value)
-            self._settings.sync()
     
     @property
     def reformatKeepPageNo(self) -> bool:
@@ -132,7 +208,16 @@ class EnBrailleData(QObject):
         if self.reformatKeepPageNo != value:
             logging.debug('EnBrailleData: setting reformatKeepPageNo to ' + str(value))
             self._settings.setValue('reformatKeepPageNo', value)
-            self._settings.sync()
+    
+    @property
+    def reformatWorkerCount(self) -> int:
+        return self._settings.value('reformatWorkerCount', 0, type=int)
+    
+    @reformatWorkerCount.setter
+    def reformatWorkerCount(self, value: int) -> None:
+        if self.reformatWorkerCount != value:
+            logging.debug('EnBrailleData: setting reformatWorkerCount to ' + str(value))
+            self._settings.setValue('reformatWorkerCount', value)
     
     @property
     def documentTextTable(self) -> str:
@@ -143,10 +228,18 @@ class EnBrailleData(QObject):
         if self.documentTextTable != value:
             logging.debug('EnBrailleData: setting documentTextTable to ' + str(value))
             self._settings.setValue('documentTextTable', value)
-            self._settings.sync()
 
             self.DocumentTextTableChanged.emit(value)
 
+    # the name the document conversion uses for documentTextTable
+    @property
+    def documentTable(self) -> str:
+        return self.documentTextTable
+
+    @documentTable.setter
+    def documentTable(self, value: str) -> None:
+        self.documentTextTable = value
+
     @property
     def documentLineLength(self) -> int:
         return self._settings.value('documentLineLength', 40, type=int)
@@ -156,7 +249,6 @@ class EnBrailleData(QObject):
         if self.documentLineLength != value:
             logging.debug('EnBrailleData: setting documentLineLength to ' + str(value))
             self._settings.setValue('documentLineLength', value)
-            self._settings.sync()
     
     @property
     def documentPageLength(self) -> int:
@@ -167,7 +259,6 @@ class EnBrailleData(QObject):
         if self.documentPageLength != value:
             logging.debug('EnBrailleData: setting documentPageLength to ' + str(value)) 
             self._settings.setValue('documentPageLength', value)
-            self._settings.sync()
     
     @property
     def documentWordSplitter(self) -> str:
@@ -178,7 +269,27 @@ class EnBrailleData(QObject):
         if self.documentWordSplitter != value:
             logging.debug('EnBrailleData: setting documentWordSplitter to ' + str(value))
             self._settings.setValue('documentWordSplitter', value)
-            self._settings.sync()   
+    
+    @property
+    def documentWorkerCount(self) -> int:
+        return self._settings.value('documentWorkerCount', 0, type=int)
+    
+    @documentWorkerCount.setter
+    def documentWorkerCount(self, value: int) -> None:
+        if self.documentWorkerCount != value:
+            logging.debug('EnBrailleData: setting documentWorkerCount to ' + str(value))
+            self._settings.setValue('documentWorkerCount', value)
+
+    @property
+    def documentCacheSize(self) -> int:
+        """Size of the cache of converted documents in MB, 0 disables it."""
+        return self._settings.value('documentCacheSize', 256, type=int)
+
+    @documentCacheSize.setter
+    def documentCacheSize(self, value: int) -> None:
+        if self.documentCacheSize != value:
+            logging.debug('EnBrailleData: setting documentCacheSize to ' + str(value))
+            self._settings.setValue('documentCacheSize', value)
         
     @property
     def documentH1Char(self) -> str:
@@ -189,7 +300,6 @@ class EnBrailleData(QObject):
         if self.documentH1Char != value:
             logging.debug('EnBrailleData: setting documentH1Char to ' + str(value))
             self._settings.setValue('document/H1Char', value)
-            self._settings.sync()
     
     @property
     def documentH2Char(self) -> str:
@@ -200,7 +310,6 @@ class EnBrailleData(QObject):
         if self.documentH2Char != value:
             logging.debug('EnBrailleData: setting documentH2Char to ' + str(value))
             self._settings.setValue('document/H2Char', value)
-            self._settings.sync()
 
     @property
     def documentH3Char(self) -> str:
@@ -211,7 +320,6 @@ class EnBrailleData(QObject):
         if self.documentH3Char != value:
             logging.debug('EnBrailleData: setting documentH3Char to ' + str(value))
             self._settings.setValue('document/H3Char', value)
-            self._settings.sync()
 
     @property
     def documentH4Char(self) -> str:
@@ -222,7 +330,6 @@ class EnBrailleData(QObject):
         if self.documentH4Char != value:
             logging.debug('EnBrailleData: setting documentH4Char to ' + str(value))
             self._settings.setValue('document/H4Char', value)
-            self._settings.sync()
 
     @property
     def documentH5Char(self) -> str:
@@ -233,7 +340,6 @@ class EnBrailleData(QObject):
         if self.documentH5Char != value:
             logging.debug('EnBrailleData: setting documentH5Char to ' + str(value))
             self._settings.setValue('document/H5Char', value)
-            self._settings.sync()
     
     @property
     def documentH6Char(self) -> str:
@@ -244,7 +350,6 @@ class EnBrailleData(QObject):
         if self.documentH6Char != value:
             logging.debug('EnBrailleData: setting documentH6Char to ' + str(value))
             self._settings.setValue('document/H6Char', value)
-            self._settings.sync()
     
     @property
     def documentBulletL1Char(self) -> str:
@@ -255,7 +360,6 @@ class EnBrailleData(QObject):
         if self.documentBulletL1Char != value:
             logging.debug('EnBrailleData: setting documentBulletL1Char to ' + str(value))
             self._settings.setValue('document/BulletL1Char', value)
-            self._settings.sync()
     
     @property
     def documentBulletL2Char(self) -> str:
@@ -266,7 +370,6 @@ class EnBrailleData(QObject):
         if self.documentBulletL2Char != value:
             logging.debug('EnBrailleData: setting documentBulletL2Char to ' + str(value))
             self._settings.setValue('document/BulletL2Char', value)
-            self._settings.sync()
     
     @property
     def documentBulletL3Char(self) -> str:
@@ -277,7 +380,6 @@ class EnBrailleData(QObject):
         if self.documentBulletL3Char != value:
             logging.debug('EnBrailleData: setting documentBulletL3Char to ' + str(value))
             self._settings.setValue('document/BulletL3Char', value)
-            self._settings.sync()
     
     @property
     def documentBulletL4Char(self) -> str:
@@ -288,7 +390,6 @@ class EnBrailleData(QObject):
         if self.documentBulletL4Char != value:
             logging.debug('EnBrailleData: setting documentBulletL4Char to ' + str(value))
             self._settings.setValue('document/BulletL4Char', value)
-            self._settings.sync()
     
     @property
     def documentBulletL5Char(self) -> str:
@@ -299,7 +400,6 @@ class EnBrailleData(QObject):
         if self.documentBulletL5Char != value:
             logging.debug('EnBrailleData: setting documentBulletL5Char to ' + str(value))
             self._settings.setValue('document/BulletL5Char', value)
-            self._settings.sync()
     
     @property
     def documentBulletL6Char(self) -> str:
@@ -310,7 +410,6 @@ class EnBrailleData(QObject):
         if self.documentBulletL6Char != value:
             logging.debug('EnBrailleData: setting documentBulletL6Char to ' + str(value))
             self._settings.setValue('document/BulletL6Char', value)
-            self._settings.sync()
     
     @property
     def skipWelcomePage(self) -> bool:
@@ -321,4 +420,3 @@ class EnBrailleData(QObject):
         if self.skipWelcomePage != value:
             logging.debug('EnBrailleData: setting skipWelcomePage to ' + str(value))
             self._settings.setValue('ui/skipWelcomePage', value)
-            self._settings.sync()
@@ -19,24 +19,30 @@
 #
 from typing import Optional
 import logging
+import multiprocessing
 import os
 import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 import ebooklib
 if __name__ == '__main__':
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from PySide6.QtWidgets import (QPushButton, QGridLayout, QLabel, QRadioButton,
                                QWidget, QFrame, QWizardPage, QLineEdit, QHBoxLayout,
-                               QFileDialog, QWizardPage, QSpinBox)
-from PySide6.QtCore import QObject, QTimer
-import markdown.treeprocessors
+                               QFileDialog, QWizardPage, QSpinBox, QProgressBar,
+                               QSpacerItem, QSizePolicy, QMessageBox, QWizard, QVBoxLayout)
+from PySide6.QtCore import QObject, QThread, QTimer, Qt
+from enbraille_core.cache import EnBrailleDocumentCache
+from enbraille_core.document import convertDocument, convertDocumentToFile
+from enbraille_core.epub import EnBrailleChapter, epub2brf, epubSpine
+from enbraille_core.reformat import _outputSpool, readOutputFile
+from enbraille_core.settings import EnBrailleSettings
 from enbraille_data import EnBrailleData
-from enbraille_widgets import EnBrailleTableComboBox
-from tools.util_epub import epub2md
+from enbraille_tools import EnBrailleCancelled, EnBrailleProgress
+from enbraille_widgets import EnBrailleBrfView, EnBrailleTableComboBox
 from PySide6.QtCore import Signal
 from libbrl import libbrlImpl
-import markdown
-import xml.etree.ElementTree as etree
 
 class EnBrailleEbookConverter(QObject):
     def __init__(self, data: EnBrailleData) -> None:
@@ -45,225 +51,6 @@ class EnBrailleEbookConverter(QObject):
         self.data = data
         self.brl = libbrlImpl()
 
-class EnBrailleMd2BRF(markdown.treeprocessors.Treeprocessor):
-    def __init__(self, data: EnBrailleData) -> None:
-        super().__init__()
-
-        self.data = data
-        self.brl = libbrlImpl()
-        self._headingChars = {}
-        self._headingChars[0] = self._translate(self.data.documentH1Char)
-        self._headingChars[1] = self._translate(self.data.documentH2Char)
-        self._headingChars[2] = self._translate(self.data.documentH3Char)
-        self._headingChars[3] = self._translate(self.data.documentH4Char)
-        self._headingChars[4] = self._translate(self.data.documentH5Char)
-        self._headingChars[5] = self._translate(self.data.documentH6Char)
-
-        self._bulletChars = {}
-        self._bulletChars[0] = self._translate(self.data.documentBulletL1Char)
-        self._bulletChars[1] = self._translate(self.data.documentBulletL2Char)
-        self._bulletChars[2] = self._translate(self.data.documentBulletL3Char)
-        self._bulletChars[3] = self._translate(self.data.documentBulletL4Char)
-        self._bulletChars[4] = self._translate(self.data.documentBulletL5Char)
-        self._bulletChars[5] = self._translate(self.data.documentBulletL6Char)
-    
-    def _translate(self, text: str) -> str:
-        return self.brl.translate(text, self.data.documentTable)
-
-    def run(self, doc: etree.Element) -> None:
-        return self.convert_elements(doc)
-
-    def convert_elements(self, elements: etree.Element) -> str:
-        brf = ''
-        
-        # Handle text content before child elements
-        if elements.text:
-            brf += self._translate(elements.text)
-        
-        # Process child elements
-        for element in elements:
-            if element.tag == 'p':
-                brf += self.convert_paragraph(element)
-            elif element.tag == 'h1':
-                brf += self.convert_heading(element, 1)
-            elif element.tag == 'h2':
-                brf += self.convert_heading(element, 2)
-            elif element.tag == 'h3':
-                brf += self.convert_heading(element, 3)
-            elif element.tag == 'h4':
-                brf += self.convert_heading(element, 4)
-            elif element.tag == 'h5':
-                brf += self.convert_heading(element, 5)
-            elif element.tag == 'h6':
-                brf += self.convert_heading(element, 6)
-            elif element.tag == 'ul':
-                brf += self.convert_unordered_list(element)
-            elif element.tag == 'ol':
-                brf += self.convert_ordered_list(element)
-            elif element.tag == 'blockquote':
-                brf += self.convert_blockquote(element)
-            elif element.tag == 'pre':
-                brf += self.convert_preformatted(element)
-            elif element.tag == 'code':
-                brf += self.convert_code(element)
-            elif element.tag == 'img':
-                brf += self.convert_image(element)
-            elif element.tag == 'a':
-                brf += self.convert_link(element)
-            elif element.tag == 'hr':
-                brf += self.convert_horizontal_rule(element)
-            elif element.tag == 'br':
-                brf += self.convert_line_break(element)
-            elif element.tag == 'table':
-                brf += self.convert_table(element)
-            elif element.tag == 'tr':
-                brf += self.convert_table_row(element)
-            elif element.tag == 'td':
-                brf += self.convert_table_data(element)
-            elif element.tag == 'th':
-                brf += self.convert_table_header(element)
-            elif element.tag == 'em':
-                brf += self.convert_emphasis(element)
-            elif element.tag == 'strong':
-                brf += self.convert_strong(element)
-            elif element.tag == 'del':
-                brf += self.convert_deleted(element)
-            elif element.tag == 'ins':
-                brf += self.convert_inserted(element)
-            elif element.tag == 'sup':
-                brf += self.convert_superscript(element)
-            elif element.tag == 'sub':
-                brf += self.convert_subscript(element)
-            elif element.tag in ['dl', 'dt', 'dd']:
-                brf += self.convert_definition_list_item(element)
-            else:
-                logging.warning('Unsupported element: ' + element.tag)
-                if element.text:
-                    brf += self._translate(element.text) + '\n'
-            
-            # Handle tail text after each element
-            if element.tail:
-                brf += self._translate(element.tail)
-        
-        return brf
-    
-    def convert_paragraph(self, element: etree.Element) -> str:
-        content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-        return content + '\n'
-    
-    def convert_heading(self, element: etree.Element, level: int) -> str:
-        headingText = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-        lineLength = min(len(headingText), self.data.documentLineLength)
-        return self._headingChars[level-1] + '\n' + headingText[:lineLength] + '\n'     
-    
-    def convert_unordered_list(self, element: etree.Element) -> str:
-        brf = ''
-        for i, li in enumerate(element):
-            brf += self._bulletChars[i % 6] + ' ' + self.convert_elements(li)
-        return brf
-    
-    def convert_ordered_list(self, element: etree.Element) -> str:
-        brf = ''
-        for i, li in enumerate(element):
-            brf += str(i + 1) + '. ' + self.convert_elements(li)
-        return brf
-    
-    def convert_blockquote(self, element: etree.Element) -> str:
-        #TODO: mark blockquote
-        return self.convert_elements(element) + '\n'
-    
-    def convert_preformatted(self, element: etree.Element) -> str:
-        content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-        return '```\n' + content + '\n```\n'
-    
-    def convert_code(self, element: etree.Element) -> str:
-        content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-        return '`' + content + '`'
-    
-    def convert_image(self, element: etree.Element) -> str:
-        #TODO: how to handle images?
-        return ''
-    
-    def convert_link(self, element: etree.Element) -> str:
-        # print as "text" (url)
-        content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-        href = element.get('href', '')
-        if href:
-            return content + ' (' + href + ')'
-        return content
-
-    def convert_horizontal_rule(self, element: etree.Element) -> str:
-        lineLength = min(self.data.documentLineLength, 8)
-        return self._translate('-') * lineLength + '\n'
-
-    def convert_line_break(self, element: etree.Element) -> str:
-        return '\n'
-    
-    def convert_table(self, element: etree.Element) -> str:
-        brf = '\n'
-        # Process table rows
-        for row in element:
-            if row.tag == 'tr':
-                brf += self.convert_table_row(row)
-        brf += '\n'
-        return brf
-
-    def convert_table_row(self, element: etree.Element) -> str:
-        brf = ''
-        cells = []
-        # Process table cells
-        for cell in element:
-            if cell.tag in ['td', 'th']:
-                cell_content = self.convert_elements(cell) if len(cell) > 0 else self._translate(cell.text or '')
-                cells.append(cell_content.strip())
-        
-        if cells:
-            brf = ' | '.join(cells) + '\n'
-        return brf
-
-    def convert_table_data(self, element: etree.Element) -> str:
-        # This method is now handled by convert_table_row
-        content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-        return content
-    
-    def convert_table_header(self, element: etree.Element) -> str:
-        return self._translate(element.text or '') + ' | '
-    
-    def convert_emphasis(self, element: etree.Element) -> str:
-        content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-        return '*' + content + '*'
-    
-    def convert_strong(self, element: etree.Element) -> str:
-        content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-        return '**' + content + '**'
-    
-    def convert_deleted(self, element: etree.Element) -> str:
-        content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-        return '~~' + content + '~~'
-    
-    def convert_inserted(self, element: etree.Element) -> str:
-        content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-        return '++' + content + '++'
-    
-    def convert_superscript(self, element: etree.Element) -> str:
-        content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-        return '^{' + content + '}'
-    
-    def convert_subscript(self, element: etree.Element) -> str:
-        content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-        return '_{' + content + '}'
-    
-    def convert_definition_list_item(self, element: etree.Element) -> str:
-        if element.tag == 'dl':
-            return self.convert_elements(element) + '\n'
-        elif element.tag == 'dt':
-            content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-            return '**' + content + '**\n'
-        elif element.tag == 'dd':
-            content = self.convert_elements(element) if len(element) > 0 else self._translate(element.text or '')
-            return '  ' + content + '\n'
-        return ''
-
 class EnBrailleDocumentConverter(QObject):
     progress = Signal(int, str)
 
@@ -272,25 +59,89 @@ class EnBrailleDocumentConverter(QObject):
 
         self.data = data
 
-    def convert(self, proggressCallback: callable) -> None:
-        mdContent : str  = None
-        if self.data.documentFilename.endswith('.epub'):
-            mdContent = epub2md(self.data.documentFilename)
-        elif self.data.documentFilename.endswith('.md'):
-            with open(self.data.documentFilename, 'r') as f:
-                mdContent = f.read()
+    def convert(self, proggressCallback: callable) -> str:
+        settings = EnBrailleSettings.fromData(self.data)
+        filename = self.data.documentFilename
+        spine = self._spine(filename)
+        workerCount = self._workerCount(spine)
+        if workerCount > 1:
+            with self._createExecutor(workerCount) as executor:
+                brf = epub2brf(filename, settings, executor=executor, spine=spine)
+        elif spine is not None:
+            brf = epub2brf(filename, settings, spine=spine)
         else:
-            raise ValueError('Unsupported file format')
-        logging.debug("Markdown content: %s", mdContent)
-    
-        # parse markdown
-        doc = markdown.markdown(mdContent)
+            brf = convertDocument(filename, settings)
 
-        docProcessor = EnBrailleMd2BRF(self.data)
-        brf = docProcessor.run(doc)
-        #TODO save brf to file
+        proggressCallback(100)
+        return brf
+
+    def convertToFile(self, outFilename: str, proggressCallback: callable,
+                      progress: Optional[EnBrailleProgress] = None) -> int:
+        """Convert the document chapter by chapter straight into outFilename.
+
+        Only the chapters being converted are kept in memory. The progress
+        signal is emitted after every chapter; cancelling progress stops the
+        conversion with EnBrailleCancelled. A conversion of the same file with
+        the same table and settings is copied from the cache instead. Returns
+        the number of written lines.
+        """
+        settings = EnBrailleSettings.fromData(self.data)
+        filename = self.data.documentFilename
+        cache = self._cache(settings)
+        cacheKey = cache.key(filename, settings) if cache else None
+        if cache:
+            lineCount = cache.get(cacheKey, outFilename)
+            if lineCount is not None:
+                proggressCallback(100)
+                return lineCount
+
+        progress = progress or EnBrailleProgress(0)
+        onChapter = lambda chapter, chapterCount: self._reportChapter(progress, chapter, chapterCount)
+        spine = self._spine(filename)
+        workerCount = self._workerCount(spine)
+        if workerCount > 1:
+            with self._createExecutor(workerCount) as executor:
+                lineCount = convertDocumentToFile(filename, settings, outFilename, progress, executor, onChapter, spine)
+        else:
+            lineCount = convertDocumentToFile(filename, settings, outFilename, progress, None, onChapter, spine)
 
+        if cache:
+            cache.put(cacheKey, outFilename)
         proggressCallback(100)
+        return lineCount
+
+    def _cache(self, settings: EnBrailleSettings) -> Optional[EnBrailleDocumentCache]:
+        cacheDir = self.data.cacheDir
+        if not cacheDir or settings.documentCacheSize <= 0:
+            return None
+        return EnBrailleDocumentCache(cacheDir, settings.documentCacheSize * 1024 * 1024)
+
+    def _reportChapter(self, progress: EnBrailleProgress, chapter: EnBrailleChapter, chapterCount: int) -> None:
+        bytesPerSecond, secondsLeft = progress.estimate()
+        if secondsLeft is None:
+            timeLeft = '-'
+        else:
+            minutes, seconds = divmod(int(secondsLeft + 0.5), 60)
+            timeLeft = '{}:{:02}'.format(minutes, seconds)
+        message = self.tr('Chapter {0} of {1}: {2}').format(chapter.index + 1, chapterCount, chapter.title) + '\n' + \
+            self.tr('{0:.1f} of {1:.1f} MB, {2:.1f} MB/s, {3} left').format(
+                progress.done / 1024 / 1024, progress.total / 1024 / 1024, bytesPerSecond / 1024 / 1024, timeLeft)
+        self.progress.emit(progress.percent, message)
+
+    def _spine(self, filename: str) -> Optional[list[EnBrailleChapter]]:
+        # read once, it decides the worker count and is converted after
+        return epubSpine(filename) if filename.endswith('.epub') else None
+
+    def _workerCount(self, spine: Optional[list[EnBrailleChapter]]) -> int:
+        # only the chapters of EPUB books are converted in parallel
+        if spine is None:
+            return 1
+        return min(self.data.documentWorkerCount or os.cpu_count() or 1, len(spine))
+
+    def _createExecutor(self, workerCount: int) -> ProcessPoolExecutor:
+        logging.debug('Converting {} with {} workers'.format(self.data.documentFilename, workerCount))
+        # spawn, forking a process running Qt threads is not safe
+        return ProcessPoolExecutor(max_workers=workerCount, mp_context=multiprocessing.get_context('spawn'))
 
 class EnBrailleDocumentPage(QWizardPage):
     def __init__(self, data: EnBrailleData) -> None:
@@ -364,6 +215,20 @@ class EnBrailleDocumentPage(QWizardPage):
         self.wordSplitterWarningLabel = QLabel(self.tr('WordSplitter must be one character!'))
         self.layout.addWidget(self.wordSplitterWarningLabel, row, 2)
         row += 1
+
+        workerCountLabel = QLabel(self.tr('Parallel jobs:'))
+        self.layout.addWidget(workerCountLabel, row, 0)
+        self.workerCountSpinBox = QSpinBox()
+        self.workerCountSpinBox.setMinimum(0)
+        self.workerCountSpinBox.setMaximum(256)
+        self.workerCountSpinBox.setValue(self.data.documentWorkerCount)
+        self.workerCountSpinBox.setAccessibleName(self.tr('Parallel jobs'))
+        self.workerCountSpinBox.setAccessibleDescription(self.tr('Number of chapters converted at the same time, 0 means one per processor core'))
+        workerCountLabel.setBuddy(self.workerCountSpinBox)
+        self.layout.addWidget(self.workerCountSpinBox, row, 1)
+        self.workerCountSpinBox.valueChanged.connect(self.onWorkerCountSpinBoxValueChanged)
+        self.layout.addWidget(QLabel(self.tr('0 means one job per processor core')), row, 2)
+        row += 1
     
     def onTableChanged(self, text: str) -> None:
         self.data.documentTable = text
@@ -379,6 +244,9 @@ class EnBrailleDocumentPage(QWizardPage):
     def onWordSplitterLineEditTextChanged(self, text: str) -> None:
         self.data.documentWordSplitter = text
         self.wordSplitterWarningLabel.setVisible(len(text) != 1)
+
+    def onWorkerCountSpinBoxValueChanged(self, value: int) -> None:
+        self.data.documentWorkerCount = value
     
     def browseDocument(self) -> None:
         filename, _ = QFileDialog.getOpenFileName(
@@ -408,35 +276,204 @@ class EnBrailleDocumentPage(QWizardPage):
     def validatePage(self) -> bool:
         return True
 
+class EnBrailleDocumentWorker(QThread):
+    finished = Signal()
+    progress = Signal(int, str)
+
+    def __init__(self, data: EnBrailleData) -> None:
+        super().__init__()
+        self.data = data
+        self._progress = EnBrailleProgress(0)
+
+    def start(self) -> None:
+        # a fresh job, so a cancel() after start() always reaches it
+        self._progress = EnBrailleProgress(0)
+        super().start()
+
+    def cancel(self) -> None:
+        logging.debug('Cancelling document conversion')
+        self._progress.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._progress.cancelled
+
+    def run(self) -> None:
+        # the outputs of the last run are dropped, saved ones were moved out already
+        _outputSpool.clear()
+        self.data.outputData = None
+        self.data.outputFiles = []
+        filename = self.data.documentFilename
+        try:
+            logging.debug('Converting document: ' + filename)
+            # the braille is streamed into the spool, not kept in memory
+            spoolFilename = _outputSpool.create(os.path.splitext(filename)[0] + '.brf')
+            converter = EnBrailleDocumentConverter(self.data)
+            converter.progress.connect(self.progress)
+            converter.convertToFile(spoolFilename, lambda percent: None, self._progress)
+            self.data.outputFiles = [(spoolFilename, os.path.getsize(spoolFilename))]
+        except EnBrailleCancelled:
+            logging.debug('Document conversion cancelled')
+            self.data.outputFiles = []
+            _outputSpool.clear()
+            self.progress.emit(self._progress.percent, self.tr('Cancelled.'))
+        except Exception as e:
+            logging.debug('Error while converting document: ' + str(e) + '\n' + traceback.format_exc())
+            self.progress.emit(-1, self.tr('Error while converting document: ') + str(e))
+        else:
+            self.progress.emit(100, self.tr('Done.'))
+        self.finished.emit()
+
 class EnBrailleDocumentPageWork(QWizardPage):
     def __init__(self, data: EnBrailleData) -> None:
         super().__init__()
 
         self._data = data
 
+        self.setTitle(self.tr('Converting'))
+        self.setSubTitle(self.tr('Converting the document...'))
+
+        self.layout = QGridLayout()
+        self.setLayout(self.layout)
+
+        row = 0
+
+        # add vertical spacer
+        self.layout.addItem(QSpacerItem(0, 0, QSizePolicy.Minimum, QSizePolicy.Expanding), row, 0, 1, 3)
+        row += 1
+
+        self.progressBar = QProgressBar()
+        self.progressBar.setRange(0, 100)
+        self.progressBar.setValue(0)
+        self.layout.addWidget(self.progressBar, row, 0, 1, 3)
+        row += 1
+
+        self.progressLabel = QLabel(self.tr('Starting...'))
+        self.progressLabel.setAlignment(Qt.AlignCenter)
+        self.layout.addWidget(self.progressLabel, row, 0, 1, 3)
+        row += 1
+
+        self.cancelButton = QPushButton(self.tr('&Cancel'))
+        self.cancelButton.setAccessibleName(self.tr('Cancel conversion'))
+        self.cancelButton.setAccessibleDescription(self.tr('Stop converting and return to the settings'))
+        self.cancelButton.clicked.connect(self.onCancelButtonClicked)
+        self.layout.addWidget(self.cancelButton, row, 1)
+        row += 1
+
+        # add vertical spacer
+        self.layout.addItem(QSpacerItem(0, 0, QSizePolicy.Minimum, QSizePolicy.Expanding), row, 0, 1, 3)
+        row += 1
+
+        self._failed = False
+        self.worker = EnBrailleDocumentWorker(self._data)
+        self.worker.finished.connect(self.onWorkerFinished)
+        self.worker.progress.connect(self.onWorkerProgress)
+
     def cleanupPage(self) -> None:
         pass
     
     def initializePage(self) -> None:
-        logging.debug('child widgets: ' + str(self.layout.count())) 
+        self._failed = False
+        self.progressBar.setValue(0)
+        self.progressLabel.setText(self.tr('Starting...'))
+        self.cancelButton.setEnabled(True)
+        self.worker.start()
+
+        #disable back button
+        self.wizard().button(QWizard.BackButton).setEnabled(False)
+        self.wizard().button(QWizard.NextButton).setEnabled(False)
+        self.wizard().button(QWizard.FinishButton).setEnabled(False)
     
     def isComplete(self) -> bool:
-        return True
+        return self.worker.isFinished()
 
     def validatePage(self) -> bool:
         return True
 
+    def onWorkerFinished(self) -> None:
+        self.cancelButton.setEnabled(False)
+        self.wizard().button(QWizard.BackButton).setEnabled(True)
+        self.wizard().button(QWizard.NextButton).setEnabled(True)
+        self.wizard().button(QWizard.FinishButton).setEnabled(True)
+        self.completeChanged.emit()
+        if self._failed or self.worker.cancelled:
+            self.wizard().back()
+        else:
+            self.wizard().next()
+
+    def onCancelButtonClicked(self) -> None:
+        self.cancelButton.setEnabled(False)
+        self.progressLabel.setText(self.tr('Cancelling...'))
+        self.worker.cancel()
+
+    def onWorkerProgress(self, progress: int, message: str) -> None:
+        if progress == -1:
+            self._failed = True
+            QMessageBox.critical(self, self.tr('Error'), message)
+        else:
+            self.progressBar.setValue(progress)
+            self.progressLabel.setText(message)
+
 class EnBrailleDocumentPageOutput(QWizardPage):
     def __init__(self, data: EnBrailleData) -> None:
         super().__init__()
 
         self._data = data
 
+        self.setTitle(self.tr('Conversion done'))
+        self.setSubTitle(self.tr('Converting the document is done.'))
+
+        self.layout = QGridLayout()
+        self.setLayout(self.layout)
+        row = 0
+
+        resultLabel = QLabel(self.tr('Converted document:'))
+        self.layout.addWidget(resultLabel, row, 0)
+        row += 1
+
+        # add a frame to hold the viewer
+        self.frame = QFrame()
+        self.frame.setFrameStyle(QFrame.StyledPanel | QFrame.Sunken)
+        self.frame.setLineWidth(1)
+        self.frame.setMidLineWidth(0)
+        self.layout.addWidget(self.frame, row, 0, 1, 3)
+
+        self.textEdit = EnBrailleBrfView()
+        self.textEdit.textView.setAccessibleName(self.tr('Converted braille document'))
+        self.textEdit.textView.setAccessibleDescription(self.tr('The document converted to braille format'))
+        resultLabel.setBuddy(self.textEdit.textView)
+        self.frame.setLayout(QVBoxLayout())
+        self.frame.layout().addWidget(self.textEdit)
+        row += 1
+
+        self.saveButton = QPushButton(self.tr('&Save'))
+        self.saveButton.setAccessibleName(self.tr('Save'))
+        self.saveButton.setAccessibleDescription(self.tr('Save the converted document as BRF file'))
+        self.saveButton.clicked.connect(self.onSaveButtonClicked)
+        self.layout.addWidget(self.saveButton, row, 0)
+        row += 1
+
     def cleanupPage(self) -> None:
         pass
     
     def initializePage(self) -> None:
-        logging.debug('child widgets: ' + str(self.layout.count())) 
+        logging.debug('converted document: ' + str(self._data.outputFiles))
+        # the braille was streamed into a spool file by the worker
+        outputFile = self._data.outputFiles[0] if self._data.outputFiles else None
+        try:
+            self.textEdit.setText(readOutputFile(outputFile[0]) if outputFile else '')
+        except OSError as e:
+            self.textEdit.setText('')
+            QMessageBox.critical(self, self.tr('Error'), self.tr('Error while reading file: ') + str(e))
+        self.saveButton.setEnabled(outputFile is not None)
+
+    def onSaveButtonClicked(self) -> None:
+        suggestion = os.path.splitext(self._data.documentFilename)[0] + '.brf'
+        filename = QFileDialog.getSaveFileName(self, self.tr('Save file'), suggestion, self.tr('Braille files (*.brf)'))[0]
+        if filename:
+            self._data.outputFiles, errors = _outputSpool.save(self._data.outputFiles, [filename])
+            if errors:
+                QMessageBox.critical(self, self.tr('Error'), self.tr('Error while saving file: ') + '\n'.join(errors))
     
     def isComplete(self) -> bool:
         return True
@@ -450,6 +487,7 @@ if __name__ == '__main__':
     # parse one argument with file path
     parser = ArgumentParser()
     parser.add_argument('file', help='path to file')
+    parser.add_argument('-o', '--output', help='stream the BRF to this file instead of logging it')
     args = parser.parse_args()
 
     app = QCoreApplication()
@@ -461,5 +499,9 @@ if __name__ == '__main__':
     data.documentWordSplitter = '-'
 
     converter = EnBrailleDocumentConverter(data)
-    result = converter.convert(lambda percent, message: logging.info(f'{percent}%: {message}'))
-    logging.info("Conversion result: %s", result)
+    if args.output:
+        lineCount = converter.convertToFile(args.output, lambda percent: logging.info(f'{percent}%'))
+        logging.info("Wrote %d lines to %s", lineCount, args.output)
+    else:
+        result = converter.convert(lambda percent: logging.info(f'{percent}%'))
+        logging.info("Conversion result: %s", result)
@@ -18,136 +18,50 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 import logging
+import multiprocessing
 import os
-import re
 import traceback
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from typing import Optional
 
 from PySide6.QtCore import Qt, QThread, Signal, Slot, QObject, QTimer
-from PySide6.QtGui import QFont
-from PySide6.QtWidgets import (QSpinBox, QFileDialog, QFrame, QGridLayout, QWizard,
+from PySide6.QtWidgets import (QSpinBox, QComboBox, QFileDialog, QFrame, QGridLayout, QWizard,
                                QLabel, QLineEdit, QMessageBox, QPushButton, QSizePolicy,
                                QProgressBar, QWizard, QWizardPage, QHBoxLayout, QSpacerItem,
-                               QTextEdit, QVBoxLayout, QCheckBox)
+                               QVBoxLayout, QCheckBox)
 
+from enbraille_core.reformat import (_PARALLELCHUNKSIZE, EnBrailleReformater, _outputSpool, _reformatFileTo,
+                                     outputFilename, readOutputFile, reformatSettings)
+from enbraille_core.settings import EnBrailleSettings
 from enbraille_data import EnBrailleData, EnBrailleMainFct
-from enbraille_widgets import EnBrailleTableComboBox
-from enbraille_tools import generateOutput, reformatPragraph
+from enbraille_widgets import EnBrailleBrfView, EnBrailleTableComboBox
+from enbraille_tools import EnBrailleCancelled, EnBrailleProgress
 from libbrl import libbrlImpl
 
-class EnBrailleReformater(QObject):
-    _pagenoregex = re.compile(r'^\s+\#\w+$')
-    _pagenoprefix = '\t'
+# pages shown in the preview and its delay after the last settings change in ms
+_PREVIEWPAGES = 3
+_PREVIEWDELAY = 300
 
-    def __init__(self, filename: str) -> None:
-        self._filename = filename
-        self._loadFile()
-    
-    def _loadFile(self) -> str:
-        with open(self._filename, 'r') as f:
-            data = f.read()
-
-            self._maxLineLength = 0
-            self._pageLength = 0
-            linecount = 0
-            pageLengths = []
-            for line in data.splitlines():
-                # detect maximum line length
-                self._maxLineLength = max(self._maxLineLength, len(line))
-            
-                # count pagelength
-                linecount += 1
-                if self._pagenoregex.match(line):
-                    pageLengths.append(linecount)
-                    linecount = 0
-            
-            # calculate pagelength with most occurences
-            self._pageLength = 0
-            if pageLengths:
-                counts = {}
-                for pageLength in pageLengths:
-                    counts[pageLength] = counts.get(pageLength, 0) + 1
-                pageLength = 0
-                maxCount = 0
-                for pageLength, count in counts.items():
-                    if count > maxCount:
-                        maxCount = count
-                        self._pageLength = pageLength
-    
-    def reformat(self, progress: Signal, data: EnBrailleData) -> str:
-        # If line length is 0, return empty string (no reformatting)
-        if data.reformatLineLength == 0:
-            return ''
-            
-        with open(self._filename, 'r') as f:
-            paragraphs = self._parseParagraphs(f, data)
-            lines = []
-            for paragraph in paragraphs:
-                if len(paragraph) > 0 and paragraph[0] == self._pagenoprefix:
-                    pageStr = paragraph.strip()
-                    pageStr = ' '* (data.reformatLineLength - len(pageStr) - 1) + pageStr
-                    logging.debug('added page number in output: ' + pageStr)
-                    lines.append(pageStr)
-                else:
-                    lines.extend(reformatPragraph(paragraph, data.reformatLineLength, data.reformatWordSplitter))
-            logging.debug('Reformated to {} lines'.format(len(lines)))
-            return generateOutput(lines, data.reformatPageLength, data.reformatLineLength)
-    
-    def _parseParagraphs(self, inputFile, data: EnBrailleData) -> list[str]:
-        paragraphs = ['']
-        lines = inputFile.readlines()
-        logging.debug('parsing lines: {} to paragraphs'.format(len(lines)))
-        wordRemainder = ''
-        for line in lines:
-            #strip trailing ' ', '\n' and '\r'
-            line = line.rstrip()
-
-            if self._pagenoregex.match(line):
-                if data.reformatKeepPageNo:
-                    paragraphs.append(self._pagenoprefix + line)
-                    paragraphs.append('')
-                else:
-                    pass
-            else:
-                if line.startswith(' ') and paragraphs[-1] != '':
-                    paragraphs.append('')
+class EnBrailleCharacteristicsWorker(QThread):
+    """Detects the characteristics of the chosen files one after another."""
+    detected = Signal(int, int, int, bool)
+    failed = Signal(int, str)
 
-                words = line.split(' ')
-
-                if wordRemainder:
-                    words[0] = wordRemainder + words[0]
-                    wordRemainder = ''
-
-                if words[-1].endswith(data.reformatWordSplitter) and len(words) > 1:
-                    wordRemainder = words[-1][:-1]
-                    words = words[:-1]
-
-                for word in words:
-                    if word:
-                        paragraphs[-1] += word + ' '
-                
-                if len(line) < data.reformatLineLength-4:
-                    paragraphs.append('')
-        
-        logging.debug('Found {} paragraphs'.format(len(paragraphs)))
-        return paragraphs
-
-    @property
-    def filename(self) -> str:
-        return self._filename
-    
-    @property
-    def maxLineLength(self) -> int:
-        return self._maxLineLength
-    
-    @property
-    def pageLength(self) -> int:
-        return self._pageLength
+    def __init__(self, reformaters: list[EnBrailleReformater], cacheDir: Optional[str] = None) -> None:
+        super().__init__()
+        self._reformaters = reformaters
+        self._cacheDir = cacheDir
 
-    @filename.setter
-    def filename(self, value: str) -> None:
-        self._filename = value
-        self._loadFile()
+    def run(self) -> None:
+        for i, reformater in enumerate(self._reformaters):
+            if self.isInterruptionRequested():
+                return
+            try:
+                exact = reformater.detectCharacteristics(self._cacheDir)
+                self.detected.emit(i, reformater.maxLineLength, reformater.pageLength, exact)
+            except Exception as e:
+                logging.debug('Error while detecting characteristics of {}: {}'.format(reformater.filename, e))
+                self.failed.emit(i, str(e))
 
 class EnBrailleReformatPage(QWizardPage):
     def __init__(self, data: EnBrailleData) -> None:
@@ -161,6 +75,9 @@ class EnBrailleReformatPage(QWizardPage):
         self.setLayout(self.layout)
 
         self._reformater = None
+        self._characteristics = []
+        self._characteristicsWorker = None
+        self._runningWorkers = set()
 
         row = 0
 
@@ -261,11 +178,42 @@ class EnBrailleReformatPage(QWizardPage):
         self._checkboxKeepPageNo.setAccessibleName(self.tr('Keep page numbers'))
         self._checkboxKeepPageNo.setAccessibleDescription(self.tr('Preserve existing page numbers during reformatting'))
         self.layout.addWidget(self._checkboxKeepPageNo, row, 1, 1, 2)
+        row += 1
+
+        workerCountLabel = QLabel(self.tr('Parallel jobs:'))
+        self.layout.addWidget(workerCountLabel, row, 0)
+        self.workerCountSpinBox = QSpinBox()
+        self.workerCountSpinBox.setMinimum(0)
+        self.workerCountSpinBox.setMaximum(256)
+        self.workerCountSpinBox.setAccessibleName(self.tr('Parallel jobs'))
+        self.workerCountSpinBox.setAccessibleDescription(self.tr('Number of files reformatted at the same time, 0 means one per processor core'))
+        workerCountLabel.setBuddy(self.workerCountSpinBox)
+        self.layout.addWidget(self.workerCountSpinBox, row, 1)
+        self.workerCountSpinBox.valueChanged.connect(self.onWorkerCountSpinBoxValueChanged)
+        self.layout.addWidget(QLabel(self.tr('0 means one job per processor core')), row, 2)
+        row += 1
+
+        # preview of the first pages, updated shortly after the settings changed
+        previewLabel = QLabel(self.tr('Preview:'))
+        self.layout.addWidget(previewLabel, row, 0, 1, 3)
+        row += 1
+        self.previewView = EnBrailleBrfView()
+        self.previewView.textView.setAccessibleName(self.tr('Preview'))
+        self.previewView.textView.setAccessibleDescription(self.tr('The first pages reformatted with the current settings'))
+        previewLabel.setBuddy(self.previewView.textView)
+        self.layout.addWidget(self.previewView, row, 0, 1, 3)
+        row += 1
+
+        self.previewTimer = QTimer(self)
+        self.previewTimer.setSingleShot(True)
+        self.previewTimer.setInterval(_PREVIEWDELAY)
+        self.previewTimer.timeout.connect(self.updatePreview)
 
         self.lineLengthSpinBox.setValue(self.data.reformatLineLength)
         self.pageLengthSpinBox.setValue(self.data.reformatPageLength)
         self.wordSplitterLineEdit.setText(self.data.reformatWordSplitter)
         self._checkboxKeepPageNo.setChecked(self.data.reformatKeepPageNo)   
+        self.workerCountSpinBox.setValue(self.data.reformatWorkerCount)
     
     def cleanupPage(self) -> None:
         pass
@@ -290,74 +238,233 @@ class EnBrailleReformatPage(QWizardPage):
         if filename:
             try:
                 if type(filename) == str:
-                    self._reformater = EnBrailleReformater(filename)            
+                    reformaters = [EnBrailleReformater(filename, analyze=False, cacheDir=self.data.cacheDir)]
+                    self._reformater = reformaters[0]
                     self.filenameLineEdit.setText(filename)
-                    if self._reformater.pageLength > 0:
-                        self.readPageLengthLabel.setText(str(self._reformater.pageLength))  
-                    else:
-                        self.readPageLengthLabel.setText(self.tr('no pages detected'))
-                    self.maxLineLengthLabel.setText(str(self._reformater.maxLineLength))
                 else:
-                    self._reformater = [EnBrailleReformater(f) for f in filename]
+                    reformaters = [EnBrailleReformater(f, analyze=False, cacheDir=self.data.cacheDir) for f in filename]
+                    self._reformater = reformaters
                     self.filenameLineEdit.setText(str(len(filename)) + ' ' + self.tr('files') + ': ' + ', '.join(filename))
-                    self.readPageLengthLabel.setText(', '.join([str(r.pageLength) for r in self._reformater]))
-                    maxlengths = [r.maxLineLength for r in self._reformater]
-                    self.maxLineLengthLabel.setText(str(max(maxlengths)))
-                self.data.reformatFilename = filename
-                
+                self.detectCharacteristics(reformaters)
                 self.data.reformatFilename = filename
+                self.updatePreview()
             except Exception as e:
                 logging.debug('Error while loading file: ' + str(e) + '\n' + traceback.format_exc())
                 QMessageBox.critical(self, self.tr('Error'), self.tr('Error while loading file: ') + str(e))
             
         self.completeChanged.emit()
+
+    def detectCharacteristics(self, reformaters: list[EnBrailleReformater]) -> None:
+        """Detect the file characteristics in the background, the labels fill as results arrive."""
+        if self._characteristicsWorker is not None:
+            self._characteristicsWorker.requestInterruption()
+        self._characteristics = [None] * len(reformaters)
+        worker = EnBrailleCharacteristicsWorker(reformaters, self.data.cacheDir)
+        worker.detected.connect(self.onCharacteristicsDetected)
+        worker.failed.connect(self.onCharacteristicsFailed)
+        # keep running workers alive until they are done
+        self._runningWorkers.add(worker)
+        worker.finished.connect(lambda: self._runningWorkers.discard(worker))
+        self._characteristicsWorker = worker
+        self.updateCharacteristicsLabels()
+        worker.start()
+
+    def onCharacteristicsDetected(self, i: int, maxLineLength: int, pageLength: int, exact: bool) -> None:
+        if self.sender() is self._characteristicsWorker:
+            self._characteristics[i] = (maxLineLength, pageLength, exact)
+            self.updateCharacteristicsLabels()
+
+    def onCharacteristicsFailed(self, i: int, message: str) -> None:
+        if self.sender() is self._characteristicsWorker:
+            self._characteristics[i] = message
+            self.updateCharacteristicsLabels()
+
+    def updateCharacteristicsLabels(self) -> None:
+        pageLengths = []
+        maxLineLengths = []
+        allExact = True
+        for characteristics in self._characteristics:
+            if characteristics is None:
+                pageLengths.append('…')
+            elif type(characteristics) == str:
+                pageLengths.append(self.tr('error'))
+            else:
+                maxLineLength, pageLength, exact = characteristics
+                if pageLength > 0:
+                    pageLengths.append(str(pageLength) if exact else self.tr('about {0}').format(pageLength))
+                else:
+                    pageLengths.append(self.tr('no pages detected'))
+                maxLineLengths.append(maxLineLength)
+                allExact = allExact and exact
+
+        if not self._characteristics:
+            self.readPageLengthLabel.setText('-')
+            self.maxLineLengthLabel.setText('-')
+            return
+        if len(pageLengths) == 1 and pageLengths[0] == '…':
+            self.readPageLengthLabel.setText(self.tr('detecting...'))
+        else:
+            self.readPageLengthLabel.setText(', '.join(pageLengths))
+        if maxLineLengths:
+            maxLineLength = str(max(maxLineLengths)) if allExact else self.tr('about {0}').format(max(maxLineLengths))
+            self.maxLineLengthLabel.setText(maxLineLength + (' …' if None in self._characteristics else ''))
+        elif None in self._characteristics:
+            self.maxLineLengthLabel.setText(self.tr('detecting...'))
+        else:
+            self.maxLineLengthLabel.setText('-')
     
     def onLineLengthSpinBoxValueChanged(self, value: int) -> None:
         self.data.reformatLineLength = value
         self.lineLengthWarningLabel.setVisible(self.data.reformatLineLength == 0)
+        self.previewTimer.start()
     
     def onPageLengthSpinBoxValueChanged(self, value: int) -> None:
         self.data.reformatPageLength = value
         self.pageLengthWarningLabel.setVisible(self.data.reformatPageLength == 0)
+        self.previewTimer.start()
     
     def onWordSplitterLineEditTextChanged(self, text: str) -> None:
         self.data.reformatWordSplitter = text
         self.wordSplitterWarningLabel.setVisible(len(self.data.reformatWordSplitter) != 1)
         self.completeChanged.emit()
+        self.previewTimer.start()
     
     def onKeepPageNoCheckBoxStateChanged(self, state: int) -> None:
         logging.debug('onKeepPageNoCheckBoxStateChanged: ' + str(state == 2))
         self.data.reformatKeepPageNo = state == 2
+        self.previewTimer.start()
+
+    def updatePreview(self) -> None:
+        self.previewTimer.stop()
+        reformater = self._reformater[0] if type(self._reformater) == list else self._reformater
+        if reformater is None or len(self.data.reformatWordSplitter) != 1:
+            self.previewView.setText('')
+            return
+        try:
+            self.previewView.setText(reformater.reformatPreview(reformatSettings(self.data), _PREVIEWPAGES))
+        except Exception as e:
+            logging.debug('Error while creating preview: ' + str(e) + '\n' + traceback.format_exc())
+            self.previewView.setText('')
+    
+    def onWorkerCountSpinBoxValueChanged(self, value: int) -> None:
+        self.data.reformatWorkerCount = value
 
 class EnBrailleReformaterWorker(QThread):
     finished = Signal()
     progress = Signal(int, str)
+    # files of a multi-file run that failed, the others are kept
+    fileErrors = Signal(str)
 
     def __init__(self, data: EnBrailleData) -> None:
         super().__init__()
         self.data = data
+        self._progress = EnBrailleProgress(0)
+
+    def start(self) -> None:
+        # a fresh job, so a cancel() after start() always reaches it
+        self._progress = EnBrailleProgress(0, self._reportProgress)
+        super().start()
+
+    def cancel(self) -> None:
+        logging.debug('Cancelling reformatting')
+        self._progress.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._progress.cancelled
 
     def run(self) -> None:
+        # the outputs of the last run are dropped, saved ones were moved out already
+        _outputSpool.clear()
+        self.data.outputFiles = []
+        # the job keeps the settings it started with, even if the pages change them
+        settings = reformatSettings(self.data)
         try:
             if type(self.data.reformatFilename) == str:
                 logging.debug('Reformating file: ' + self.data.reformatFilename)
-                reformater = EnBrailleReformater(self.data.reformatFilename)
-                self.data.outputData = reformater.reformat(self.progress, self.data)
+                size = os.path.getsize(self.data.reformatFilename)
+                self._progress.total = size
+                # the reformatting streams the file itself, no analysis pass before it
+                reformater = EnBrailleReformater(self.data.reformatFilename, analyze=False)
+                chunkCount = min(self._workerCount(), size // _PARALLELCHUNKSIZE)
+                if chunkCount > 1:
+                    with self._createExecutor(chunkCount) as executor:
+                        self.data.outputData = reformater.reformatParallel(self._progress, settings, executor, chunkCount)
+                else:
+                    self.data.outputData = reformater.reformat(self._progress, settings)
                 logging.debug('Reformated to {} lines'.format(len(self.data.outputData.splitlines())))
             else:
-                self.data.outputData = []
-                for filename in self.data.reformatFilename:
-                    reformater = EnBrailleReformater(filename)
-                    logging.debug('Reformating file: ' + filename)
-                    self.data.outputData.append(reformater.reformat(self.progress, self.data))
-                    logging.debug('Reformated to {} lines'.format(len(self.data.outputData[-1].splitlines())))
+                self._reformatFiles(self.data.reformatFilename, settings)
+        except EnBrailleCancelled:
+            logging.debug('Reformatting cancelled')
+            self.data.outputData = None
+            self.data.outputFiles = []
+            _outputSpool.clear()
+            self.progress.emit(self._progress.percent, self.tr('Cancelled.'))
         except Exception as e:
             logging.debug('Error while reformatting: ' + str(e) + '\n' + traceback.format_exc())
             self.progress.emit(-1, self.tr('Error while reformatting: ') + str(e))
-
-        self.progress.emit(100, self.tr('Done.'))
+        else:
+            self.progress.emit(100, self.tr('Done.'))
         self.finished.emit()
-        
+
+    def _reportProgress(self, done: int, total: int, bytesPerSecond: float, secondsLeft: Optional[float]) -> None:
+        if secondsLeft is None:
+            timeLeft = '-'
+        else:
+            minutes, seconds = divmod(int(secondsLeft + 0.5), 60)
+            timeLeft = '{}:{:02}'.format(minutes, seconds)
+        message = self.tr('{0:.1f} of {1:.1f} MB, {2:.1f} MB/s, {3} left').format(
+            done / 1024 / 1024, total / 1024 / 1024, bytesPerSecond / 1024 / 1024, timeLeft)
+        self.progress.emit(self._progress.percent, message)
+
+    def _workerCount(self) -> int:
+        return self.data.reformatWorkerCount or os.cpu_count() or 1
+
+    def _createExecutor(self, jobCount: int) -> Executor:
+        workerCount = min(self._workerCount(), jobCount)
+        logging.debug('Running {} jobs with {} workers'.format(jobCount, workerCount))
+        if workerCount < 2:
+            return ThreadPoolExecutor(max_workers=1)
+        # spawn, forking a process running Qt threads is not safe
+        return ProcessPoolExecutor(max_workers=workerCount, mp_context=multiprocessing.get_context('spawn'))
+
+    def _reformatFiles(self, filenames: list[str], settings: EnBrailleSettings) -> None:
+        # only the spooled file and its size are kept per output
+        self.data.outputData = None
+        self.data.outputFiles = [None] * len(filenames)
+        spoolFilenames = [_outputSpool.create(filename) for filename in filenames]
+        sizes = [os.path.getsize(filename) if os.path.isfile(filename) else 0 for filename in filenames]
+        self._progress.total = sum(sizes)
+        errors = []
+        with self._createExecutor(len(filenames)) as executor:
+            futures = {executor.submit(_reformatFileTo, filename, spoolFilenames[i], settings): i
+                       for i, filename in enumerate(filenames)}
+            for done, future in enumerate(as_completed(futures), 1):
+                if self._progress.cancelled:
+                    # running files finish, the queued ones are dropped
+                    for pending in futures:
+                        pending.cancel()
+                    self._progress.checkCancelled()
+                i = futures[future]
+                self._progress.advance(sizes[i])
+                basename = os.path.basename(filenames[i])
+                try:
+                    lineCount = future.result()
+                    self.data.outputFiles[i] = (spoolFilenames[i], os.path.getsize(spoolFilenames[i]))
+                    logging.debug('Reformated {} to {} lines'.format(filenames[i], lineCount))
+                    message = self.tr('Reformatted {0} ({1}/{2})').format(basename, done, len(filenames))
+                except Exception as e:
+                    logging.debug('Error while reformatting {}: {}'.format(filenames[i], e))
+                    errors.append(basename + ': ' + str(e))
+                    message = self.tr('Error while reformatting {0}: {1}').format(basename, str(e))
+                self.progress.emit(int(done * 100 / len(filenames)), message)
+
+        if len(errors) == len(filenames):
+            raise RuntimeError('\n'.join(errors))
+        if errors:
+            self.fileErrors.emit('\n'.join(errors))
+
 
 class EnBrailleReformaterWorkPage(QWizardPage):
     def __init__(self, data: EnBrailleData) -> None:
@@ -385,19 +492,33 @@ class EnBrailleReformaterWorkPage(QWizardPage):
         self.progressLabel = QLabel(self.tr('Starting...'))
         self.progressLabel.setAlignment(Qt.AlignCenter)
         self.layout.addWidget(self.progressLabel, row, 0, 1, 3)
+        row += 1
+
+        self.cancelButton = QPushButton(self.tr('&Cancel'))
+        self.cancelButton.setAccessibleName(self.tr('Cancel reformatting'))
+        self.cancelButton.setAccessibleDescription(self.tr('Stop reformatting and return to the settings'))
+        self.cancelButton.clicked.connect(self.onCancelButtonClicked)
+        self.layout.addWidget(self.cancelButton, row, 1)
+        row += 1
 
         # add vertical spacer
         self.layout.addItem(QSpacerItem(0, 0, QSizePolicy.Minimum, QSizePolicy.Expanding), row, 0, 1, 3)
         row += 1
 
+        self._failed = False
         self.worker = EnBrailleReformaterWorker(self.data)
         self.worker.finished.connect(self.onWorkerFinished)     
         self.worker.progress.connect(self.onWorkerProgress)
+        self.worker.fileErrors.connect(self.onWorkerFileErrors)
     
     def cleanupPage(self) -> None:
         pass
 
     def initializePage(self) -> None:
+        self._failed = False
+        self.progressBar.setValue(0)
+        self.progressLabel.setText(self.tr('Starting...'))
+        self.cancelButton.setEnabled(True)
         self.worker.start()
 
         #disable back button
@@ -409,20 +530,33 @@ class EnBrailleReformaterWorkPage(QWizardPage):
         return self.worker.isFinished()
     
     def onWorkerFinished(self) -> None:
+        self.cancelButton.setEnabled(False)
         self.wizard().button(QWizard.BackButton).setEnabled(True)
         self.wizard().button(QWizard.NextButton).setEnabled(True)
         self.wizard().button(QWizard.FinishButton).setEnabled(True)
         self.completeChanged.emit()
-        self.wizard().next()
+        if self._failed or self.worker.cancelled:
+            self.wizard().back()
+        else:
+            self.wizard().next()
+
+    def onCancelButtonClicked(self) -> None:
+        self.cancelButton.setEnabled(False)
+        self.progressLabel.setText(self.tr('Cancelling...'))
+        self.worker.cancel()
     
     def onWorkerProgress(self, progress: int, message: str) -> None:
         if progress == -1:
+            self._failed = True
             QMessageBox.critical(self, self.tr('Error'), message)   
-            self.wizard().back()
         else:
             self.progressBar.setValue(progress)
             self.progressLabel.setText(message)
 
+    def onWorkerFileErrors(self, message: str) -> None:
+        # not fatal, the result page shows the files that were reformatted
+        QMessageBox.warning(self, self.tr('Error'), self.tr('Error while reformatting: ') + message)
+
 class EnBrailleReformaterResultPage(QWizardPage):
     def __init__(self, data: EnBrailleData) -> None:
         super().__init__(None)
@@ -435,21 +569,32 @@ class EnBrailleReformaterResultPage(QWizardPage):
         self.setLayout(self.layout)
         row = 0
 
-        self.layout.addWidget(QLabel(self.tr('Reformatted file:')), row, 0)
+        resultLabel = QLabel(self.tr('Reformatted file:'))
+        self.layout.addWidget(resultLabel, row, 0)
+        # one output per file for multiple files, shown one at a time
+        self.fileComboBox = QComboBox()
+        self.fileComboBox.setAccessibleName(self.tr('Reformatted file'))
+        self.fileComboBox.setAccessibleDescription(self.tr('Choose which reformatted file to show'))
+        self.fileComboBox.currentIndexChanged.connect(self.onFileComboBoxCurrentIndexChanged)
+        self.layout.addWidget(self.fileComboBox, row, 1, 1, 2)
         row += 1
 
-        # add a frame to hold the text edit
+        self.failedLabel = QLabel()
+        self.failedLabel.setWordWrap(True)
+        self.layout.addWidget(self.failedLabel, row, 0, 1, 3)
+        row += 1
+
+        # add a frame to hold the viewer
         self.frame = QFrame()
         self.frame.setFrameStyle(QFrame.StyledPanel | QFrame.Sunken)
         self.frame.setLineWidth(1)
         self.frame.setMidLineWidth(0)
         self.layout.addWidget(self.frame, row, 0, 1, 3)
 
-        self.textEdit = QTextEdit()
-        self.textEdit.setReadOnly(True)
-        self.textEdit.setLineWrapMode(QTextEdit.NoWrap)
-        self.textEdit.setAcceptRichText(False)
-        self.textEdit.setFont(QFont('Courier New', 10))
+        self.textEdit = EnBrailleBrfView()
+        self.textEdit.textView.setAccessibleName(self.tr('Reformatted braille text'))
+        self.textEdit.textView.setAccessibleDescription(self.tr('The reformatted braille text'))
+        resultLabel.setBuddy(self.textEdit.textView)
         self.frame.setLayout(QVBoxLayout())
         self.frame.layout().addWidget(self.textEdit)
         row += 1
@@ -463,10 +608,41 @@ class EnBrailleReformaterResultPage(QWizardPage):
         pass
 
     def initializePage(self) -> None:
+        self.fileComboBox.blockSignals(True)
+        self.fileComboBox.clear()
+        failed = []
         if type(self.data.outputData) == str:
+            self.fileComboBox.setVisible(False)
             self.textEdit.setText(self.data.outputData)
         else:
-            self.textEdit.setText('\n#-#-#-#-#-#-#-#-#-#-#-#-#\n'.join(self.data.outputData))
+            for i, filename in enumerate(self.data.reformatFilename):
+                basename = os.path.basename(filename)
+                if i < len(self.data.outputFiles) and self.data.outputFiles[i]:
+                    self.fileComboBox.addItem(basename)
+                else:
+                    failed.append(basename)
+                    self.fileComboBox.addItem(self.tr('{0} (failed)').format(basename))
+            self.fileComboBox.setVisible(True)
+            # start with the first file that was reformatted
+            first = next((i for i, outputFile in enumerate(self.data.outputFiles) if outputFile), 0)
+            self.fileComboBox.setCurrentIndex(first)
+            self.showOutputFile(first)
+        self.fileComboBox.blockSignals(False)
+        self.failedLabel.setText(self.tr('Not reformatted: ') + ', '.join(failed) if failed else '')
+        self.failedLabel.setVisible(bool(failed))
+
+    def onFileComboBoxCurrentIndexChanged(self, index: int) -> None:
+        if index >= 0:
+            self.showOutputFile(index)
+
+    def showOutputFile(self, index: int) -> None:
+        # only the shown output is read back from its spool file
+        outputFile = self.data.outputFiles[index] if index < len(self.data.outputFiles) else None
+        try:
+            self.textEdit.setText(readOutputFile(outputFile[0]) if outputFile else '')
+        except OSError as e:
+            self.textEdit.setText('')
+            QMessageBox.critical(self, self.tr('Error'), self.tr('Error while reading file: ') + str(e))
     
     def onSaveButtonClicked(self) -> None:
         if type(self.data.outputData) == str:
@@ -480,13 +656,8 @@ class EnBrailleReformaterResultPage(QWizardPage):
         else:
             folder = QFileDialog.getExistingDirectory(self, self.tr('Save files to folder'), '')
             if folder:
-                for i, outputData in enumerate(self.data.outputData):
-                    filename = os.path.join(folder, os.path.basename(self.data.reformatFilename[i]))
-                    # add _EnBraille to filename before .
-                    filename = filename[:filename.rfind('.')] + '_EnBraille' + filename[filename.rfind('.'):]
-                    try:
-                        with open(filename, 'w') as f:
-                            f.write(outputData)
-                    except Exception as e:
-                        QMessageBox.critical(self, self.tr('Error'), self.tr('Error while saving file: ') + str(e))
+                targets = [outputFilename(folder, filename) for filename in self.data.reformatFilename]
+                self.data.outputFiles, errors = _outputSpool.save(self.data.outputFiles, targets)
+                if errors:
+                    QMessageBox.critical(self, self.tr('Error'), self.tr('Error while saving file: ') + '\n'.join(errors))
         
\ No newline at end of file
@@ -25,7 +25,7 @@ from PySide6.QtGui import QGuiApplication, QClipboard
 from PySide6.QtWidgets import QApplication, QGridLayout, QLabel, QTextEdit, QWizardPage, QWizard, QPushButton, QProgressBar
 from enbraille_widgets import EnBrailleTableComboBox
 from enbraille_data import EnBrailleData, EnBrailleMainFct
-from libbrl import libbrlImpl
+from enbraille_core.text import translateText
 
 class EnBrailleSimpleTextPage(QWizardPage):
     def __init__(self, data: EnBrailleData) -> None:
@@ -93,8 +93,7 @@ class EnBrailleSimpleWorker(QThread):
         self.data = data
 
     def run(self):
-        brl = libbrlImpl()
-        outputText = brl.translate(self.data.inputText, self.data.textTable)
+        outputText = translateText(self.data.inputText, self.data.textTable)
         logging.debug('EnBrailleSimpleWorker: finished translation: %s', outputText)
         self.finished.emit(outputText)
     
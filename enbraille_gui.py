@@ -364,7 +364,7 @@ class EnBrailleWindow(QWizard):
         self.documentPage.completeChanged.connect(self.updateNextButtonState)
         self.addPage(self.documentPage)
 
-        self.documentWorkPage = EnBrailleDocumentPage(data)
+        self.documentWorkPage = EnBrailleDocumentPageWork(data)
         self.documentWorkPage.completeChanged.connect(self.updateNextButtonState)
         self.addPage(self.documentWorkPage)
 
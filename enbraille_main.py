@@ -18,6 +18,7 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 import logging
+import multiprocessing
 import sys
 import os
 from argparse import ArgumentParser
@@ -30,6 +31,9 @@ from enbraille_data import EnBrailleData
 import tools.translation_helper as translation_helper
 
 if __name__ == "__main__":
+    # reformat worker processes are spawned, needed for frozen builds
+    multiprocessing.freeze_support()
+
     logLevel = logging.INFO
 
     parser = ArgumentParser()
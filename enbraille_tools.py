@@ -17,7 +17,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
+import io
 import logging
+import time
+from array import array
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional, TextIO
 
 def reformatPragraph(paragraph: str, lineLength: int, lineSeperator: str) -> list[str]:
     lines = ['']
@@ -50,18 +54,200 @@ def reformatPragraph(paragraph: str, lineLength: int, lineSeperator: str) -> lis
 
 _BREILLENUMS = {'0': 'j', '1': 'a', '2': 'b', '3': 'c', '4': 'd', '5': 'e', '6': 'f', '7': 'g', '8': 'h', '9': 'i'}
 
-def generateOutput(lines: list[str], pageLength: int, lineLength: int) -> str:
-    output = ''
-    lineno = 1
+def pageNumberLine(pageNo: int, lineLength: int) -> str:
+    """The right aligned braille page number line, without line break."""
+    pageStr = '#{}'.format(pageNo)
+    for s, n in _BREILLENUMS.items():
+        pageStr = pageStr.replace(s, n)
+    return ' ' * (lineLength - len(pageStr) - 1) + pageStr
+
+def writeOutput(lines: Iterable[str], output: TextIO, pageLength: int, lineLength: int, lineCount: int = 0) -> int:
+    """Write lines to output, adding a page number line after every page.
+
+    lineCount continues the pagination after that many already written lines.
+    Returns the total number of lines written including the page number lines.
+    """
+    lineno = lineCount + 1
     for line in lines:
-        output += line + '\n'
+        output.write(line)
+        output.write('\n')
 
         if pageLength > 0 and lineno % pageLength == 0:
-            pageStr = '#{}'.format( int(lineno / pageLength) + 1 )
-            for s, n in _BREILLENUMS.items():
-                pageStr = pageStr.replace(s, n)
-            output += ' ' * (lineLength - len(pageStr) - 1) + pageStr + '\n'
+            output.write(pageNumberLine(int(lineno / pageLength) + 1, lineLength) + '\n')
             lineno += 1
 
         lineno += 1
-    return output
\ No newline at end of file
+    return lineno - 1
+
+def generateOutput(lines: list[str], pageLength: int, lineLength: int) -> str:
+    output = io.StringIO()
+    writeOutput(lines, output, pageLength, lineLength)
+    return output.getvalue()
+
+# lines are stored as bytes, BRF is ASCII so a cell takes one byte
+_LINEENCODING = ('utf-8', 'surrogateescape')
+
+class EnBraillePage:
+    """The lines start to stop of a line store that make up one page.
+
+    number is the page number following the lines, None for the last
+    page when it is not full.
+    """
+    __slots__ = ('number', 'start', 'stop')
+
+    def __init__(self, number: Optional[int], start: int, stop: int) -> None:
+        self.number = number
+        self.start = start
+        self.stop = stop
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, EnBraillePage) and \
+            (self.number, self.start, self.stop) == (other.number, other.start, other.stop)
+
+    def __repr__(self) -> str:
+        return 'EnBraillePage({}, {}, {})'.format(self.number, self.start, self.stop)
+
+class EnBrailleLineStore:
+    """Compact list of laid out lines.
+
+    All lines are kept in one buffer, each followed by its line break, and
+    an array holds the offset of every line. A line costs about its length
+    plus five bytes instead of a str object and a list slot. view() returns
+    a run of lines as memoryview without copying, ready to be written.
+    The buffer cannot grow while such a view is alive.
+    """
+    __slots__ = ('_buffer', '_offsets')
+
+    def __init__(self, lines: Iterable[str] = ()) -> None:
+        self._buffer = bytearray()
+        self._offsets = array('I', [0])
+        self.extend(lines)
+
+    def append(self, line: str) -> None:
+        self._buffer += line.encode(*_LINEENCODING)
+        self._buffer += b'\n'
+        self._offsets.append(len(self._buffer))
+
+    def extend(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.append(line)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('line index out of range')
+        return self._buffer[self._offsets[index]:self._offsets[index + 1] - 1].decode(*_LINEENCODING)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the buffer and the offsets."""
+        return len(self._buffer) + self._offsets.itemsize * len(self._offsets)
+
+    def view(self, start: int = 0, stop: Optional[int] = None) -> memoryview:
+        """The lines start to stop with their line breaks, without copying."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        start = min(start, stop)
+        return memoryview(self._buffer)[self._offsets[start]:self._offsets[stop]]
+
+    def pages(self, pageLength: int, lineCount: int = 0) -> list[EnBraillePage]:
+        """Split the lines into pages like writeOutput() does.
+
+        lineCount continues the pagination after that many already written lines.
+        """
+        pages = []
+        lineno = lineCount + 1
+        start = 0
+        while start < len(self):
+            if pageLength <= 0:
+                pages.append(EnBraillePage(None, start, len(self)))
+                break
+            # the page number follows the line numbered with the next multiple of pageLength
+            pageEnd = -(-lineno // pageLength) * pageLength
+            stop = start + pageEnd - lineno + 1
+            if stop > len(self):
+                pages.append(EnBraillePage(None, start, len(self)))
+                break
+            pages.append(EnBraillePage(pageEnd // pageLength + 1, start, stop))
+            lineno = pageEnd + 2
+            start = stop
+        return pages
+
+    def write(self, output: BinaryIO, pageLength: int, lineLength: int, lineCount: int = 0) -> int:
+        """Write the lines paginated to the binary output, like writeOutput().
+
+        Returns the total number of lines written including the page number lines.
+        """
+        for page in self.pages(pageLength, lineCount):
+            with self.view(page.start, page.stop) as lines:
+                output.write(lines)
+            lineCount += page.stop - page.start
+            if page.number is not None:
+                output.write(pageNumberLine(page.number, lineLength).encode(*_LINEENCODING) + b'\n')
+                lineCount += 1
+        return lineCount
+
+    def output(self, pageLength: int, lineLength: int) -> str:
+        """The paginated text, like generateOutput()."""
+        output = io.BytesIO()
+        self.write(output, pageLength, lineLength)
+        return output.getvalue().decode(*_LINEENCODING)
+
+class EnBrailleCancelled(Exception):
+    """Raised by EnBrailleProgress.checkCancelled() after cancel() was called."""
+
+class EnBrailleProgress:
+    """Byte based progress of a long running job with cooperative cancellation.
+
+    report is called with (done, total, bytesPerSecond, secondsLeft) at most
+    once per interval seconds. secondsLeft is None while no rate is known.
+    """
+
+    def __init__(self, total: int, report: Optional[Callable[[int, int, float, Optional[float]], None]] = None,
+                 interval: float = 0.25) -> None:
+        self.total = total
+        self.done = 0
+        self._report = report
+        self._interval = interval
+        self._start = time.monotonic()
+        self._lastReport = self._start
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def percent(self) -> int:
+        if self.total <= 0:
+            return 0
+        return min(100, int(self.done * 100 / self.total))
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def checkCancelled(self) -> None:
+        if self._cancelled:
+            raise EnBrailleCancelled()
+
+    def estimate(self) -> tuple[float, Optional[float]]:
+        """The bytes per second since the start and the seconds left, None while no rate is known."""
+        elapsed = time.monotonic() - self._start
+        bytesPerSecond = self.done / elapsed if elapsed > 0 else 0.0
+        secondsLeft = max(0, self.total - self.done) / bytesPerSecond if bytesPerSecond > 0 else None
+        return bytesPerSecond, secondsLeft
+
+    def advance(self, count: int) -> None:
+        self.done += count
+        if self._report is not None:
+            now = time.monotonic()
+            if now - self._lastReport >= self._interval:
+                self._lastReport = now
+                self._report(self.done, self.total, *self.estimate())
@@ -17,9 +17,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
+import re
+from bisect import bisect_right
 from typing import Optional
 from PySide6.QtCore import Qt, QCoreApplication
-from PySide6.QtWidgets import QComboBox, QWidget
+from PySide6.QtGui import QFont, QTextCursor
+from PySide6.QtWidgets import QComboBox, QHBoxLayout, QLabel, QSpinBox, QTextEdit, QVBoxLayout, QWidget
 from libbrl import libbrlImpl
 from enbraille_data import EnBrailleData
 from braille_table_translations import BrailleTableTranslations
@@ -85,3 +88,93 @@ class EnBrailleTableComboBox(QComboBox):
             return self.itemData(self.currentIndex())
         else:
             return None
+
+class EnBrailleBrfView(QWidget):
+    """Read-only text edit for BRF texts with a page selector.
+
+    The text stays in a QTextEdit, so screen readers can read and select it
+    as text. Pages end after page number lines.
+    """
+    # one line per match, line ends are normalized to \n before searching
+    _pagenoregex = re.compile(r'^[^\S\n]+#\w+$', re.MULTILINE)
+
+    def __init__(self, parent: QWidget = None) -> None:
+        super().__init__(parent)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+        self.textView = QTextEdit()
+        self.textView.setReadOnly(True)
+        self.textView.setLineWrapMode(QTextEdit.NoWrap)
+        self.textView.setAcceptRichText(False)
+        self.textView.setFont(QFont('Courier New', 10))
+        self.textView.cursorPositionChanged.connect(self.onCursorPositionChanged)
+        layout.addWidget(self.textView)
+
+        hbox = QHBoxLayout()
+        layout.addLayout(hbox)
+        pageLabel = QLabel(self.tr('Go to page:'))
+        hbox.addWidget(pageLabel)
+        self.pageSpinBox = QSpinBox()
+        self.pageSpinBox.setAccessibleName(self.tr('Page'))
+        self.pageSpinBox.setAccessibleDescription(self.tr('Number of the page to show'))
+        pageLabel.setBuddy(self.pageSpinBox)
+        self.pageSpinBox.valueChanged.connect(self.goToPage)
+        hbox.addWidget(self.pageSpinBox)
+        self.pageCountLabel = QLabel()
+        hbox.addWidget(self.pageCountLabel)
+        hbox.addStretch()
+
+        self._pageRows = []
+        self.setText('')
+
+    def setText(self, text: str) -> None:
+        # QTextEdit starts a new line at \r\n, \r and \n alike
+        normalized = text.replace('\r\n', '\n').replace('\r', '\n')
+        self._pageRows = [0] if text else []
+        row = pos = 0
+        lastRow = normalized.count('\n', 0, len(normalized) - 1)
+        for match in self._pagenoregex.finditer(normalized):
+            row += normalized.count('\n', pos, match.start())
+            pos = match.start()
+            if row < lastRow:
+                self._pageRows.append(row + 1)
+
+        self.textView.blockSignals(True)
+        self.textView.setPlainText(text)
+        self.textView.blockSignals(False)
+        self.pageSpinBox.blockSignals(True)
+        self.pageSpinBox.setRange(min(1, self.pageCount), self.pageCount)
+        self.pageSpinBox.setValue(self.pageSpinBox.minimum())
+        self.pageSpinBox.blockSignals(False)
+        self.pageCountLabel.setText(self.tr('of {0}').format(self.pageCount))
+
+    def toPlainText(self) -> str:
+        return self.textView.toPlainText()
+
+    @property
+    def pageCount(self) -> int:
+        return len(self._pageRows)
+
+    def pageRow(self, page: int) -> int:
+        """First line of page, lines counting from 0 and pages from 1."""
+        return self._pageRows[page - 1]
+
+    def pageOfRow(self, row: int) -> int:
+        return bisect_right(self._pageRows, row)
+
+    def goToPage(self, page: int) -> None:
+        if page < 1 or page > self.pageCount:
+            return
+        block = self.textView.document().findBlockByNumber(self.pageRow(page))
+        self.textView.setTextCursor(QTextCursor(block))
+        # show the page from its first line on
+        top = self.textView.document().documentLayout().blockBoundingRect(block).top()
+        self.textView.verticalScrollBar().setValue(int(top))
+
+    def onCursorPositionChanged(self) -> None:
+        self.pageSpinBox.blockSignals(True)
+        self.pageSpinBox.setValue(self.pageOfRow(self.textView.textCursor().blockNumber()))
+        self.pageSpinBox.blockSignals(False)
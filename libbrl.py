@@ -18,13 +18,24 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 import ctypes
+import hashlib
 import logging
 import os
 from enum import Enum
+from typing import Optional
 
 class libbrlImpls(Enum):
     LOUIS = 1
 
+class libbrlTypeforms(Enum):
+    """How a character of the input is to be rendered, see translateBlock().
+
+    Emphasis is written as markup by the document converter, so there are
+    no typeforms for it.
+    """
+    PLAIN = 0
+    COMPUTER = 1
+
 class libbrlInterface:
     def listTables(self) -> dict[str, str]:
         raise NotImplementedError()
@@ -32,6 +43,24 @@ class libbrlInterface:
     def translate(self, text: str, table: str) -> str:
         raise NotImplementedError()
 
+    def tableIdentity(self, table: str) -> str:
+        """A string that changes when the translation with table may change.
+
+        Used to key cached conversions, e.g. by the library version and the
+        content of the table file.
+        """
+        raise NotImplementedError()
+
+    def translateBlock(self, text: str, table: str,
+                       typeforms: Optional[list[libbrlTypeforms]] = None) -> tuple[str, list[int]]:
+        """Translate text with one call.
+
+        typeforms gives the form of every character of text. Returns the
+        braille and for every character of text the position of its braille,
+        so markup can be placed between the translated parts afterwards.
+        """
+        raise NotImplementedError()
+
 
 def libbrlImpl(impl: libbrlImpls = libbrlImpls.LOUIS) -> libbrlInterface:
     if impl == libbrlImpls.LOUIS:
@@ -45,6 +74,7 @@ class libbrlLouis(libbrlInterface):
     def __init__(self) -> None:
         super().__init__()
         self._tables = None
+        self._tablePaths: dict[str, str] = {}
     
     def listTables(self) -> dict[str, str]:
         if self._tables is None:
@@ -60,6 +90,7 @@ class libbrlLouis(libbrlInterface):
                 list_path = ctypes.string_at(table_item_ptr).decode("utf-8")
                 
                 table_filename = os.path.basename(list_path)    
+                self._tablePaths[table_filename] = list_path
                 with open(table_item_ptr, 'r', encoding='utf-8') as f:
                     first_line = f.readline().strip()
                     if first_line.startswith('# liblouis: '):
@@ -71,7 +102,7 @@ class libbrlLouis(libbrlInterface):
             #TODO: Free?
         return self._tables
 
-    def translate(self, text: str, table: str) -> str:
+    def _tableName(self, table: str) -> str:
         if self._tables is None:
             self._tables = self.listTables()
 
@@ -84,6 +115,32 @@ class libbrlLouis(libbrlInterface):
         
         if table_name is None:
             raise ValueError(f'Unknown table {table}')
-        
+        return table_name
+
+    def tableIdentity(self, table: str) -> str:
+        table_name = self._tableName(table)
+        digest = hashlib.sha1()
+        # included tables change with the liblouis version, the table itself may be edited
+        tablePath = self._tablePaths.get(table_name)
+        if tablePath:
+            with open(tablePath, 'rb') as f:
+                digest.update(f.read())
+        return '{}:{}:{}'.format(louis.version(), table_name, digest.hexdigest())
+
+    def translate(self, text: str, table: str) -> str:
+        table_name = self._tableName(table)
         logging.debug('libbrlLouis.translate: %s with table %s', text, table_name)
         return louis.translateString([table_name], text)
+
+    def translateBlock(self, text: str, table: str,
+                       typeforms: Optional[list[libbrlTypeforms]] = None) -> tuple[str, list[int]]:
+        table_name = self._tableName(table)
+        if not text:
+            return '', []
+        logging.debug('libbrlLouis.translateBlock: %s with table %s', text, table_name)
+        typeform = None
+        if typeforms is not None:
+            louisTypeforms = {libbrlTypeforms.PLAIN: louis.plain_text, libbrlTypeforms.COMPUTER: louis.computer_braille}
+            typeform = [louisTypeforms[form] for form in typeforms]
+        braille, inPos, outPos, cursorPos = louis.translate([table_name], text, typeform=typeform)
+        return braille, outPos
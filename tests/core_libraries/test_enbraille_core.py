@@ -0,0 +1,341 @@
+import sys
+import io
+import multiprocessing
+import os
+import pickle
+import shutil
+import subprocess
+import tempfile
+import unittest
+import zipfile
+import xml.etree.ElementTree as etree
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import mock
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from enbraille_core import (EnBrailleDocumentCache, EnBrailleMd2BRF, EnBrailleSettings, convertDocument, convertDocumentToFile, epub2brf,
+                            epub2brfToFile, markdown2brf, paginateDocument, xhtml2tree)
+from enbraille_core import document as core_document, epub as core_epub
+import enbraille_core as core_package
+from enbraille_tools import EnBrailleCancelled, EnBrailleProgress, writeOutput
+from enbraille_core.document import EnBrailleTextBlock
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+class TestEnBrailleCore(unittest.TestCase):
+    """The conversion core must work without Qt"""
+
+    def test_import_without_qt(self):
+        code = 'import sys, enbraille_core; print(any(m.split(".")[0] == "PySide6" for m in sys.modules))'
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+        self.assertEqual('False', result.stdout.strip())
+
+    def test_reformat_without_document_dependencies(self):
+        code = ('import sys, enbraille_core.reformat; '
+                'print(sorted(m for m in ("louis", "markdown", "tools.util_epub") if m in sys.modules))')
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+        self.assertEqual('[]', result.stdout.strip())
+        self.assertIn('epub2brf', dir(core_package))
+
+    def test_settings(self):
+        settings = EnBrailleSettings(documentLineLength=32)
+        self.assertEqual(32, settings.documentLineLength)
+        self.assertEqual('-', settings.reformatWordSplitter)
+        self.assertEqual(settings, EnBrailleSettings.fromData(settings))
+        with self.assertRaises(TypeError):
+            EnBrailleSettings(documentLineLenght=32)
+
+    def test_settings_snapshot(self):
+        settings = EnBrailleSettings(reformatLineLength=32)
+        with self.assertRaises(AttributeError):
+            settings.reformatLineLength = 40
+        self.assertIs(settings, EnBrailleSettings.fromData(settings))
+        self.assertEqual(settings, pickle.loads(pickle.dumps(settings)))
+        self.assertEqual(hash(settings), hash(EnBrailleSettings(reformatLineLength=32)))
+        changed = settings.replace(reformatLineLength=40)
+        self.assertEqual((32, 40), (settings.reformatLineLength, changed.reformatLineLength))
+
+    @mock.patch.object(EnBrailleMd2BRF, '_translateBlock', lambda self, text, typeforms: (text, list(range(len(text)))))
+    @mock.patch.object(EnBrailleMd2BRF, '_translate', lambda self, text: text)
+    def test_markdown2brf(self):
+        settings = EnBrailleSettings(documentTable='en-us-g1.ctb', documentH1Char='=')
+        self.assertEqual('=\nTitle\nSome text.\n', markdown2brf('# Title\n\nSome text.\n', settings))
+
+    @mock.patch.object(EnBrailleMd2BRF, '_translateBlock', lambda self, text, typeforms: (text, list(range(len(text)))))
+    @mock.patch.object(EnBrailleMd2BRF, '_translate', lambda self, text: text)
+    def test_convert_document(self):
+        settings = EnBrailleSettings(documentTable='en-us-g1.ctb')
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'doc.md')
+            with open(filename, 'w') as f:
+                f.write('Some text.\n')
+            self.assertEqual('Some text.\n', convertDocument(filename, settings))
+            with self.assertRaises(ValueError):
+                convertDocument(os.path.join(folder, 'doc.txt'), settings)
+
+class TestEnBrailleMd2BRFNesting(unittest.TestCase):
+    """The tree is walked without recursion"""
+
+    DEPTH = sys.getrecursionlimit() * 5
+
+    def setUp(self):
+        self.converter = EnBrailleMd2BRF(EnBrailleSettings(documentTable='en-us-g1.ctb'))
+        self.converter._translate = lambda text: text
+        self.converter._translateBlock = lambda text, typeforms: (text, list(range(len(text))))
+
+    @staticmethod
+    def nest(tag: str, depth: int, text: str) -> etree.Element:
+        root = etree.Element('div')
+        parent = root
+        for _ in range(depth):
+            parent = etree.SubElement(parent, tag)
+        parent.text = text
+        return root
+
+    def test_nested_blocks(self):
+        root = self.nest('blockquote', self.DEPTH, 'deep')
+        self.assertEqual('deep' + '\n' * self.DEPTH, self.converter.run(root))
+
+    def test_nested_inline(self):
+        root = self.nest('em', self.DEPTH, 'deep')
+        root[0].tail = ' end'
+        self.assertEqual('*' * self.DEPTH + 'deep' + '*' * self.DEPTH + ' end', self.converter.run(root))
+
+    def test_blocks_in_inline(self):
+        root = etree.Element('div')
+        parent = root
+        for _ in range(self.DEPTH):
+            parent = etree.SubElement(etree.SubElement(parent, 'a'), 'p')
+        parent.text = 'deep'
+        self.assertEqual('deep' + '\n' * self.DEPTH, self.converter.run(root))
+
+class TestEpub2Brf(unittest.TestCase):
+    """EPUB books are converted from their XHTML without Markdown"""
+
+    CHAPTER = b"""<?xml version="1.0" encoding="UTF-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head><title>Chapter 1</title><style>p { color: red; }</style></head>
+<body>
+  <section epub:type="chapter">
+    <h1>Chapter&nbsp;One</h1>
+    <p>Some <i>italic</i> and
+       <b>bold</b> text.</p>
+    <div>A <a href="chapter2.xhtml#top">link</a>, <span>a span</span><script>x()</script> and
+       <a href="https://example.org">a site</a>.</div>
+    <table><tbody><tr><td>Cell 1</td><td>Cell 2</td></tr></tbody></table>
+    <pre>
+line 1
+  line 2</pre>
+  </section>
+</body>
+</html>"""
+
+    BRF = ('=\nChapter\u00a0One\n'
+           'Some *italic* and **bold** text.\n'
+           'A link, a span and a site (https://example.org).\n'
+           '\nCell 1 | Cell 2\n\n'
+           '```\nline 1\n  line 2\n```\n')
+
+    def setUp(self):
+        self.settings = EnBrailleSettings(documentTable='en-us-g1.ctb', documentH1Char='=')
+        self.converter = EnBrailleMd2BRF(self.settings)
+        self.converter._translate = lambda text: text
+        self.converter._translateBlock = lambda text, typeforms: (text, list(range(len(text))))
+
+    def test_xhtml2tree(self):
+        root = xhtml2tree(self.CHAPTER)
+        self.assertEqual('div', root.tag)
+        self.assertEqual(['div', 'div', 'h1', 'p', 'em', 'strong', 'div', 'a', 'span', 'a', 'table', 'tbody', 'tr', 'td',
+                          'td', 'pre'], [element.tag for element in root.iter()])
+        self.assertIsNone(root.find('.//a').get('href'))
+
+    def test_convert_chapter(self):
+        self.assertEqual(self.BRF, self.converter.run(xhtml2tree(self.CHAPTER)))
+
+    def writeEpub(self, filename: str) -> None:
+        with zipfile.ZipFile(filename, 'w') as epub:
+            epub.writestr('mimetype', 'application/epub+zip')
+            epub.writestr('META-INF/container.xml', '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+                          '<rootfiles><rootfile full-path="OEBPS/content.opf"/></rootfiles></container>')
+            epub.writestr('OEBPS/content.opf', '<package version="2.0" xmlns="http://www.idpf.org/2007/opf"><manifest>'
+                          '<item id="c1" href="c1.xhtml" media-type="application/xhtml+xml"/>'
+                          '<item id="c2" href="c2.xhtml" media-type="application/xhtml+xml"/>'
+                          '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>'
+                          '</manifest><spine><itemref idref="c1"/><itemref idref="c2"/></spine></package>')
+            epub.writestr('OEBPS/toc.ncx', '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/"><navMap/></ncx>')
+            epub.writestr('OEBPS/c1.xhtml', self.CHAPTER)
+            epub.writestr('OEBPS/c2.xhtml', '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.1//EN" '
+                          '"http://www.w3.org/TR/xhtml11/DTD/xhtml11.dtd"><html xmlns="http://www.w3.org/1999/xhtml">'
+                          '<body><p>The&nbsp;end.</p></body></html>')
+
+    @mock.patch.object(EnBrailleMd2BRF, '_translateBlock', lambda self, text, typeforms: (text, list(range(len(text)))))
+    @mock.patch.object(EnBrailleMd2BRF, '_translate', lambda self, text: text)
+    def test_convert_epub(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'book.epub')
+            self.writeEpub(filename)
+            self.assertEqual(self.BRF + 'The\u00a0end.\n', convertDocument(filename, self.settings))
+
+    def test_paginate_document(self):
+        output = io.StringIO()
+        settings = EnBrailleSettings(documentLineLength=10, documentPageLength=3)
+        # the page number continues after the chapter break
+        self.assertEqual(5, paginateDocument(['a\nb\n', '', 'c\nd'], output, settings))
+        self.assertEqual('a\nb\nc\n       #b\nd\n', output.getvalue())
+
+    @mock.patch.object(EnBrailleMd2BRF, '_translateBlock', lambda self, text, typeforms: (text, list(range(len(text)))))
+    @mock.patch.object(EnBrailleMd2BRF, '_translate', lambda self, text: text)
+    def test_convert_epub_to_file(self):
+        settings = self.settings.replace(documentPageLength=4)
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'book.epub')
+            outFilename = os.path.join(folder, 'book.brf')
+            self.writeEpub(filename)
+            expected = epub2brf(filename, settings)
+
+            # every chapter is written before the next one is read
+            events = []
+            def parse(content):
+                events.append('read')
+                return xhtml2tree(content)
+            def write(*args):
+                events.append('write')
+                return writeOutput(*args)
+            with mock.patch.object(core_epub, 'xhtml2tree', parse), mock.patch.object(core_document, 'writeOutput', write):
+                lineCount = epub2brfToFile(filename, settings, outFilename)
+            self.assertEqual(['read', 'write', 'read', 'write'], events)
+            with open(outFilename, encoding='utf-8') as f:
+                self.assertEqual(expected, f.read())
+            self.assertEqual(expected.count('\n'), lineCount)
+
+            # chapters converted ahead on an executor, one at a time
+            with mock.patch.object(core_epub, '_CHAPTERWINDOW', 1), ThreadPoolExecutor(max_workers=2) as executor:
+                convertDocumentToFile(filename, settings, outFilename, executor=executor)
+            with open(outFilename, encoding='utf-8') as f:
+                self.assertEqual(expected, f.read())
+
+    @mock.patch.object(EnBrailleMd2BRF, '_translateBlock', lambda self, text, typeforms: (text, list(range(len(text)))))
+    @mock.patch.object(EnBrailleMd2BRF, '_translate', lambda self, text: text)
+    def test_chapter_progress(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'book.epub')
+            outFilename = os.path.join(folder, 'book.brf')
+            self.writeEpub(filename)
+
+            # every chapter is reported once it is written, without a toc by its file name
+            chapters = []
+            progress = EnBrailleProgress(0)
+            onChapter = lambda chapter, chapterCount: chapters.append((chapter.index, chapter.title, chapterCount,
+                                                                       progress.done))
+            convertDocumentToFile(filename, self.settings, outFilename, progress, onChapter=onChapter)
+            self.assertEqual(len(self.CHAPTER), chapters[0][3])
+            self.assertEqual([(0, 'c1.xhtml', 2), (1, 'c2.xhtml', 2)], [chapter[:3] for chapter in chapters])
+            self.assertEqual((progress.total, 100), (progress.done, progress.percent))
+
+            # cancelled after the first chapter, the second one is not converted
+            progress = EnBrailleProgress(0)
+            with self.assertRaises(EnBrailleCancelled):
+                convertDocumentToFile(filename, self.settings, outFilename, progress,
+                                      onChapter=lambda chapter, chapterCount: progress.cancel())
+            self.assertEqual(len(self.CHAPTER), progress.done)
+
+    def test_convert_epub_parallel(self):
+        # the chapters are translated in other processes, so nothing is mocked
+        settings = self.settings.replace(documentPageLength=4)
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'book.epub')
+            self.writeEpub(filename)
+            with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context('spawn')) as executor:
+                parallel = epub2brf(filename, settings, executor=executor)
+            self.assertEqual(epub2brf(filename, settings), parallel)
+        self.assertIn('#b\n', parallel)
+
+class TestEnBrailleDocumentCache(unittest.TestCase):
+    """Converted documents are cached by file content, table and settings"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.settings = EnBrailleSettings(documentTable='en-us-g1.ctb')
+
+    def write(self, name: str, content: str) -> str:
+        filename = os.path.join(self.folder, name)
+        with open(filename, 'w') as f:
+            f.write(content)
+        return filename
+
+    def test_key(self):
+        filename = self.write('doc.md', 'Some text.\n')
+        key = EnBrailleDocumentCache.key(filename, self.settings)
+        self.assertEqual(key, EnBrailleDocumentCache.key(filename, self.settings.replace(documentWorkerCount=4)))
+        self.assertNotEqual(key, EnBrailleDocumentCache.key(filename, self.settings.replace(documentLineLength=32)))
+        with mock.patch('libbrl.libbrlLouis.tableIdentity', lambda self, table: 'other'):
+            self.assertNotEqual(key, EnBrailleDocumentCache.key(filename, self.settings))
+        self.write('doc.md', 'Other text.\n')
+        self.assertNotEqual(key, EnBrailleDocumentCache.key(filename, self.settings))
+
+    def test_get_put(self):
+        cache = EnBrailleDocumentCache(os.path.join(self.folder, 'cache'), 1024)
+        outFilename = os.path.join(self.folder, 'out.brf')
+        self.assertIsNone(cache.get('a', outFilename))
+        cache.put('a', self.write('a.brf', 'line 1\nline 2\n'))
+        self.assertEqual(2, cache.get('a', outFilename))
+        with open(outFilename) as f:
+            self.assertEqual('line 1\nline 2\n', f.read())
+
+    def test_evict_least_recently_used(self):
+        cache = EnBrailleDocumentCache(os.path.join(self.folder, 'cache'), 30)
+        for i, key in enumerate('abc'):
+            cache.put(key, self.write(key + '.brf', key * 9 + '\n'))
+            # older entries, in the order they were put
+            os.utime(cache.entryFilename(key), ns=(i * 10**9, i * 10**9))
+        # reading 'a' makes 'b' the least recently used
+        self.assertEqual(1, cache.get('a', os.path.join(self.folder, 'out.brf')))
+        cache.put('d', self.write('d.brf', 'd' * 9 + '\n'))
+        self.assertEqual(['a', 'c', 'd'], sorted(name[0] for name in os.listdir(cache.folder)))
+
+        # too large to be cached at all
+        cache.put('e', self.write('e.brf', 'e' * 40))
+        self.assertIsNone(cache.get('e', os.path.join(self.folder, 'out.brf')))
+
+class TestEnBrailleTextBlock(unittest.TestCase):
+    """Markup is placed by the braille positions of the block"""
+
+    @staticmethod
+    def contract(text: str, typeforms) -> tuple:
+        # contracts "the" to "!" like a grade 2 table
+        braille = ''
+        outPos = []
+        i = 0
+        while i < len(text):
+            if text.startswith('the', i):
+                outPos.extend([len(braille)] * 3)
+                braille += '!'
+                i += 3
+            else:
+                outPos.append(len(braille))
+                braille += text[i].upper()
+                i += 1
+        return braille, outPos
+
+    def test_markup_positions(self):
+        block = EnBrailleTextBlock()
+        block.addMarkup('<')
+        block.addText('in ')
+        block.addMarkup('*')
+        block.addText('the')
+        block.addMarkup('*')
+        block.addText(' theatre')
+        block.addMarkup('>')
+        self.assertEqual('<IN *!* !ATRE>', block.translate(self.contract))
+
+    def test_markup_only(self):
+        block = EnBrailleTextBlock()
+        block.addText('')
+        block.addMarkup('\n')
+        self.assertEqual('\n', block.translate(self.contract))
+
+if __name__ == '__main__':
+    unittest.main()
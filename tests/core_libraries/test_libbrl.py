@@ -7,7 +7,7 @@ import tempfile
 # Add the project root to the path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from libbrl import libbrlImpls, libbrlInterface, libbrlImpl, libbrlLouis
+from libbrl import libbrlImpls, libbrlInterface, libbrlImpl, libbrlLouis, libbrlTypeforms
 
 
 class TestLibbrlEnums(unittest.TestCase):
@@ -213,6 +213,39 @@ class TestLibbrlLouis(unittest.TestCase):
             mock_translate.assert_called_once_with(['en-us-g1.ctb'], '123!@#')
             self.assertEqual(result, '⠼⠁⠃⠉')
 
+    @patch('libbrl.louis')
+    def test_translate_block(self, mock_louis):
+        """Test translation of a block with typeforms and positions"""
+        self.louis_impl._tables = {'English Grade 1': 'en-us-g1.ctb'}
+        mock_louis.plain_text, mock_louis.computer_braille = 0, 0x400
+        mock_louis.translate.return_value = ('⠁⠃', [0, 1], [0, 1], 0)
+
+        typeforms = [libbrlTypeforms.PLAIN, libbrlTypeforms.COMPUTER]
+        result = self.louis_impl.translateBlock('ab', 'English Grade 1', typeforms)
+
+        mock_louis.translate.assert_called_once_with(['en-us-g1.ctb'], 'ab', typeform=[0, 0x400])
+        self.assertEqual(('⠁⠃', [0, 1]), result)
+        self.assertEqual(('', []), self.louis_impl.translateBlock('', 'English Grade 1'))
+
+    @patch('libbrl.louis')
+    def test_table_identity(self, mock_louis):
+        """Test that the table identity follows the library version and the table content"""
+        mock_louis.version.return_value = '3.30.0'
+        with tempfile.TemporaryDirectory() as folder:
+            tablePath = os.path.join(folder, 'en-us-g1.ctb')
+            with open(tablePath, 'w') as f:
+                f.write('# liblouis: English Grade 1\n')
+            self.louis_impl._tables = {'English Grade 1': 'en-us-g1.ctb'}
+            self.louis_impl._tablePaths = {'en-us-g1.ctb': tablePath}
+
+            identity = self.louis_impl.tableIdentity('English Grade 1')
+            self.assertTrue(identity.startswith('3.30.0:en-us-g1.ctb:'))
+            self.assertEqual(identity, self.louis_impl.tableIdentity('en-us-g1.ctb'))
+            with open(tablePath, 'a') as f:
+                f.write('include other.cti\n')
+            self.assertNotEqual(identity, self.louis_impl.tableIdentity('English Grade 1'))
+            mock_louis.version.return_value = '3.31.0'
+            self.assertNotEqual(identity, self.louis_impl.tableIdentity('English Grade 1'))
 
 class TestLibbrlIntegration(unittest.TestCase):
     """Integration tests for the libbrl module"""
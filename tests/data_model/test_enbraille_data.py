@@ -139,8 +139,14 @@ class TestEnBrailleData(unittest.TestCase):
         self.data.reformatKeepPageNo = True
         self.assertTrue(self.data.reformatKeepPageNo)
         
+        # Test reformatWorkerCount (0 means one worker per CPU core)
+        self.assertEqual(self.data.reformatWorkerCount, 0)
+        self.data.reformatWorkerCount = 4
+        self.assertEqual(self.data.reformatWorkerCount, 4)
+        
         # Test persistence
         data2 = EnBrailleData(self.app)
+        self.assertEqual(data2.reformatWorkerCount, 4)
         self.assertEqual(data2.reformatLineLength, 80)
         self.assertEqual(data2.reformatPageLength, 25)
         self.assertEqual(data2.reformatWordSplitter, '~')
@@ -159,6 +165,35 @@ class TestEnBrailleData(unittest.TestCase):
             # This is expected due to the bug - wrong decorator
             self.fail("BUG FOUND: documentTextTable setter has wrong decorator @textTable.setter instead of @documentTextTable.setter")
     
+    def test_document_table_alias(self):
+        """documentTable reads and writes documentTextTable"""
+        self.data.documentTable = 'de-g1.ctb'
+        self.assertEqual(self.data.documentTextTable, 'de-g1.ctb')
+        self.assertEqual(self.data.documentTable, 'de-g1.ctb')
+
+    def test_settings_write_behind(self):
+        """Changes are kept in memory and written together"""
+        for value in range(41, 60):
+            self.data.reformatLineLength = value
+        self.assertTrue(self.data._settings.dirty)
+        self.assertTrue(self.data._settings._timer.isActive())
+        settings = QSettings(self.app.organizationName(), self.app.applicationName())
+        self.assertIsNone(settings.value('reformatLineLength'))
+
+        # other instances share the values in memory
+        self.assertEqual(59, EnBrailleData(self.app).reformatLineLength)
+
+        self.data.flush()
+        self.assertFalse(self.data._settings.dirty)
+        self.assertFalse(self.data._settings._timer.isActive())
+        settings = QSettings(self.app.organizationName(), self.app.applicationName())
+        self.assertEqual(59, settings.value('reformatLineLength', type=int))
+
+    def test_core_settings_defaults(self):
+        """The Qt-free settings have the same defaults"""
+        from enbraille_core import EnBrailleSettings
+        self.assertEqual(EnBrailleSettings(), EnBrailleSettings.fromData(self.data))
+
     def test_document_properties(self):
         """Test document-related properties"""
         # Test documentLineLength
@@ -172,6 +207,16 @@ class TestEnBrailleData(unittest.TestCase):
         # Test documentWordSplitter
         self.data.documentWordSplitter = '='
         self.assertEqual(self.data.documentWordSplitter, '=')
+        
+        # Test documentWorkerCount (0 means one worker per CPU core)
+        self.assertEqual(self.data.documentWorkerCount, 0)
+        self.data.documentWorkerCount = 3
+        self.assertEqual(self.data.documentWorkerCount, 3)
+
+        # Test documentCacheSize in MB (0 disables the cache)
+        self.assertEqual(self.data.documentCacheSize, 256)
+        self.data.documentCacheSize = 0
+        self.assertEqual(self.data.documentCacheSize, 0)
     
     def test_heading_characters(self):
         """Test document heading character properties"""
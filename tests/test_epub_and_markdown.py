@@ -8,15 +8,21 @@ import os
 import sys
 import unittest
 import xml.etree.ElementTree as etree
-from unittest.mock import Mock, MagicMock
+from unittest.mock import Mock, MagicMock, patch
 from io import BytesIO
+from types import SimpleNamespace
 
 # Add parent directory to path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from tools.util_epub import epub2md, MDFilter, Epub
-from enbraille_functions.document import EnBrailleMd2BRF
+from enbraille_core.reformat import readOutputFile
+from enbraille_core.document import EnBrailleMd2BRF
+from enbraille_core.epub import epubSpine
+from enbraille_core.settings import DEFAULTS
+from enbraille_functions.document import EnBrailleDocumentWorker
 from enbraille_data import EnBrailleData
+from libbrl import libbrlTypeforms
 from PySide6.QtGui import QGuiApplication
 
 def get_shared_app():
@@ -284,8 +290,9 @@ class TestEnBrailleMd2BRF(unittest.TestCase):
         self.data.documentBulletL6Char = '⁃'
         
         self.converter = EnBrailleMd2BRF(self.data)
-        # Mock the translation function for testing
+        # Mock the translation functions for testing
         self.converter._translate = Mock(side_effect=lambda x: x if x else '')
+        self.converter._translateBlock = Mock(side_effect=lambda text, typeforms: (text, list(range(len(text)))))
     
     def create_element(self, tag, text=None, attrib=None):
         """Helper to create XML elements for testing"""
@@ -426,6 +433,23 @@ class TestEnBrailleMd2BRF(unittest.TestCase):
         self.assertIn('**bold**', result)
         self.assertIn('end.', result)
     
+    def test_block_is_translated_once(self):
+        """The text of a block is translated with one call, markup is placed around it"""
+        p = self.create_element('p', 'One ')
+        for word, tail in (('two', ' three '), ('four', ', '), ('five', '.')):
+            em = self.create_element('em', word)
+            em.tail = tail
+            p.append(em)
+        code = self.create_element('code', 'x')
+        p.append(code)
+
+        result = self.converter.convert_paragraph(p)
+        self.assertEqual('One *two* three *four*, *five*.`x`\n', result)
+        self.converter._translateBlock.assert_called_once()
+        text, typeforms = self.converter._translateBlock.call_args.args
+        self.assertEqual('One two three four, five.x', text)
+        self.assertEqual([libbrlTypeforms.PLAIN] * 25 + [libbrlTypeforms.COMPUTER], typeforms)
+
     def test_horizontal_rule(self):
         """Test horizontal rule conversion"""
         hr = self.create_element('hr')
@@ -658,5 +682,62 @@ class TestEpub3Samples(unittest.TestCase):
         self.assertIn("def example", result)
 
 
+class TestDocumentWorker(unittest.TestCase):
+    """The document is converted in the background into the output spool"""
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.md')
+        with os.fdopen(fd, 'w') as f:
+            f.write('# Title\n\nSome text.\n')
+        self.addCleanup(os.unlink, self.filename)
+
+    def run_worker(self, cancel: bool = False, cacheDir: str = None, filename: str = None) -> tuple[SimpleNamespace, list]:
+        data = SimpleNamespace(**DEFAULTS)
+        data.documentTable = 'en-us-g1.ctb'
+        data.documentFilename = filename or self.filename
+        data.documentWorkerCount = 1
+        data.outputData = ''
+        data.outputFiles = None
+        data.cacheDir = cacheDir
+        worker = EnBrailleDocumentWorker(data)
+        emitted = []
+        worker.progress.connect(lambda percent, message: emitted.append((percent, message)))
+        if cancel:
+            worker.cancel()
+        worker.run()
+        return data, emitted
+
+    def test_convert(self):
+        data, emitted = self.run_worker()
+        self.assertIsNone(data.outputData)
+        [(spoolFilename, size)] = data.outputFiles
+        self.assertEqual(os.path.getsize(spoolFilename), size)
+        self.assertNotEqual('', readOutputFile(spoolFilename))
+        self.assertEqual((100, 'Done.'), emitted[-1])
+
+    def test_cached(self):
+        with tempfile.TemporaryDirectory() as cacheDir:
+            data, emitted = self.run_worker(cacheDir=cacheDir)
+            converted = readOutputFile(data.outputFiles[0][0])
+            # the second conversion is a copy from the cache
+            with patch('enbraille_functions.document.convertDocumentToFile', side_effect=AssertionError):
+                data, emitted = self.run_worker(cacheDir=cacheDir)
+            self.assertEqual(converted, readOutputFile(data.outputFiles[0][0]))
+            self.assertEqual((100, 'Done.'), emitted[-1])
+
+    def test_epub_spine_is_read_once(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'accessible_epub_3.epub')
+        with patch('enbraille_functions.document.epubSpine', wraps=epubSpine) as pageSpine, \
+             patch('enbraille_core.epub.epubSpine', wraps=epubSpine) as coreSpine:
+            data, emitted = self.run_worker(filename=filename)
+        self.assertEqual((100, 'Done.'), emitted[-1])
+        self.assertEqual(1, pageSpine.call_count + coreSpine.call_count)
+
+    def test_cancel(self):
+        data, emitted = self.run_worker(cancel=True)
+        self.assertEqual([], data.outputFiles)
+        self.assertEqual([(0, 'Cancelled.')], emitted)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
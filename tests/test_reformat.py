@@ -1,13 +1,29 @@
 import sys
+import io
 import os
+import random
+import shutil
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from types import SimpleNamespace
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from enbraille_functions.reformat import EnBrailleReformater
+from enbraille_core import reformat
+from enbraille_core.reformat import EnBrailleBrfIndex, EnBrailleReformatBatch, EnBrailleReformater
+from enbraille_functions.reformat import EnBrailleCharacteristicsWorker, EnBrailleReformaterWorker
+from enbraille_tools import EnBrailleCancelled, EnBrailleProgress, generateOutput, reformatPragraph
 from tests.test_utilenbraille import gen_data
+from tools import fuzz_layout
+from tools.fuzz_layout import referenceParseParagraphs
 
 TESTFILE_DIR = os.path.join(os.path.dirname(__file__), 'data')
 
+def reformat_settings(lineLength: int = 40, pageLength: int = 25, wordSplitter: str = '-', keepPageNo: bool = True) -> SimpleNamespace:
+    return SimpleNamespace(reformatLineLength=lineLength, reformatPageLength=pageLength,
+                           reformatWordSplitter=wordSplitter, reformatKeepPageNo=keepPageNo)
+
 class TestReformatBRF(unittest.TestCase):
 
     def test_reformat_simple(self):
@@ -20,4 +36,651 @@ class TestReformatBRF(unittest.TestCase):
         # Verify it's actually 0
         self.assertEqual(0, data.reformatLineLength)
         self.assertEqual('', reformater.reformat(None, data))
-        
\ No newline at end of file
+
+    def test_settings_snapshot(self):
+        # the settings are read once when the job starts, not per line
+        class CountingData:
+            def __init__(self, settings):
+                self.reads = {}
+                self._settings = settings
+
+            def __getattr__(self, name):
+                value = getattr(self._settings, name)
+                self.reads[name] = self.reads.get(name, 0) + 1
+                return value
+
+        filename = os.path.join(TESTFILE_DIR, 'reformat_simple.brf')
+        reformater = EnBrailleReformater(filename)
+        data = CountingData(reformat_settings(lineLength=30))
+        expected = reformater.reformat(None, reformat_settings(lineLength=30))
+        for fct, output in ((reformater.reformat, expected), (reformater.reformatBytes, expected.encode('utf-8'))):
+            with self.subTest(fct=fct.__name__):
+                data.reads.clear()
+                self.assertEqual(output, fct(None, data))
+                # hasattr() and getattr() of the snapshot
+                self.assertEqual({2}, set(data.reads.values()))
+
+class TestReformatBRFBytes(unittest.TestCase):
+    """The bytes mode must produce the same output as the text mode"""
+
+    CONTENT = ('first line of a para- \n'
+               'graph that is long enough to continue\n'
+               'on the next line.\n'
+               '   #a\n'
+               '  indented paragraph start\n'
+               'short\n'
+               '\t#b\n'
+               'trailing words with spaces    \n')
+
+    def _write(self, content: bytes) -> str:
+        fd, filename = tempfile.mkstemp(suffix='.brf')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        self.addCleanup(os.unlink, filename)
+        return filename
+
+    def assertSameOutput(self, filename: str, data: SimpleNamespace) -> None:
+        reformater = EnBrailleReformater(filename)
+        self.assertEqual(reformater.reformat(None, data).encode('utf-8'), reformater.reformatBytes(None, data))
+
+    def test_sample_file(self):
+        filename = os.path.join(TESTFILE_DIR, 'reformat_simple.brf')
+        for lineLength in (10, 32, 40):
+            with self.subTest(lineLength=lineLength):
+                self.assertSameOutput(filename, reformat_settings(lineLength=lineLength))
+
+    def test_page_numbers(self):
+        filename = self._write(self.CONTENT.encode('ascii'))
+        for keepPageNo in (True, False):
+            with self.subTest(keepPageNo=keepPageNo):
+                self.assertSameOutput(filename, reformat_settings(lineLength=20, pageLength=3, keepPageNo=keepPageNo))
+
+    def test_line_endings(self):
+        for newline in ('\r\n', '\r'):
+            with self.subTest(newline=repr(newline)):
+                filename = self._write(self.CONTENT.replace('\n', newline).encode('ascii'))
+                self.assertSameOutput(filename, reformat_settings(lineLength=20))
+
+    def test_line_length_zero(self):
+        filename = self._write(self.CONTENT.encode('ascii'))
+        self.assertEqual(b'', EnBrailleReformater(filename).reformatBytes(None, reformat_settings(lineLength=0)))
+
+class TestReformatBRFStreaming(unittest.TestCase):
+    """reformatToFile must write what reformat() returns"""
+
+    def setUp(self):
+        fd, self.outFilename = tempfile.mkstemp(suffix='.brf')
+        os.close(fd)
+        self.addCleanup(os.unlink, self.outFilename)
+
+    def test_sample_file(self):
+        reformater = EnBrailleReformater(os.path.join(TESTFILE_DIR, 'reformat_simple.brf'))
+        for pageLength in (0, 5):
+            with self.subTest(pageLength=pageLength):
+                data = reformat_settings(lineLength=20, pageLength=pageLength)
+                lineCount = reformater.reformatToFile(None, data, self.outFilename)
+                with open(self.outFilename, 'r') as f:
+                    output = f.read()
+                self.assertEqual(reformater.reformat(None, data), output)
+                self.assertEqual(len(output.splitlines()), lineCount)
+
+    def test_line_length_zero(self):
+        reformater = EnBrailleReformater(os.path.join(TESTFILE_DIR, 'reformat_simple.brf'))
+        self.assertEqual(0, reformater.reformatToFile(None, reformat_settings(lineLength=0), self.outFilename))
+        self.assertEqual(0, os.path.getsize(self.outFilename))
+
+    def test_read_lines_across_chunks(self):
+        content = b'one\r\ntwo\rthree\n\nfour\r'
+        for chunkSize in (1, 2, 3, 5, 64):
+            with self.subTest(chunkSize=chunkSize):
+                lines = list(EnBrailleReformater._readLinesBytes(io.BytesIO(content), chunkSize))
+                self.assertEqual(content.splitlines(), lines)
+
+class TestReformaterWorkerMultiFile(unittest.TestCase):
+    """Multi-file reformatting on a process pool"""
+
+    def run_worker(self, filenames: list[str], workerCount: int) -> tuple[SimpleNamespace, list]:
+        data = reformat_settings(lineLength=20, pageLength=5)
+        data.reformatFilename = filenames
+        data.reformatWorkerCount = workerCount
+        worker = EnBrailleReformaterWorker(data)
+        emitted = []
+        worker.progress.connect(lambda percent, message: emitted.append((percent, message)))
+        worker.fileErrors.connect(lambda message: emitted.append(('fileErrors', message)))
+        worker.run()
+        return data, emitted
+
+    def test_outputs_keep_input_order(self):
+        sample = os.path.join(TESTFILE_DIR, 'reformat_simple.brf')
+        fd, other = tempfile.mkstemp(suffix='.brf')
+        with os.fdopen(fd, 'w') as f:
+            f.write(TestReformatBRFBytes.CONTENT)
+        self.addCleanup(os.unlink, other)
+
+        filenames = [sample, other, sample]
+        expected = [EnBrailleReformater(f).reformat(None, reformat_settings(lineLength=20, pageLength=5)) for f in filenames]
+        for workerCount in (1, 2):
+            with self.subTest(workerCount=workerCount):
+                data, emitted = self.run_worker(filenames, workerCount)
+                self.assertIsNone(data.outputData)
+                self.assertEqual(expected, [reformat.readOutputFile(filename) for filename, size in data.outputFiles])
+                self.assertEqual([os.path.getsize(filename) for filename, size in data.outputFiles],
+                                 [size for filename, size in data.outputFiles])
+                # leave out the timed throughput reports
+                self.assertEqual([33, 66, 100, 100], [percent for percent, message in emitted if 'MB/s' not in message])
+
+    def test_failing_file_is_reported(self):
+        sample = os.path.join(TESTFILE_DIR, 'reformat_simple.brf')
+        missing = os.path.join(TESTFILE_DIR, 'does_not_exist.brf')
+        data, emitted = self.run_worker([sample, missing], 2)
+        self.assertNotEqual('', reformat.readOutputFile(data.outputFiles[0][0]))
+        self.assertIsNone(data.outputFiles[1])
+        # not fatal, the run is done with the other file
+        errors = [message for percent, message in emitted if percent == 'fileErrors']
+        self.assertEqual(1, len(errors))
+        self.assertIn('does_not_exist.brf', errors[0])
+        self.assertNotIn(-1, [percent for percent, message in emitted])
+        self.assertEqual(100, emitted[-1][0])
+
+    def test_all_files_failing(self):
+        missing = os.path.join(TESTFILE_DIR, 'does_not_exist.brf')
+        data, emitted = self.run_worker([missing, missing], 1)
+        self.assertEqual(-1, emitted[-1][0])
+        self.assertIn('does_not_exist.brf', emitted[-1][1])
+
+    def test_spooled_outputs_are_saved(self):
+        sample = os.path.join(TESTFILE_DIR, 'reformat_simple.brf')
+        missing = os.path.join(TESTFILE_DIR, 'does_not_exist.brf')
+        data, emitted = self.run_worker([sample, missing, sample], 2)
+        expected = reformat.readOutputFile(data.outputFiles[0][0])
+        spooled = [outputFile[0] for outputFile in data.outputFiles if outputFile]
+
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        targets = [os.path.join(folder, name) for name in ('a.brf', 'b.brf', 'c.brf')]
+        outputFiles, errors = reformat._outputSpool.save(data.outputFiles, targets)
+        self.assertEqual([], errors)
+        # spooled files are moved, the failed one is left out
+        self.assertEqual([targets[0], None, targets[2]], [outputFile and outputFile[0] for outputFile in outputFiles])
+        self.assertFalse(any(os.path.exists(filename) for filename in spooled))
+        self.assertFalse(os.path.exists(targets[1]))
+
+        # saving again copies the saved files
+        otherFolder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, otherFolder)
+        otherTargets = [os.path.join(otherFolder, os.path.basename(target)) for target in targets]
+        self.assertEqual((outputFiles, []), reformat._outputSpool.save(outputFiles, otherTargets))
+        for target in (targets[0], targets[2], otherTargets[0], otherTargets[2]):
+            self.assertEqual(expected, reformat.readOutputFile(target))
+        self.assertEqual(['a.brf', 'c.brf'], sorted(os.listdir(otherFolder)))
+
+    def test_next_run_clears_spool(self):
+        sample = os.path.join(TESTFILE_DIR, 'reformat_simple.brf')
+        data, emitted = self.run_worker([sample], 1)
+        spooled = data.outputFiles[0][0]
+        self.assertTrue(os.path.exists(spooled))
+        self.run_worker([sample], 1)
+        self.assertFalse(os.path.exists(spooled))
+
+class TestReformatBRFParallel(unittest.TestCase):
+    """Chunked reformatting must stitch to the same output as reformat()"""
+
+    def setUp(self):
+        # several short lines (paragraph ends) spread over the file
+        lines = []
+        for page in range(12):
+            for i in range(6):
+                lines.append('word ' * 5 + 'split-' if i % 3 == 0 else 'some more words on this line')
+            lines.append('end of par-' if page % 4 == 0 else 'short')
+            lines.append('   #' + 'abcdefghij'[page % 10])
+        fd, self.filename = tempfile.mkstemp(suffix='.brf')
+        with os.fdopen(fd, 'w') as f:
+            f.write('\n'.join(lines))
+        self.addCleanup(os.unlink, self.filename)
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_chunk_offsets_are_paragraph_ends(self):
+        data = reformat_settings(lineLength=32)
+        reformater = EnBrailleReformater(self.filename)
+        offsets = reformater._findChunkOffsets(data, 6)
+        self.assertGreater(len(offsets), 1)
+        self.assertEqual(sorted(set(offsets)), offsets)
+        with open(self.filename, 'rb') as f:
+            content = f.read()
+        for offset in offsets:
+            self.assertEqual(b'\n', content[offset - 1:offset])
+            # 'end of par-' is short too, but continues in the next paragraph
+            self.assertEqual(b'short', content[:offset].splitlines()[-1])
+
+    def test_chunk_offsets_from_index(self):
+        data = reformat_settings(lineLength=32)
+        expected = EnBrailleReformater(self.filename)._findChunkOffsets(data, 6)
+        cacheDir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cacheDir)
+        reformater = EnBrailleReformater(self.filename, cacheDir=cacheDir)
+        self.assertIsNotNone(reformater.index)
+        with mock.patch.object(EnBrailleReformater, '_findParagraphBoundary', side_effect=AssertionError('scanned')):
+            self.assertEqual(expected, reformater._findChunkOffsets(data, 6))
+            # a saved index is found without loading it first
+            self.assertEqual(expected, EnBrailleReformater(self.filename, analyze=False, cacheDir=cacheDir)._findChunkOffsets(data, 6))
+
+    def test_same_output_as_reformat(self):
+        reformater = EnBrailleReformater(self.filename)
+        for keepPageNo in (True, False):
+            for chunkCount in (2, 5, 20):
+                with self.subTest(keepPageNo=keepPageNo, chunkCount=chunkCount):
+                    data = reformat_settings(lineLength=32, pageLength=7, keepPageNo=keepPageNo)
+                    self.assertEqual(reformater.reformat(None, data), reformater.reformatParallel(None, data, self.executor, chunkCount))
+
+    def test_no_boundary_found(self):
+        # no line is short enough to end a paragraph
+        data = reformat_settings(lineLength=4)
+        reformater = EnBrailleReformater(self.filename)
+        self.assertEqual([], reformater._findChunkOffsets(data, 4))
+        self.assertEqual(reformater.reformat(None, data), reformater.reformatParallel(None, data, self.executor, 4))
+
+class TestReformatProgress(unittest.TestCase):
+    """Byte based progress and cancellation of reformat jobs"""
+
+    def setUp(self):
+        self.filename = os.path.join(TESTFILE_DIR, 'reformat_simple.brf')
+        self.size = os.path.getsize(self.filename)
+        self.data = reformat_settings(lineLength=32)
+
+    def test_progress_follows_file_position(self):
+        reports = []
+        progress = EnBrailleProgress(self.size, lambda *args: reports.append(args), interval=0)
+        reformater = EnBrailleReformater(self.filename)
+        self.assertEqual(reformater.reformat(None, self.data), reformater.reformat(progress, self.data))
+        self.assertEqual(self.size, progress.done)
+        self.assertEqual(100, progress.percent)
+        done = [report[0] for report in reports]
+        self.assertEqual(sorted(done), done)
+        self.assertTrue(all(total == self.size for _, total, _, _ in reports))
+
+    def test_all_paths_count_bytes(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        filename = os.path.join(folder, 'book.brf')
+        # CRLF line ends, a non ASCII line and no line end at the end of the file
+        with open(filename, 'w', encoding='utf-8', newline='') as f:
+            f.write('some words on a line\r\nümlaut line\r\nshort\r\n   #a\r\nlast line')
+        size = os.path.getsize(filename)
+        reformater = EnBrailleReformater(filename)
+        outFilename = os.path.join(folder, 'out.brf')
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            runs = {'text': lambda progress: reformater.reformat(progress, self.data),
+                    'bytes': lambda progress: reformater.reformatBytes(progress, self.data),
+                    'streaming': lambda progress: reformater.reformatToFile(progress, self.data, outFilename),
+                    'parallel': lambda progress: reformater.reformatParallel(progress, self.data, executor, 2)}
+            for name, run in runs.items():
+                with self.subTest(run=name):
+                    progress = EnBrailleProgress(size)
+                    run(progress)
+                    self.assertEqual(size, progress.done)
+
+    def test_cancel_before_start(self):
+        reformater = EnBrailleReformater(self.filename)
+        executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+        fd, outFilename = tempfile.mkstemp(suffix='.brf')
+        os.close(fd)
+        self.addCleanup(os.unlink, outFilename)
+        runs = {'text': lambda progress: reformater.reformat(progress, self.data),
+                'bytes': lambda progress: reformater.reformatBytes(progress, self.data),
+                'streaming': lambda progress: reformater.reformatToFile(progress, self.data, outFilename),
+                'parallel': lambda progress: reformater.reformatParallel(progress, self.data, executor, 4)}
+        for mode, run in runs.items():
+            with self.subTest(mode=mode):
+                progress = EnBrailleProgress(self.size)
+                progress.cancel()
+                with self.assertRaises(EnBrailleCancelled):
+                    run(progress)
+
+    def test_cancel_while_running(self):
+        def report(done, total, bytesPerSecond, secondsLeft):
+            if done > total // 2:
+                progress.cancel()
+        progress = EnBrailleProgress(self.size, report, interval=0)
+        with self.assertRaises(EnBrailleCancelled):
+            EnBrailleReformater(self.filename).reformat(progress, self.data)
+        self.assertLess(progress.done, self.size)
+
+    def test_throughput_and_time_left(self):
+        reports = []
+        progress = EnBrailleProgress(1000, lambda *args: reports.append(args), interval=0)
+        progress.advance(250)
+        done, total, bytesPerSecond, secondsLeft = reports[-1]
+        self.assertEqual((250, 1000), (done, total))
+        self.assertGreater(bytesPerSecond, 0)
+        self.assertAlmostEqual(750 / bytesPerSecond, secondsLeft)
+        self.assertEqual(25, progress.percent)
+
+    def test_worker_cancel(self):
+        data = reformat_settings(lineLength=32)
+        data.reformatFilename = self.filename
+        data.reformatWorkerCount = 1
+        worker = EnBrailleReformaterWorker(data)
+        emitted = []
+        worker.progress.connect(lambda percent, message: emitted.append((percent, message)))
+        worker.cancel()
+        worker.run()
+        self.assertTrue(worker.cancelled)
+        self.assertIsNone(data.outputData)
+        self.assertEqual('Cancelled.', emitted[-1][1])
+        self.assertNotIn(-1, [percent for percent, _ in emitted])
+
+    def test_worker_reads_file_once(self):
+        data = reformat_settings(lineLength=32)
+        data.reformatFilename = self.filename
+        data.reformatWorkerCount = 1
+        worker = EnBrailleReformaterWorker(data)
+        # no analysis pass before the reformatting reads the file
+        with mock.patch.object(EnBrailleReformater, '_loadFile', side_effect=AssertionError('analyzed')):
+            worker.run()
+        self.assertEqual(EnBrailleReformater(self.filename).reformat(None, data), data.outputData)
+
+class TestParseParagraphs(unittest.TestCase):
+    """_parseParagraphs must yield exactly the paragraphs of the original parser"""
+
+    PIECES = ['a', 'word', 'longerword', 'par-', 'ti-', '-', '--', ' ', '  ', '\t', '#', '#ab', 'ä', '.', '=']
+
+    def random_text(self, rnd: random.Random) -> str:
+        lines = []
+        for _ in range(rnd.randint(0, 40)):
+            kind = rnd.random()
+            if kind < 0.1:
+                lines.append(rnd.choice([' ', '   ', '\t', ' \t ']) + '#' + rnd.choice(['a', 'bc', 'j_1']))
+            elif kind < 0.15:
+                lines.append(rnd.choice(['', ' ', '  ']))
+            else:
+                lines.append(''.join(rnd.choice(self.PIECES) + rnd.choice(['', ' ', ' ', '  ']) for _ in range(rnd.randint(1, 12))))
+        return ''.join(line + rnd.choice(['\n', '\n', '\r\n', '\r']) for line in lines) + rnd.choice(['', 'tail', ' -'])
+
+    def test_same_paragraphs_as_reference(self):
+        rnd = random.Random(31)
+        reformater = EnBrailleReformater(os.path.join(TESTFILE_DIR, 'reformat_simple.brf'))
+        for i in range(500):
+            text = self.random_text(rnd)
+            data = reformat_settings(lineLength=rnd.choice([0, 4, 10, 20, 40]), wordSplitter=rnd.choice(['-', '=', '--']),
+                                     keepPageNo=rnd.random() < 0.7)
+            with self.subTest(i=i, text=text):
+                expected = referenceParseParagraphs(io.StringIO(text, newline=None), data)
+                self.assertEqual(expected, list(reformater._parseParagraphs(io.StringIO(text, newline=None), data)))
+
+    def test_long_paragraph(self):
+        # a single paragraph over many lines used to be rebuilt on every word
+        text = ('word ' * 20 + 'con-\n') * 2000
+        data = reformat_settings(lineLength=40)
+        paragraphs = list(EnBrailleReformater(os.path.join(TESTFILE_DIR, 'reformat_simple.brf'))._parseParagraphs(io.StringIO(text), data))
+        self.assertEqual(referenceParseParagraphs(io.StringIO(text), data), paragraphs)
+
+class TestDifferentialFuzzing(unittest.TestCase):
+    """The fast layout engines must agree with their references on random input"""
+
+    def test_builtin_engines_agree(self):
+        for differential in fuzz_layout.builtinDifferentials():
+            with self.subTest(engine=differential.name):
+                counterexample = fuzz_layout.run(differential, 150, seed=39)
+                self.assertIsNone(counterexample, str(counterexample))
+
+    def test_reference_is_independent(self):
+        # a regression in the rewritten output path is caught, the reference does not share it
+        with mock.patch('enbraille_tools.pageNumberLine', lambda pageNo, lineLength: '#' + str(pageNo)):
+            counterexample = fuzz_layout.run(fuzz_layout.outputDifferential(generateOutput), 100, seed=39)
+        self.assertIsNotNone(counterexample)
+
+    def test_counterexample_is_minimized(self):
+        def broken(paragraph: str, lineLength: int, wordSplitter: str) -> list[str]:
+            # forgets the splitter in paragraphs of ten or more cells
+            return reformatPragraph(paragraph, lineLength, wordSplitter if len(paragraph) < 10 else '')
+
+        differential = fuzz_layout.paragraphDifferential(broken)
+        counterexample = fuzz_layout.run(differential, 200)
+        self.assertIsNotNone(counterexample)
+        minimized = counterexample.minimized
+        self.assertTrue(differential.fails(minimized))
+        # a single word that just needs a split
+        self.assertEqual(1, len(minimized.items))
+        self.assertEqual(10, len(minimized.items[0]))
+        self.assertIn('reference', str(counterexample))
+
+class TestReformatPreview(unittest.TestCase):
+    """The preview shows the start of the full output"""
+
+    def setUp(self):
+        lines = ['some words on a line that is long enough', 'short', '   #a'] * 200
+        fd, self.filename = tempfile.mkstemp(suffix='.brf')
+        with os.fdopen(fd, 'w') as f:
+            f.write('\n'.join(lines))
+        self.addCleanup(os.unlink, self.filename)
+
+    def test_preview_is_start_of_output(self):
+        reformater = EnBrailleReformater(self.filename)
+        for pageLength in (0, 5, 25):
+            with self.subTest(pageLength=pageLength):
+                data = reformat_settings(lineLength=20, pageLength=pageLength)
+                full = reformater.reformat(None, data)
+                preview = reformater.reformatPreview(data, 3)
+                self.assertTrue(full.startswith(preview))
+                self.assertLess(len(preview), len(full))
+                if pageLength:
+                    self.assertEqual(3, preview.count('#') - preview.count('   #a'))
+
+    def test_preview_without_line_length(self):
+        self.assertEqual('', EnBrailleReformater(self.filename).reformatPreview(reformat_settings(lineLength=0), 3))
+
+    def test_preview_of_long_paragraph_is_bounded(self):
+        # no line is short, so the whole file is one paragraph
+        line = 'a line of words that never ends its paragraph\n'
+        with open(self.filename, 'w') as f:
+            f.write(line * 1000)
+        data = reformat_settings(lineLength=20, pageLength=5)
+        preview = EnBrailleReformater(self.filename).reformatPreview(data, 3, maxBytes=2 * len(line) + 5)
+        # only the whole lines within maxBytes are reformatted
+        with open(self.filename, 'w') as f:
+            f.write(line * 2)
+        self.assertEqual(EnBrailleReformater(self.filename).reformat(None, data), preview)
+
+class TestReformatBatch(unittest.TestCase):
+    """Batch reformatting only redoes new and changed files"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.output = os.path.join(self.folder, 'out')
+        self.filenames = []
+        for i in range(3):
+            filename = os.path.join(self.folder, 'volume{}.brf'.format(i))
+            with open(filename, 'w') as f:
+                f.write(TestReformatBRFBytes.CONTENT * (i + 1))
+            self.filenames.append(filename)
+        self.data = reformat_settings(lineLength=20, pageLength=5)
+
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def run_batch(self, data=None) -> list[str]:
+        return EnBrailleReformatBatch(self.output).reformat(self.filenames, data or self.data)
+
+    def test_outputs(self):
+        self.assertEqual(self.filenames, self.run_batch())
+        for filename in self.filenames:
+            with open(os.path.join(self.output, os.path.basename(filename)[:-4] + '_EnBraille.brf')) as f:
+                self.assertEqual(EnBrailleReformater(filename).reformat(None, self.data), f.read())
+
+    def test_unchanged_files_are_skipped_by_stat(self):
+        self.run_batch()
+        with mock.patch.object(reformat, '_hashFile', side_effect=AssertionError('hashed')):
+            self.assertEqual([], self.run_batch())
+
+    def test_touched_file_is_hashed_but_skipped(self):
+        self.run_batch()
+        stat = os.stat(self.filenames[0])
+        os.utime(self.filenames[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual([], self.run_batch())
+        # the new mtime was recorded
+        with mock.patch.object(reformat, '_hashFile', side_effect=AssertionError('hashed')):
+            self.assertEqual([], self.run_batch())
+
+    def test_changed_file_is_reformatted(self):
+        self.run_batch()
+        with open(self.filenames[1], 'a') as f:
+            f.write('more text\n')
+        self.assertEqual([self.filenames[1]], self.run_batch())
+
+    def test_changed_settings_and_missing_output(self):
+        self.run_batch()
+        self.assertEqual(self.filenames, self.run_batch(reformat_settings(lineLength=30, pageLength=5)))
+        os.unlink(os.path.join(self.output, 'volume2_EnBraille.brf'))
+        self.assertEqual([self.filenames[2]], self.run_batch(reformat_settings(lineLength=30, pageLength=5)))
+
+    def test_failing_file_keeps_the_others(self):
+        missing = os.path.join(self.folder, 'missing.brf')
+        with self.assertRaises(RuntimeError) as context:
+            EnBrailleReformatBatch(self.output).reformat(self.filenames + [missing], self.data)
+        self.assertIn('missing.brf', str(context.exception))
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'missing_EnBraille.brf')))
+        self.assertEqual([], self.run_batch())
+
+class TestBrfIndex(unittest.TestCase):
+    """The index must agree with _loadFile() and split the file into its pages"""
+
+    CONTENTS = [
+        TestReformatBRFBytes.CONTENT * 5,
+        'a\r\nb\r\n  #a\r\nc\rd\r  #b\r\n',
+        'one\x0ctwo\n   #a\n\x0c\nthree\n   #b',
+        'ümlaut line\n\n   #a\nlast\n',
+        '',
+    ]
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def _write(self, content: str) -> str:
+        filename = os.path.join(self.folder, 'book.brf')
+        with open(filename, 'w', newline='') as f:
+            f.write(content)
+        return filename
+
+    def test_same_characteristics_as_load_file(self):
+        sample = os.path.join(TESTFILE_DIR, 'reformat_simple.brf')
+        for content in self.CONTENTS + [None]:
+            with self.subTest(content=content):
+                filename = sample if content is None else self._write(content)
+                reformater = EnBrailleReformater(filename)
+                index = EnBrailleBrfIndex.build(filename)
+                self.assertEqual(reformater.maxLineLength, index.maxLineLength)
+                self.assertEqual(reformater.pageLength, index.pageLength)
+
+    def test_pages_cover_the_file(self):
+        for content in self.CONTENTS:
+            with self.subTest(content=content):
+                filename = self._write(content)
+                index = EnBrailleReformater(filename, cacheDir=self.folder).index
+                with open(filename, 'rb') as f:
+                    content = f.read()
+                self.assertEqual(sorted(set(index.pageOffsets)), list(index.pageOffsets))
+                self.assertLess(index.pageOffsets[-1], max(1, len(content)))
+                for offset in index.pageOffsets[1:]:
+                    self.assertRegex(content[:offset].decode('ascii', 'surrogateescape').splitlines()[-1], r'^\s+#\w+$')
+
+    def test_paragraph_offsets_follow_short_lines(self):
+        filename = self._write('a long line of words\nshort\n   #a\nend of par-\ntext\n')
+        index = EnBrailleBrfIndex.build(filename)
+        with open(filename, 'rb') as f:
+            content = f.read()
+        # page numbers do not end a paragraph, the word splitter is checked per job
+        self.assertEqual([b'short', b'end of par-'], [content[:offset].splitlines()[-1] for offset in index.paragraphOffsets])
+
+    def test_saved_index_is_reused_until_file_changes(self):
+        filename = self._write(TestReformatBRFBytes.CONTENT)
+        cacheDir = os.path.join(self.folder, 'cache')
+        index = EnBrailleBrfIndex.forFile(filename, cacheDir)
+        indexFilename = EnBrailleBrfIndex.indexFilename(filename, cacheDir)
+        self.assertTrue(os.path.isfile(indexFilename))
+        self.assertFalse(os.path.exists(filename + '.enbidx'))
+
+        with mock.patch.object(EnBrailleBrfIndex, 'build', side_effect=AssertionError('rebuilt')):
+            loaded = EnBrailleBrfIndex.forFile(filename, cacheDir)
+        self.assertEqual(list(index.pageOffsets), list(loaded.pageOffsets))
+        self.assertEqual(list(index.paragraphOffsets), list(loaded.paragraphOffsets))
+        self.assertEqual((index.maxLineLength, index.pageLength), (loaded.maxLineLength, loaded.pageLength))
+
+        with open(filename, 'a') as f:
+            f.write('more\n   #c\n')
+        rebuilt = EnBrailleBrfIndex.forFile(filename, cacheDir)
+        self.assertEqual(os.path.getsize(filename), rebuilt.size)
+        self.assertEqual(index.pageOffsets, rebuilt.pageOffsets)
+
+    def test_no_sidecar_without_cache_dir(self):
+        filename = self._write(TestReformatBRFBytes.CONTENT)
+        tmpDir = os.path.join(self.folder, 'tmp')
+        with mock.patch('tempfile.gettempdir', return_value=tmpDir):
+            reformater = EnBrailleReformater(filename, analyze=False)
+            self.assertEqual(3, reformater.loadIndex().pageCount)
+            indexFilename = EnBrailleBrfIndex.indexFilename(filename)
+        # the folder of the BRF file is left alone
+        self.assertEqual(['book.brf', 'tmp'], sorted(os.listdir(self.folder)))
+        self.assertTrue(indexFilename.startswith(tmpDir))
+        self.assertIsNotNone(EnBrailleBrfIndex.load(indexFilename))
+
+    def test_broken_index_is_rebuilt(self):
+        filename = self._write(TestReformatBRFBytes.CONTENT)
+        indexFilename = EnBrailleBrfIndex.indexFilename(filename, self.folder)
+        os.makedirs(os.path.dirname(indexFilename))
+        with open(indexFilename, 'wb') as f:
+            f.write(b'EnBrailleBrfIndex 3\n{"pages": 1000')
+        self.assertIsNone(EnBrailleBrfIndex.load(indexFilename))
+        self.assertEqual(3, EnBrailleBrfIndex.forFile(filename, self.folder).pageCount)
+
+class TestDetectCharacteristics(unittest.TestCase):
+    """Large files are sampled, small ones and indexed ones detected exactly"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.cacheDir = os.path.join(self.folder, 'cache')
+
+    def _write(self, name: str, pageCount: int) -> str:
+        page = ['line {} of a page with some words'.format(i) for i in range(24)]
+        filename = os.path.join(self.folder, name)
+        with open(filename, 'w') as f:
+            for number in range(pageCount):
+                f.write('\n'.join(page) + '\n   #' + str(number) + '\n')
+            f.write('x' * 70 + '\n')
+        return filename
+
+    def test_small_file_is_exact(self):
+        filename = self._write('small.brf', 20)
+        reformater = EnBrailleReformater(filename, analyze=False)
+        self.assertTrue(reformater.detectCharacteristics(self.cacheDir))
+        expected = EnBrailleReformater(filename)
+        self.assertEqual((expected.maxLineLength, expected.pageLength), (reformater.maxLineLength, reformater.pageLength))
+        self.assertIsNotNone(EnBrailleBrfIndex.find(filename, self.cacheDir))
+
+    def test_large_file_is_sampled(self):
+        filename = self._write('large.brf', 3000)
+        expected = EnBrailleReformater(filename)
+        reformater = EnBrailleReformater(filename, analyze=False)
+        self.assertFalse(reformater.detectCharacteristics(self.cacheDir))
+        self.assertEqual(expected.pageLength, reformater.pageLength)
+        self.assertLessEqual(reformater.maxLineLength, expected.maxLineLength)
+        self.assertIsNone(EnBrailleBrfIndex.find(filename, self.cacheDir))
+
+        # exact reads it all and indexes it, afterwards the index is used
+        self.assertTrue(reformater.detectCharacteristics(self.cacheDir, exact=True))
+        self.assertEqual((expected.maxLineLength, expected.pageLength), (reformater.maxLineLength, reformater.pageLength))
+        with mock.patch.object(EnBrailleReformater, '_sampleCharacteristics', side_effect=AssertionError('sampled')):
+            self.assertTrue(EnBrailleReformater(filename, analyze=False).detectCharacteristics(self.cacheDir))
+
+    def test_worker_reports_every_file(self):
+        filenames = [self._write('a.brf', 3), os.path.join(self.folder, 'missing.brf'), self._write('b.brf', 5)]
+        worker = EnBrailleCharacteristicsWorker([EnBrailleReformater(f, analyze=False) for f in filenames], self.cacheDir)
+        detected = []
+        failed = []
+        worker.detected.connect(lambda *args: detected.append(args))
+        worker.failed.connect(lambda i, message: failed.append(i))
+        worker.run()
+        self.assertEqual([(0, 70, 25, True), (2, 70, 25, True)], detected)
+        self.assertEqual([1], failed)
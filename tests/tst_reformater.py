@@ -18,15 +18,15 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 import logging
+import os
 import sys
-from PySide6.QtCore import QObject
 from PySide6.QtWidgets import QApplication
 from enbraille_data import EnBrailleData
 from enbraille_functions.reformat import EnBrailleReformater
+from enbraille_tools import EnBrailleProgress
 
-class Dummy(QObject):
-    def progress(self, perc, msg):
-        return
+def reportProgress(done, total, bytesPerSecond, secondsLeft):
+    logging.info('%d of %d bytes, %.0f bytes/s, %s s left', done, total, bytesPerSecond, secondsLeft)
 
 if __name__ == '__main__':
     logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.DEBUG)
@@ -47,5 +47,5 @@ if __name__ == '__main__':
     for n in dir(enbrailledata):
         if n.startswith('refor'):
             sys.stderr.write('{}: {}\n'.format(n, getattr(enbrailledata, n)))
-    d = Dummy()
-    logging.info("Reformat result: %s", r.reformat(d.progress, enbrailledata))
+    progress = EnBrailleProgress(os.path.getsize(sys.argv[1]), reportProgress)
+    logging.info("Reformat result: %s", r.reformat(progress, enbrailledata))
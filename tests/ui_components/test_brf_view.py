@@ -0,0 +1,68 @@
+import sys
+import os
+import unittest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from PySide6.QtGui import QTextCursor
+from PySide6.QtWidgets import QApplication
+from enbraille_tools import generateOutput
+from enbraille_widgets import EnBrailleBrfView
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+class TestBrfView(unittest.TestCase):
+
+    def test_lines(self):
+        """CR, LF and CRLF all end a line"""
+        view = EnBrailleBrfView()
+        for text in ('one', 'one\ntwo', 'one\r\ntwo', 'one\rtwo\r', '\n\n'):
+            with self.subTest(text=text):
+                view.setText(text)
+                self.assertEqual(text.splitlines(), view.toPlainText().splitlines())
+
+    def test_pages(self):
+        lines = ['line {}'.format(i) for i in range(23)]
+        text = generateOutput(lines, 5, 20)
+        for lineEnd in ('\n', '\r\n', '\r'):
+            with self.subTest(lineEnd=repr(lineEnd)):
+                view = EnBrailleBrfView()
+                view.setText(text.replace('\n', lineEnd))
+                rows = text.splitlines()
+                # the lines after the last page number make up the last page
+                self.assertEqual(text.count('#') + 1, view.pageCount)
+                for page in range(2, view.pageCount + 1):
+                    # every page starts after a page number line
+                    self.assertIn('#', rows[view.pageRow(page) - 1])
+                    self.assertEqual(page, view.pageOfRow(view.pageRow(page)))
+
+    def test_trailing_text_is_a_page(self):
+        view = EnBrailleBrfView()
+        view.setText('a\n   #a\nb\n')
+        self.assertEqual(2, view.pageCount)
+        self.assertEqual(2, view.pageRow(2))
+        view.setText('a\n   #a\n')
+        self.assertEqual(1, view.pageCount)
+
+    def test_go_to_page(self):
+        view = EnBrailleBrfView()
+        text = generateOutput(['line {}'.format(i) for i in range(1000)], 25, 40)
+        view.setText(text)
+        self.assertEqual(text, view.toPlainText())
+        self.assertEqual(view.pageCount, view.pageSpinBox.maximum())
+
+        view.pageSpinBox.setValue(10)
+        self.assertEqual(view.pageRow(10), view.textView.textCursor().blockNumber())
+
+        cursor = QTextCursor(view.textView.document().findBlockByNumber(view.pageRow(3) + 1))
+        view.textView.setTextCursor(cursor)
+        self.assertEqual(3, view.pageSpinBox.value())
+
+    def test_empty(self):
+        view = EnBrailleBrfView()
+        view.setText('')
+        self.assertEqual(0, view.pageCount)
+        view.goToPage(1)
+        self.assertEqual(0, view.textView.textCursor().position())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from PySide6.QtWidgets import QApplication
+from enbraille_core.reformat import _outputSpool
+from enbraille_functions.document import EnBrailleDocumentPageOutput
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+class TestDocumentPageOutput(unittest.TestCase):
+    """The converted document is shown from its spool file and can be saved"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.addCleanup(_outputSpool.clear)
+        self.text = 'a converted line\n   #a\nanother line\n'
+        spoolFilename = _outputSpool.create('book.brf')
+        with open(spoolFilename, 'w') as f:
+            f.write(self.text)
+        self.data = SimpleNamespace(documentFilename=os.path.join(self.folder, 'book.epub'),
+                                    outputFiles=[(spoolFilename, len(self.text))])
+
+    def test_show_and_save(self):
+        page = EnBrailleDocumentPageOutput(self.data)
+        page.initializePage()
+        self.assertEqual(self.text, page.textEdit.toPlainText())
+        self.assertEqual(2, page.textEdit.pageCount)
+        self.assertTrue(page.saveButton.isEnabled())
+
+        target = os.path.join(self.folder, 'book.brf')
+        with mock.patch('enbraille_functions.document.QFileDialog.getSaveFileName', return_value=(target, '')) as dialog:
+            page.onSaveButtonClicked()
+        self.assertEqual(target, dialog.call_args[0][2])
+        with open(target) as f:
+            self.assertEqual(self.text, f.read())
+        # the spool file was moved, later saves copy from the target
+        self.assertEqual(target, self.data.outputFiles[0][0])
+
+    def test_nothing_converted(self):
+        self.data.outputFiles = []
+        page = EnBrailleDocumentPageOutput(self.data)
+        page.initializePage()
+        self.assertEqual('', page.textEdit.toPlainText())
+        self.assertFalse(page.saveButton.isEnabled())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from PySide6.QtWidgets import QApplication, QWizard
+from enbraille_core.reformat import EnBrailleReformater as CoreReformater
+from enbraille_functions.reformat import (EnBrailleReformater, EnBrailleReformatPage, EnBrailleReformaterResultPage,
+                                          EnBrailleReformaterWorkPage)
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+def reformat_data(lineLength: int, pageLength: int, filename: str) -> SimpleNamespace:
+    return SimpleNamespace(reformatLineLength=lineLength, reformatPageLength=pageLength,
+                           reformatWordSplitter='-', reformatKeepPageNo=True,
+                           reformatWorkerCount=0, reformatFilename=filename, cacheDir=None)
+
+class TestReformatPagePreview(unittest.TestCase):
+    """The reformat page previews the first pages shortly after a settings change"""
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.brf')
+        with os.fdopen(fd, 'w') as f:
+            f.write('\n'.join(['some words on a line that is long enough', 'short', '   #a'] * 200))
+        self.addCleanup(os.unlink, self.filename)
+
+    def test_preview_after_delay(self):
+        data = reformat_data(20, 5, self.filename)
+        page = EnBrailleReformatPage(data)
+        reformater = EnBrailleReformater(self.filename)
+        page._reformater = reformater
+        page.updatePreview()
+        self.assertEqual(reformater.reformatPreview(data, 3), page.previewView.toPlainText())
+
+        # several changes in a row only restart the timer
+        page.lineLengthSpinBox.setValue(30)
+        page.lineLengthSpinBox.setValue(32)
+        self.assertTrue(page.previewTimer.isActive())
+        self.assertNotEqual(reformater.reformatPreview(data, 3), page.previewView.toPlainText())
+        page.previewTimer.timeout.emit()
+        self.assertFalse(page.previewTimer.isActive())
+        self.assertEqual(reformater.reformatPreview(reformat_data(32, 5, self.filename), 3), page.previewView.toPlainText())
+
+    def test_no_preview_without_file(self):
+        page = EnBrailleReformatPage(reformat_data(20, 5, ''))
+        page.updatePreview()
+        self.assertEqual('', page.previewView.toPlainText())
+
+class TestReformatPageCharacteristics(unittest.TestCase):
+    """File characteristics are detected in the background and shown as they arrive"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.filenames = []
+        for pageLength in (3, 4):
+            filename = os.path.join(self.folder, 'book{}.brf'.format(pageLength))
+            with open(filename, 'w') as f:
+                f.write(('line\n' * (pageLength - 1) + '   #a\n') * 5 + 'a longer last line\n')
+            self.filenames.append(filename)
+
+    def run_detection(self, page: EnBrailleReformatPage, filenames: list[str]) -> None:
+        page.detectCharacteristics([EnBrailleReformater(f, analyze=False) for f in filenames])
+        self.assertEqual(page.tr('detecting...'), page.maxLineLengthLabel.text())
+        page._characteristicsWorker.wait()
+        # deliver the queued results
+        app.processEvents()
+
+    def test_labels(self):
+        data = reformat_data(20, 5, '')
+        data.cacheDir = os.path.join(self.folder, 'cache')
+        page = EnBrailleReformatPage(data)
+        self.run_detection(page, self.filenames)
+        self.assertEqual('3, 4', page.readPageLengthLabel.text())
+        self.assertEqual('18', page.maxLineLengthLabel.text())
+
+        self.run_detection(page, self.filenames[:1])
+        self.assertEqual('3', page.readPageLengthLabel.text())
+
+    def test_missing_file(self):
+        page = EnBrailleReformatPage(reformat_data(20, 5, ''))
+        self.run_detection(page, [os.path.join(self.folder, 'missing.brf')])
+        self.assertEqual(page.tr('error'), page.readPageLengthLabel.text())
+class TestReformatWorkPage(unittest.TestCase):
+    """A failing file of a multi-file run does not discard the others"""
+
+    def test_partial_failure_shows_result(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        good = os.path.join(folder, 'good.brf')
+        with open(good, 'w') as f:
+            f.write('some words on a line\n   #a\n')
+        # a folder can not be read as a file
+        unreadable = os.path.join(folder, 'unreadable.brf')
+        os.mkdir(unreadable)
+
+        data = reformat_data(20, 5, [good, unreadable])
+        data.reformatWorkerCount = 1
+        data.outputData = None
+        data.outputFiles = []
+        wizard = QWizard()
+        workPage = EnBrailleReformaterWorkPage(data)
+        resultPage = EnBrailleReformaterResultPage(data)
+        wizard.addPage(workPage)
+        wizard.addPage(resultPage)
+        wizard.show()
+        with mock.patch('enbraille_functions.reformat.QMessageBox.warning') as warning:
+            workPage.worker.wait()
+            # deliver the queued signals
+            app.processEvents()
+        self.assertIn('unreadable.brf', warning.call_args[0][2])
+        self.assertIs(resultPage, wizard.currentPage())
+        self.assertIsNone(data.outputFiles[1])
+        expected = CoreReformater(good).reformat(None, reformat_data(20, 5, good))
+        self.assertEqual(expected, resultPage.textEdit.toPlainText())
+        self.assertIn('unreadable.brf', resultPage.failedLabel.text())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,14 @@
 import sys
 import os
+import io
+import pickle
+import random
 import unittest
 
 # Add the project root to the path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from enbraille_tools import reformatPragraph, generateOutput, _BREILLENUMS
+from enbraille_tools import reformatPragraph, generateOutput, writeOutput, EnBrailleLineStore, EnBraillePage, _BREILLENUMS
 
 
 class TestReformatParagraph(unittest.TestCase):
@@ -283,6 +286,73 @@ class TestBrailleNumbers(unittest.TestCase):
             self.assertEqual(len(braille_char), 1)
 
 
+class TestLineStore(unittest.TestCase):
+    """The line store must paginate exactly like generateOutput()"""
+
+    def random_lines(self, rnd: random.Random) -> list:
+        return [''.join(rnd.choice('ab -#') for _ in range(rnd.randint(0, 12))) for _ in range(rnd.randint(0, 60))]
+
+    def test_lines(self):
+        lines = ['one ', '', 'two', 'caf\u00e9', 'x' * 40]
+        store = EnBrailleLineStore(lines)
+        self.assertEqual(len(lines), len(store))
+        self.assertEqual(lines, list(store))
+        self.assertEqual('x' * 40, store[-1])
+        with self.assertRaises(IndexError):
+            store[len(lines)]
+
+    def test_output_equals_generate_output(self):
+        rnd = random.Random(1)
+        for _ in range(200):
+            lines = self.random_lines(rnd)
+            pageLength = rnd.randint(-1, 8)
+            lineLength = rnd.randint(5, 20)
+            with self.subTest(lines=lines, pageLength=pageLength, lineLength=lineLength):
+                self.assertEqual(generateOutput(lines, pageLength, lineLength),
+                                 EnBrailleLineStore(lines).output(pageLength, lineLength))
+
+    def test_write_continues_pagination(self):
+        rnd = random.Random(2)
+        chunks = [self.random_lines(rnd) for _ in range(10)]
+        expected = io.StringIO()
+        expectedCount = 0
+        output = io.BytesIO()
+        lineCount = 0
+        for chunk in chunks:
+            expectedCount = writeOutput(chunk, expected, 5, 12, expectedCount)
+            lineCount = EnBrailleLineStore(chunk).write(output, 5, 12, lineCount)
+        self.assertEqual(expectedCount, lineCount)
+        self.assertEqual(expected.getvalue(), output.getvalue().decode('utf-8'))
+
+    def test_pages(self):
+        store = EnBrailleLineStore(['line'] * 11)
+        # the first page number follows the fifth line, then every fourth line
+        self.assertEqual([EnBraillePage(2, 0, 5), EnBraillePage(3, 5, 9), EnBraillePage(None, 9, 11)], store.pages(5))
+        self.assertEqual([EnBraillePage(None, 0, 11)], store.pages(0))
+        self.assertEqual([], EnBrailleLineStore().pages(5))
+
+    def test_view_does_not_copy(self):
+        store = EnBrailleLineStore(['one', 'two', 'three'])
+        with store.view(1, 3) as view:
+            self.assertEqual(b'two\nthree\n', view.tobytes())
+            # the buffer is locked while the view is alive
+            with self.assertRaises(BufferError):
+                store.append('four')
+        store.append('four')
+        self.assertEqual(b'', store.view(4, 2).tobytes())
+
+    def test_pickle(self):
+        store = EnBrailleLineStore(['one', '', 'two'])
+        self.assertEqual(['one', '', 'two'], list(pickle.loads(pickle.dumps(store))))
+
+    def test_compact(self):
+        store = EnBrailleLineStore(['x' * 40] * 1000)
+        # the line and its break plus the offset
+        self.assertEqual(1000 * (41 + 4) + 4, store.nbytes)
+        self.assertFalse(hasattr(store, '__dict__'))
+        self.assertFalse(hasattr(EnBraillePage(1, 0, 0), '__dict__'))
+
+
 class TestEnbrailleToolsIntegration(unittest.TestCase):
     """Integration tests combining multiple functions"""
     
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the document converter.
+Parses an EPUB (default: the EPUB 3.0 specification from the test data) into
+the trees of its chapters like the application does, and measures how long
+EnBrailleMd2BRF takes for them and how long the whole epub2brf conversion
+takes. Markdown files are measured on their Markdown tree.
+With --jobs the whole EPUB conversion is measured, sequentially and with the
+chapters converted on a process pool.
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+import xml.etree.ElementTree as etree
+
+import markdown
+import markdown.treeprocessors
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from enbraille_core.document import EnBrailleMd2BRF
+from enbraille_core.epub import epub2brf, epubSpine, xhtml2tree
+from enbraille_core.settings import EnBrailleSettings
+
+_DEFAULTFILE = os.path.join(os.path.dirname(__file__), '..', 'tests', 'data', 'epub30-spec.epub')
+
+class _TreeCapture(markdown.treeprocessors.Treeprocessor):
+    def run(self, root):
+        self.root = root
+
+def parseTree(mdContent: str):
+    """Parse Markdown into the element tree the converter works on."""
+    md = markdown.Markdown()
+    md.treeprocessors.deregister('prettify')
+    capture = _TreeCapture(md)
+    md.treeprocessors.register(capture, 'capture', -1)
+    md.convert(mdContent)
+    return capture.root
+
+def epubTrees(filename: str) -> list:
+    """The trees of the chapters in the spine, as epub2brf converts them."""
+    with zipfile.ZipFile(filename) as book:
+        return [xhtml2tree(book.read(chapter.name)) for chapter in epubSpine(filename)]
+
+def nest(root, depth: int):
+    """Wrap the content of root in depth blockquotes, like deeply nested books."""
+    for _ in range(depth):
+        quote = etree.Element('blockquote')
+        quote.extend(list(root))
+        root.clear()
+        root.append(quote)
+    return root
+
+def main() -> int:
+    parser = ArgumentParser(description='Benchmark the document converter')
+    parser.add_argument('file', nargs='?', default=_DEFAULTFILE, help='EPUB or Markdown file')
+    parser.add_argument('-t', '--table', default='en-us-g1.ctb', help='liblouis table')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='conversions, the fastest one is reported')
+    parser.add_argument('--walk-only', action='store_true', help='skip liblouis to measure only the tree walk')
+    parser.add_argument('--nesting', type=int, default=0, help='wrap the document in this many blockquotes')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='compare the EPUB conversion with this many worker processes')
+    args = parser.parse_args()
+
+    if args.jobs:
+        return benchmarkParallel(args)
+
+    if args.walk_only:
+        EnBrailleMd2BRF._translate = lambda self, text: text
+        EnBrailleMd2BRF._translateBlock = lambda self, text, typeforms: (text, list(range(len(text))))
+
+    isEpub = args.file.endswith('.epub')
+    if isEpub:
+        roots = [nest(root, args.nesting) for root in epubTrees(args.file)]
+        kind = '{} chapters'.format(len(roots))
+    else:
+        with open(args.file, 'r') as f:
+            mdContent = f.read()
+        roots = [nest(parseTree(mdContent), args.nesting)]
+        kind = '{:.1f} kB Markdown'.format(len(mdContent) / 1024)
+    print('File: {} ({}, {} elements)'.format(
+        os.path.basename(args.file), kind, sum(1 for root in roots for _ in root.iter())))
+
+    settings = EnBrailleSettings(documentTable=args.table)
+    converter = EnBrailleMd2BRF(settings)
+
+    def measure(name, convert):
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = convert()
+            times.append(time.perf_counter() - start)
+        print('{:<12} {:8.3f}s (best of {})'.format(name, min(times), args.repeat))
+        return result
+
+    brf = measure('convert', lambda: ''.join(converter.run(root) for root in roots))
+    if isEpub and not args.nesting:
+        # reading and parsing the chapters and the pagination included
+        brf = measure('epub2brf', lambda: epub2brf(args.file, settings))
+    print('Output: {:.1f} kB'.format(len(brf) / 1024))
+    return 0
+
+def benchmarkParallel(args) -> int:
+    settings = EnBrailleSettings(documentTable=args.table, documentPageLength=25)
+    print('File: {}'.format(os.path.basename(args.file)))
+
+    def measure(name, convert):
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = convert()
+            times.append(time.perf_counter() - start)
+        print('{:<12} {:8.3f}s (best of {})'.format(name, min(times), args.repeat))
+        return result
+
+    sequential = measure('sequential', lambda: epub2brf(args.file, settings))
+    with ProcessPoolExecutor(max_workers=args.jobs, mp_context=multiprocessing.get_context('spawn')) as executor:
+        # warm up the workers, so the process start is not measured
+        epub2brf(args.file, settings, executor=executor)
+        parallel = measure('parallel', lambda: epub2brf(args.file, settings, executor=executor))
+    if parallel != sequential:
+        print('❌ The parallel output differs')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the BRF reformatter.
+Generates a synthetic BRF file (or uses the given one) and compares the
+text mode with the bytes, streaming and parallel modes of EnBrailleReformater.
+"""
+
+import os
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from enbraille_core.reformat import EnBrailleReformater
+
+_WORDCHARS = 'abcdefghijklmnopqrstuvwxyz,;:.!$?()&=%/'
+
+def generate_brf(filename: str, size: int, lineLength: int = 32, pageLength: int = 28, seed: int = 0) -> None:
+    """Write a synthetic BRF file of roughly size bytes with page numbers."""
+    rnd = random.Random(seed)
+    written = 0
+    page = 1
+    with open(filename, 'wb') as f:
+        while written < size:
+            lines = []
+            for _ in range(pageLength - 1):
+                line = ''
+                while True:
+                    word = ''.join(rnd.choice(_WORDCHARS) for _ in range(rnd.randint(1, 12)))
+                    if len(line) + len(word) + 1 > lineLength:
+                        break
+                    line += word + ' '
+                if rnd.random() < 0.1:
+                    line = '  ' + line.rstrip()
+                elif rnd.random() < 0.1:
+                    line += 'ab-'
+                lines.append(line)
+            pageStr = '#' + str(page).translate(str.maketrans('0123456789', 'jabcdefghi'))
+            lines.append(' ' * (lineLength - len(pageStr) - 1) + pageStr)
+            chunk = ('\n'.join(lines) + '\n').encode('ascii')
+            f.write(chunk)
+            written += len(chunk)
+            page += 1
+
+def measure(label: str, fct) -> object:
+    start = time.perf_counter()
+    result = fct()
+    duration = time.perf_counter() - start
+    print('{:<12} {:8.2f}s'.format(label, duration))
+    return result
+
+def main() -> int:
+    parser = ArgumentParser(description='Benchmark the BRF reformatter')
+    parser.add_argument('file', nargs='?', help='BRF file to reformat (default: generate one)')
+    parser.add_argument('-s', '--size', type=int, default=100, help='size of the generated file in MB')
+    parser.add_argument('--line-length', type=int, default=40)
+    parser.add_argument('--page-length', type=int, default=25)
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes for the parallel mode')
+    args = parser.parse_args()
+
+    data = SimpleNamespace(reformatLineLength=args.line_length, reformatPageLength=args.page_length,
+                           reformatWordSplitter='-', reformatKeepPageNo=True)
+
+    filename = args.file
+    if filename is None:
+        fd, filename = tempfile.mkstemp(suffix='.brf')
+        os.close(fd)
+        print('Generating {} MB BRF file ...'.format(args.size))
+        generate_brf(filename, args.size * 1024 * 1024)
+
+    try:
+        print('File: {} ({:.1f} MB)'.format(filename, os.path.getsize(filename) / 1024 / 1024))
+        reformater = measure('load', lambda: EnBrailleReformater(filename))
+        textOutput = measure('text mode', lambda: reformater.reformat(None, data))
+        bytesOutput = measure('bytes mode', lambda: reformater.reformatBytes(None, data))
+        fd, outFilename = tempfile.mkstemp(suffix='.brf')
+        os.close(fd)
+        try:
+            measure('streaming', lambda: reformater.reformatToFile(None, data, outFilename))
+            with open(outFilename, 'r', encoding='utf-8', errors='surrogateescape') as f:
+                streamOutput = f.read()
+        finally:
+            os.unlink(outFilename)
+        with ProcessPoolExecutor(max_workers=args.jobs, mp_context=multiprocessing.get_context('spawn')) as executor:
+            parallelOutput = measure('parallel', lambda: reformater.reformatParallel(None, data, executor, args.jobs))
+        if textOutput.encode('utf-8') != bytesOutput or textOutput != streamOutput or textOutput != parallelOutput:
+            print('❌ Outputs differ!')
+            return 1
+        print('✅ Outputs are identical')
+    finally:
+        if args.file is None:
+            os.unlink(filename)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
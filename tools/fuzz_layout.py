@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Differential fuzzing of the BRF layout paths.
+Runs the reference implementations of reformatPragraph, generateOutput and
+the paragraph parser side by side with the fast engines on random input:
+paragraphs with long words and word splitters, laid out lines with any page
+length, and BRF files with page number lines, hyphenated line ends and mixed
+line breaks. Every mismatch is minimized before it is reported.
+
+New engines are plugged in with --paragraph-engine, --output-engine and
+--parse-engine as module:function, taking the same arguments as the function
+they replace.
+"""
+
+import difflib
+import importlib
+import io
+import os
+import random
+import sys
+import tempfile
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Callable, Iterable, Optional
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from enbraille_core.reformat import EnBrailleReformater
+from enbraille_tools import EnBrailleLineStore, generateOutput, reformatPragraph
+
+# BRF cells are the printable ASCII characters
+_CELLS = 'abcdefghijklmnopqrstuvwxyz0123456789,;:.!$?()&=%/\'"*+<>@[]^_#'
+_SPLITTERS = ['-', '-', '-', '=', '--', '~']
+_LINEBREAKS = ['\n', '\n', '\n', '\r\n', '\r']
+
+class FuzzCase:
+    """Input of one run: the items (words, lines) and the layout settings."""
+
+    def __init__(self, items: list[str], lineLength: int = 40, pageLength: int = 25,
+                 wordSplitter: str = '-', keepPageNo: bool = True) -> None:
+        self.items = items
+        self.lineLength = lineLength
+        self.pageLength = pageLength
+        self.wordSplitter = wordSplitter
+        self.keepPageNo = keepPageNo
+
+    def replace(self, **changes) -> 'FuzzCase':
+        values = dict(vars(self))
+        values.update(changes)
+        return FuzzCase(**values)
+
+    def settings(self) -> SimpleNamespace:
+        return SimpleNamespace(reformatLineLength=self.lineLength, reformatPageLength=self.pageLength,
+                               reformatWordSplitter=self.wordSplitter, reformatKeepPageNo=self.keepPageNo)
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.items)
+
+    def __repr__(self) -> str:
+        return 'FuzzCase({!r}, lineLength={}, pageLength={}, wordSplitter={!r}, keepPageNo={})'.format(
+            self.items, self.lineLength, self.pageLength, self.wordSplitter, self.keepPageNo)
+
+class Differential:
+    """A reference and a candidate engine run on the cases of generate."""
+
+    def __init__(self, name: str, generate: Callable[[random.Random], FuzzCase],
+                 reference: Callable[[FuzzCase], object], candidate: Callable[[FuzzCase], object]) -> None:
+        self.name = name
+        self.generate = generate
+        self.reference = reference
+        self.candidate = candidate
+
+    def outputs(self, case: FuzzCase) -> tuple[object, object]:
+        return _call(self.reference, case), _call(self.candidate, case)
+
+    def fails(self, case: FuzzCase) -> bool:
+        expected, actual = self.outputs(case)
+        return expected != actual
+
+class Counterexample:
+    """A case on which the engines differ, before and after minimizing."""
+
+    def __init__(self, differential: Differential, seed: int, iteration: int,
+                 original: FuzzCase, minimized: FuzzCase) -> None:
+        self.name = differential.name
+        self.seed = seed
+        self.iteration = iteration
+        self.original = original
+        self.minimized = minimized
+        self.expected, self.actual = differential.outputs(minimized)
+
+    def __str__(self) -> str:
+        lines = ['{}: engines differ (seed {}, iteration {})'.format(self.name, self.seed, self.iteration),
+                 '  case:      {!r}'.format(self.minimized),
+                 '  reference: {!r}'.format(self.expected),
+                 '  candidate: {!r}'.format(self.actual)]
+        if isinstance(self.expected, str) and isinstance(self.actual, str):
+            lines.extend('  ' + line for line in difflib.unified_diff(
+                self.expected.splitlines(), self.actual.splitlines(), 'reference', 'candidate', lineterm=''))
+        return '\n'.join(lines)
+
+def _call(engine: Callable[[FuzzCase], object], case: FuzzCase) -> object:
+    # an exception is an output too, engines have to fail alike
+    try:
+        return engine(case)
+    except Exception as e:
+        return '{}: {}'.format(type(e).__name__, e)
+
+# --- generators -------------------------------------------------------------
+
+def randomWord(rnd: random.Random, lineLength: int, wordSplitter: str) -> str:
+    kind = rnd.random()
+    if kind < 0.1:
+        # longer than a line, has to be split, maybe several times
+        return ''.join(rnd.choice(_CELLS) for _ in range(rnd.randint(lineLength, 3 * lineLength + 2)))
+    if kind < 0.2:
+        return wordSplitter * rnd.randint(1, 2)
+    if kind < 0.3:
+        return ''.join(rnd.choice(_CELLS) for _ in range(rnd.randint(1, 6))) + wordSplitter
+    if kind < 0.35:
+        return ''
+    return ''.join(rnd.choice(_CELLS) for _ in range(rnd.randint(1, 12)))
+
+def generateParagraph(rnd: random.Random) -> FuzzCase:
+    """Words of one paragraph, joined by single spaces."""
+    lineLength = rnd.choice([0, 2, 3, 4, 5, 8, 10, 20, 32, 40])
+    wordSplitter = rnd.choice(_SPLITTERS)
+    words = [randomWord(rnd, max(lineLength, 1), wordSplitter) for _ in range(rnd.randint(0, 30))]
+    return FuzzCase(words, lineLength=lineLength, wordSplitter=wordSplitter)
+
+def generateLines(rnd: random.Random) -> FuzzCase:
+    """Laid out lines, paginated with any page length."""
+    lineLength = rnd.choice([1, 5, 10, 20, 40])
+    lines = [''.join(rnd.choice(_CELLS + '  ') for _ in range(rnd.randint(0, lineLength))) for _ in range(rnd.randint(0, 80))]
+    return FuzzCase(lines, lineLength=lineLength, pageLength=rnd.choice([-1, 0, 1, 2, 3, 5, 25]))
+
+def generateBrf(rnd: random.Random) -> FuzzCase:
+    """The lines of a BRF file, each with its line break."""
+    lineLength = rnd.choice([4, 10, 20, 32, 40])
+    wordSplitter = rnd.choice(_SPLITTERS)
+    lines = []
+    for _ in range(rnd.randint(0, 40)):
+        kind = rnd.random()
+        if kind < 0.1:
+            pageNo = ''.join(rnd.choice('abcdefghij') for _ in range(rnd.randint(1, 3)))
+            line = rnd.choice([' ', '   ', '\t', ' ' * (lineLength - len(pageNo) - 2)]) + '#' + pageNo
+        elif kind < 0.2:
+            line = rnd.choice(['', ' ', '  '])
+        else:
+            words = [randomWord(rnd, lineLength, wordSplitter) for _ in range(rnd.randint(1, 10))]
+            line = rnd.choice(['', '', '', '  ']) + ' '.join(words) + rnd.choice(['', '', ' ', '\t'])
+        lines.append(line + rnd.choice(_LINEBREAKS))
+    if lines and rnd.random() < 0.3:
+        # no line break at the end of the file
+        lines[-1] = lines[-1].rstrip('\r\n')
+    return FuzzCase(lines, lineLength=lineLength, pageLength=rnd.choice([0, 3, 5, 25]), wordSplitter=wordSplitter,
+                    keepPageNo=rnd.random() < 0.7)
+
+# --- reference implementations ----------------------------------------------
+
+def referenceParseParagraphs(inputFile, data: SimpleNamespace) -> list[str]:
+    """The original list based paragraph parser, kept as reference for _parseParagraphs"""
+    paragraphs = ['']
+    wordRemainder = ''
+    for line in inputFile.readlines():
+        line = line.rstrip()
+
+        if EnBrailleReformater._pagenoregex.match(line):
+            if data.reformatKeepPageNo:
+                paragraphs.append(EnBrailleReformater._pagenoprefix + line)
+                paragraphs.append('')
+        else:
+            if line.startswith(' ') and paragraphs[-1] != '':
+                paragraphs.append('')
+
+            words = line.split(' ')
+
+            if wordRemainder:
+                words[0] = wordRemainder + words[0]
+                wordRemainder = ''
+
+            if words[-1].endswith(data.reformatWordSplitter) and len(words) > 1:
+                wordRemainder = words[-1][:-1]
+                words = words[:-1]
+
+            for word in words:
+                if word:
+                    paragraphs[-1] += word + ' '
+
+            if len(line) < data.reformatLineLength-4:
+                paragraphs.append('')
+    return paragraphs
+
+_REFERENCEBRAILLENUMS = {'0': 'j', '1': 'a', '2': 'b', '3': 'c', '4': 'd', '5': 'e', '6': 'f', '7': 'g', '8': 'h', '9': 'i'}
+
+def referenceGenerateOutput(lines: list[str], pageLength: int, lineLength: int) -> str:
+    """The original concatenating generateOutput, kept as reference for writeOutput and EnBrailleLineStore"""
+    output = ''
+    lineno = 1
+    for line in lines:
+        output += line + '\n'
+
+        if pageLength > 0 and lineno % pageLength == 0:
+            pageStr = '#{}'.format( int(lineno / pageLength) + 1 )
+            for s, n in _REFERENCEBRAILLENUMS.items():
+                pageStr = pageStr.replace(s, n)
+            output += ' ' * (lineLength - len(pageStr) - 1) + pageStr + '\n'
+            lineno += 1
+
+        lineno += 1
+    return output
+
+def referenceReformat(text: str, data: SimpleNamespace) -> str:
+    """The original reformatter, list of paragraphs to list of lines to text."""
+    if data.reformatLineLength == 0:
+        return ''
+    lines = []
+    for paragraph in referenceParseParagraphs(io.StringIO(text, newline=None), data):
+        if len(paragraph) > 0 and paragraph[0] == EnBrailleReformater._pagenoprefix:
+            pageStr = paragraph.strip()
+            lines.append(' ' * (data.reformatLineLength - len(pageStr) - 1) + pageStr)
+        else:
+            lines.extend(reformatPragraph(paragraph, data.reformatLineLength, data.reformatWordSplitter))
+    return referenceGenerateOutput(lines, data.reformatPageLength, data.reformatLineLength)
+
+# --- engines ----------------------------------------------------------------
+
+def _withFile(case: FuzzCase, fct: Callable[[EnBrailleReformater, SimpleNamespace], str]) -> str:
+    fd, filename = tempfile.mkstemp(suffix='.brf')
+    try:
+        with os.fdopen(fd, 'w', newline='') as f:
+            f.write(case.text)
+        return fct(EnBrailleReformater(filename, analyze=False), case.settings())
+    finally:
+        os.unlink(filename)
+
+def _reformatStreaming(reformater: EnBrailleReformater, data: SimpleNamespace) -> str:
+    outFilename = reformater.filename + '.out'
+    try:
+        reformater.reformatToFile(None, data, outFilename)
+        with open(outFilename, 'r', encoding='utf-8', errors='surrogateescape', newline='') as f:
+            return f.read()
+    finally:
+        if os.path.exists(outFilename):
+            os.unlink(outFilename)
+
+def _reformatParallel(reformater: EnBrailleReformater, data: SimpleNamespace) -> str:
+    # threads are enough to check the chunk boundaries and the stitching
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        return reformater.reformatParallel(None, data, executor, 3)
+
+def paragraphDifferential(engine: Callable[[str, int, str], list[str]], name: str = 'reformatPragraph') -> Differential:
+    return Differential(name, generateParagraph,
+                        lambda case: reformatPragraph(' '.join(case.items), case.lineLength, case.wordSplitter),
+                        lambda case: list(engine(' '.join(case.items), case.lineLength, case.wordSplitter)))
+
+def outputDifferential(engine: Callable[[list[str], int, int], str], name: str = 'generateOutput') -> Differential:
+    return Differential(name, generateLines,
+                        lambda case: referenceGenerateOutput(case.items, case.pageLength, case.lineLength),
+                        lambda case: engine(case.items, case.pageLength, case.lineLength))
+
+def parseDifferential(engine: Callable[[object, SimpleNamespace], Iterable[str]], name: str = '_parseParagraphs') -> Differential:
+    return Differential(name, generateBrf,
+                        lambda case: referenceParseParagraphs(io.StringIO(case.text, newline=None), case.settings()),
+                        lambda case: list(engine(io.StringIO(case.text, newline=None), case.settings())))
+
+def reformatDifferential(engine: Callable[[EnBrailleReformater, SimpleNamespace], str], name: str) -> Differential:
+    return Differential(name, generateBrf,
+                        lambda case: referenceReformat(case.text, case.settings()),
+                        lambda case: _withFile(case, engine))
+
+def builtinDifferentials() -> list[Differential]:
+    """The fast engines of this tree against their references."""
+    parser = EnBrailleReformater('', analyze=False)
+    return [
+        outputDifferential(generateOutput),
+        outputDifferential(lambda lines, pageLength, lineLength: EnBrailleLineStore(lines).output(pageLength, lineLength),
+                           'EnBrailleLineStore.output'),
+        parseDifferential(parser._parseParagraphs),
+        reformatDifferential(lambda reformater, data: reformater.reformat(None, data), 'reformat'),
+        reformatDifferential(lambda reformater, data: reformater.reformatBytes(None, data).decode('utf-8', 'surrogateescape'),
+                             'reformatBytes'),
+        reformatDifferential(_reformatStreaming, 'reformatToFile'),
+        reformatDifferential(_reformatParallel, 'reformatParallel'),
+    ]
+
+# --- minimizing -------------------------------------------------------------
+
+def _shrinkList(items: list, fails: Callable[[list], bool]) -> list:
+    """Delta debugging: remove chunks of items as long as the case still fails."""
+    chunkSize = max(1, len(items) // 2)
+    while items and chunkSize >= 1:
+        start = 0
+        removed = False
+        while start < len(items):
+            candidate = items[:start] + items[start + chunkSize:]
+            if fails(candidate):
+                items = candidate
+                removed = True
+            else:
+                start += chunkSize
+        if not removed:
+            if chunkSize == 1:
+                break
+            chunkSize //= 2
+    return items
+
+def _smallerInts(value: int, lowest: int, excluded: tuple = ()) -> list[int]:
+    candidates = [lowest, value // 2, value - 1]
+    return sorted({candidate for candidate in candidates if lowest <= candidate < value and candidate not in excluded})
+
+def minimize(differential: Differential, case: FuzzCase, maxRounds: int = 10) -> FuzzCase:
+    """Shrink a failing case: fewer items, shorter items, then smaller settings."""
+    for _ in range(maxRounds):
+        before = repr(case)
+        case = case.replace(items=_shrinkList(case.items, lambda items: differential.fails(case.replace(items=items))))
+        for i in range(len(case.items)):
+            def fails(chars: list, i: int = i) -> bool:
+                return differential.fails(case.replace(items=case.items[:i] + [''.join(chars)] + case.items[i + 1:]))
+            item = ''.join(_shrinkList(list(case.items[i]), fails))
+            case = case.replace(items=case.items[:i] + [item] + case.items[i + 1:])
+        # reformatPragraph never returns for a line length of 1, leave that out
+        for name, lowest, excluded in (('lineLength', 0, (1,)), ('pageLength', -1, ())):
+            for value in _smallerInts(getattr(case, name), lowest, excluded):
+                if differential.fails(case.replace(**{name: value})):
+                    case = case.replace(**{name: value})
+                    break
+        for name, value in (('wordSplitter', '-'), ('keepPageNo', True)):
+            if getattr(case, name) != value and differential.fails(case.replace(**{name: value})):
+                case = case.replace(**{name: value})
+        if repr(case) == before:
+            break
+    return case
+
+def run(differential: Differential, iterations: int, seed: int = 0) -> Optional[Counterexample]:
+    """Run differential on iterations random cases, return the first minimized mismatch."""
+    for i in range(iterations):
+        # one generator per case, so a case is reproducible from seed and iteration alone
+        case = differential.generate(random.Random('{}-{}'.format(seed, i)))
+        if differential.fails(case):
+            return Counterexample(differential, seed, i, case, minimize(differential, case))
+    return None
+
+def _loadEngine(spec: str) -> Callable:
+    module, _, function = spec.partition(':')
+    return getattr(importlib.import_module(module), function)
+
+def main() -> int:
+    parser = ArgumentParser(description='Differential fuzzing of the BRF layout paths')
+    parser.add_argument('-n', '--iterations', type=int, default=1000, help='random cases per engine')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('--paragraph-engine', help='module:function to check against reformatPragraph')
+    parser.add_argument('--output-engine', help='module:function to check against the original generateOutput')
+    parser.add_argument('--parse-engine', help='module:function(inputFile, data) to check against the original paragraph parser')
+    args = parser.parse_args()
+
+    differentials = builtinDifferentials()
+    if args.paragraph_engine:
+        differentials.append(paragraphDifferential(_loadEngine(args.paragraph_engine), args.paragraph_engine))
+    if args.output_engine:
+        differentials.append(outputDifferential(_loadEngine(args.output_engine), args.output_engine))
+    if args.parse_engine:
+        differentials.append(parseDifferential(_loadEngine(args.parse_engine), args.parse_engine))
+
+    failed = False
+    for differential in differentials:
+        counterexample = run(differential, args.iterations, args.seed)
+        if counterexample is None:
+            print('✅ {}: {} cases'.format(differential.name, args.iterations))
+        else:
+            print('❌ ' + str(counterexample))
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Reformat a set of BRF files into a folder.
+Files that did not change since the last run with the same settings are
+skipped, see EnBrailleReformatBatch.
+"""
+
+import os
+import multiprocessing
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from enbraille_core.reformat import EnBrailleReformatBatch
+
+def main() -> int:
+    parser = ArgumentParser(description='Reformat BRF files, skipping unchanged ones')
+    parser.add_argument('files', nargs='+', help='BRF files to reformat')
+    parser.add_argument('-o', '--output', required=True, help='folder for the reformatted files')
+    parser.add_argument('--line-length', type=int, default=40)
+    parser.add_argument('--page-length', type=int, default=25)
+    parser.add_argument('--word-splitter', default='-')
+    parser.add_argument('--drop-page-numbers', action='store_true', help='do not keep the page numbers of the input')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes')
+    args = parser.parse_args()
+
+    data = SimpleNamespace(reformatLineLength=args.line_length, reformatPageLength=args.page_length,
+                           reformatWordSplitter=args.word_splitter, reformatKeepPageNo=not args.drop_page_numbers)
+
+    batch = EnBrailleReformatBatch(args.output)
+    try:
+        if args.jobs > 1:
+            with ProcessPoolExecutor(max_workers=args.jobs, mp_context=multiprocessing.get_context('spawn')) as executor:
+                reformatted = batch.reformat(args.files, data, executor)
+        else:
+            reformatted = batch.reformat(args.files, data)
+    except RuntimeError as e:
+        print('❌ Error while reformatting:\n' + str(e))
+        return 1
+    print('Reformatted {} of {} files, {} unchanged'.format(len(reformatted), len(args.files), len(args.files) - len(reformatted)))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
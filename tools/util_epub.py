@@ -181,9 +181,6 @@ class MDFilter(HTMLParser):
             pass
         elif self._showunhandled:
             sys.stderr.write('ENDTAG> {0}\n'.format(tag))
-        
-        if self._markdown.find('.xhtml') != -1:
-            raise Exception(tag)
 
     def handle_data(self, data):
         if not self._inBody:
@@ -143,6 +143,9 @@ TRANSLATIONS = {
     "Read pagelength:": "Gelesene Seitenlänge:",
     "Maximum line length:": "Maximale Zeilenlänge:",
     "no pages detected": "keine Seiten erkannt",
+    "detecting...": "wird ermittelt...",
+    "about {0}": "etwa {0}",
+    "error": "Fehler",
     
     # Reformat Settings
     "Reformat settings:": "Neuformatierungseinstellungen:",
@@ -164,6 +167,15 @@ TRANSLATIONS = {
     "Keep page numbers": "Seitenzahlen beibehalten",
     "Preserve existing page numbers during reformatting": "Bestehende Seitenzahlen während der Neuformatierung beibehalten",
     
+    "Parallel jobs:": "Parallele Aufträge:",
+    "Parallel jobs": "Parallele Aufträge",
+    "Number of files reformatted at the same time, 0 means one per processor core": "Anzahl gleichzeitig neu formatierter Dateien, 0 bedeutet eine pro Prozessorkern",
+    "0 means one job per processor core": "0 bedeutet ein Auftrag pro Prozessorkern",
+    "Number of chapters converted at the same time, 0 means one per processor core": "Anzahl gleichzeitig konvertierter Kapitel, 0 bedeutet eines pro Prozessorkern",
+    "Preview:": "Vorschau:",
+    "Preview": "Vorschau",
+    "The first pages reformatted with the current settings": "Die ersten Seiten mit den aktuellen Einstellungen neu formatiert",
+    
     # File Operations
     "Choose file to convert": "Zu konvertierende Datei auswählen",
     "Braille files (*.brl)": "Braille-Dateien (*.brl)",
@@ -174,11 +186,39 @@ TRANSLATIONS = {
     "Reformatting the file...": "Datei wird neu formatiert...",
     "Starting...": "Wird gestartet...",
     "Done.": "Fertig.",
+    "Reformatted {0} ({1}/{2})": "{0} neu formatiert ({1}/{2})",
+    "{0:.1f} of {1:.1f} MB, {2:.1f} MB/s, {3} left": "{0:.1f} von {1:.1f} MB, {2:.1f} MB/s, noch {3}",
+    "&Cancel": "&Abbrechen",
+    "Cancel reformatting": "Neuformatierung abbrechen",
+    "Converting": "Konvertierung",
+    "Converting the document...": "Das Dokument wird konvertiert...",
+    "Cancel conversion": "Konvertierung abbrechen",
+    "Stop converting and return to the settings": "Konvertierung beenden und zu den Einstellungen zurückkehren",
+    "Conversion done": "Konvertierung abgeschlossen",
+    "Converting the document is done.": "Die Konvertierung des Dokuments ist abgeschlossen.",
+    "Converted document:": "Konvertiertes Dokument:",
+    "Converted braille document": "Konvertiertes Braille-Dokument",
+    "The document converted to braille format": "Das in das Braille-Format konvertierte Dokument",
+    "Save": "Speichern",
+    "Save the converted document as BRF file": "Das konvertierte Dokument als BRF-Datei speichern",
+    "Braille files (*.brf)": "Braille-Dateien (*.brf)",
+    "Chapter {0} of {1}: {2}": "Kapitel {0} von {1}: {2}",
+    "Stop reformatting and return to the settings": "Neuformatierung anhalten und zu den Einstellungen zurückkehren",
+    "Cancelling...": "Wird abgebrochen...",
+    "Cancelled.": "Abgebrochen.",
     
     # Results
     "Reformatting done": "Neuformatierung abgeschlossen",
     "Reformatting the file is done.": "Die Neuformatierung der Datei ist abgeschlossen.",
     "Reformatted file:": "Neu formatierte Datei:",
+    "Reformatted file": "Neu formatierte Datei",
+    "Choose which reformatted file to show": "Wählen Sie, welche neu formatierte Datei angezeigt wird",
+    "Reformatted braille text": "Neu formatierter Braille-Text",
+    "The reformatted braille text": "Der neu formatierte Braille-Text",
+    "Go to page:": "Gehe zu Seite:",
+    "Page": "Seite",
+    "Number of the page to show": "Nummer der anzuzeigenden Seite",
+    "of {0}": "von {0}",
     "&Save": "&Speichern",
     "Save file": "Datei speichern",
     "Save files to folder": "Dateien in Ordner speichern",
@@ -187,7 +227,12 @@ TRANSLATIONS = {
     "Error": "Fehler",
     "Error while loading file: ": "Fehler beim Laden der Datei: ",
     "Error while reformatting: ": "Fehler bei der Neuformatierung: ",
+    "Error while reformatting {0}: {1}": "Fehler bei der Neuformatierung von {0}: {1}",
+    "{0} (failed)": "{0} (fehlgeschlagen)",
+    "Not reformatted: ": "Nicht neu formatiert: ",
+    "Error while converting document: ": "Fehler bei der Konvertierung des Dokuments: ",
     "Error while saving file: ": "Fehler beim Speichern der Datei: ",
+    "Error while reading file: ": "Fehler beim Lesen der Datei: ",
     
     # Braille Table Combo Box
     "Braille Translation Table": "Braille-Übersetzungstabelle",